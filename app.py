@@ -1,20 +1,67 @@
-from flask import Flask, render_template, redirect, url_for, session, request, jsonify
+from flask import (Blueprint, Flask, Response, current_app, jsonify, redirect, render_template, request, session,
+                   stream_with_context, url_for)
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.local import LocalProxy
+from PIL import ImageColor
 from authlib.integrations.flask_client import OAuth
 import os
+import codecs
+import functools
+import tempfile
+import threading
 import requests
-import qrcode
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import re
 import io
 import base64
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
-import smtplib
 
-app = Flask(__name__)
-app.secret_key = os.urandom(24)
-
-SMTP_SERVER = 'smtp.gmail.com'
-SMTP_PORT = 587
+import fastjson
+from ciphers import Pipeline, apply_many
+from http_cache import Content, PageCache, StaticAssets, compress_responses
+from joke_pool import CATEGORIES as JOKE_CATEGORIES, JokePool
+from mailer import MailDispatcher, SMTPSettings
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, SlowRequestProfiler, instrument_flask, span
+from qr_cache import QR_DEFAULTS, PoolBusy, QRCache, RenderPool, RenderTimeout, qr_key
+from session_store import ServerSessionInterface, SQLiteSessionStore, load_secret_key
+from weather_cache import WeatherCache
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider (jsonify, request.get_json) on top of fastjson."""
+
+    def dumps(self, obj, **kwargs):
+        return fastjson.dumps(obj, default=self.default, indent=bool(kwargs.get('indent')),
+                              sort_keys=kwargs.get('sort_keys', self.sort_keys))
+
+    def loads(self, s, **kwargs):
+        return fastjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        body = fastjson.dumpb(obj, default=self.default, indent=indent, sort_keys=self.sort_keys)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+bp = Blueprint('hub', __name__)
+
+# Every worker process must sign with the same key: SECRET_KEY, or else one
+# generated once into SECRET_KEY_FILE. Sessions are kept server-side in
+# SESSION_DB (SESSION_BACKEND=sqlite), each process caching up to
+# SESSION_CACHE_SIZE of them; SESSION_BACKEND=cookie keeps them in Flask's
+# signed cookie instead
+SECRET_KEY = os.environ.get('SECRET_KEY', '')
+SECRET_KEY_FILE = os.environ.get('SECRET_KEY_FILE', 'secret.key')
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'sqlite')
+SESSION_DB = os.environ.get('SESSION_DB', 'sessions.db')
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', '10000'))
+SMTP_SERVER = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', '587'))
+SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', '1') == '1'
 
 # Import config (or use environment variables)
 try:
@@ -25,68 +72,244 @@ except ImportError:
     EMAIL_PASSWORD = os.environ.get('EMAIL_PASSWORD', 'YOUR_APP_PASSWORD')
 
 # FastAPI Wellness Tracker URL
-FASTAPI_URL = 'http://localhost:8001'
+FASTAPI_URL = os.environ.get('FASTAPI_URL', 'http://localhost:8001')
+WELLNESS_POOL_SIZE = int(os.environ.get('WELLNESS_POOL_SIZE', '32'))
+WELLNESS_RETRIES = int(os.environ.get('WELLNESS_RETRIES', '2'))
+WELLNESS_RETRY_BACKOFF = float(os.environ.get('WELLNESS_RETRY_BACKOFF', '0.1'))
+# Forward the upstream body and status unchanged instead of re-encoding it
+WELLNESS_PROXY_STREAM = os.environ.get('WELLNESS_PROXY_STREAM', '1') == '1'
+QR_CACHE_MB = int(os.environ.get('QR_CACHE_MB', '32'))
+QR_CACHE_DIR = os.environ.get('QR_CACHE_DIR') or None
+QR_COLOR = re.compile(r'#?[A-Za-z0-9]{1,20}')
+# Worker processes for QR rendering (0 renders inline on the request thread),
+# how many render jobs may be queued before new ones get a 429, and how long
+# a request waits for its render before giving up with a 504
+QR_WORKERS = int(os.environ.get('QR_WORKERS', str(os.cpu_count() or 1)))
+QR_QUEUE = int(os.environ.get('QR_QUEUE', '0')) or None
+QR_TIMEOUT = float(os.environ.get('QR_TIMEOUT', '10'))
+QR_BATCH_MAX = int(os.environ.get('QR_BATCH_MAX', '100'))
+# Outgoing mail is queued here and sent by MAIL_WORKERS background threads,
+# each reusing one SMTP session for up to MAIL_BATCH messages at a time
+MAIL_DB = os.environ.get('MAIL_DB', 'mail.db')
+MAIL_WORKERS = int(os.environ.get('MAIL_WORKERS', '2'))
+MAIL_BATCH = int(os.environ.get('MAIL_BATCH', '20'))
+MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS', '5'))
+MAIL_BULK_MAX = int(os.environ.get('MAIL_BULK_MAX', '1000'))
+# Weather answers are cached per city and units for WEATHER_TTL seconds, then
+# served stale for up to WEATHER_STALE_TTL more while they are refreshed
+OPENWEATHER_URL = os.environ.get('OPENWEATHER_URL', 'http://api.openweathermap.org/data/2.5/weather')
+WEATHER_TTL = float(os.environ.get('WEATHER_TTL', '600'))
+WEATHER_STALE_TTL = float(os.environ.get('WEATHER_STALE_TTL', '1800'))
+WEATHER_CACHE_SIZE = int(os.environ.get('WEATHER_CACHE_SIZE', '1024'))
+WEATHER_POOL_SIZE = int(os.environ.get('WEATHER_POOL_SIZE', '16'))
+WEATHER_UNITS = ('metric', 'imperial', 'standard')
+# Jokes are fetched from JokeAPI JOKE_BATCH at a time into a pool of
+# JOKE_POOL_SIZE, refilled in the background when it drops below JOKE_POOL_LOW
+JOKEAPI_URL = os.environ.get('JOKEAPI_URL', 'https://v2.jokeapi.dev/joke')
+JOKE_POOL_SIZE = int(os.environ.get('JOKE_POOL_SIZE', '100'))
+JOKE_POOL_LOW = int(os.environ.get('JOKE_POOL_LOW', '25'))
+JOKE_BATCH = int(os.environ.get('JOKE_BATCH', '10'))
+# POST /api/weather/batch: most locations per request, upstream calls made at
+# once across all batches, and how long a batch waits for its slowest answer
+WEATHER_BATCH_MAX = int(os.environ.get('WEATHER_BATCH_MAX', '25'))
+WEATHER_BATCH_CONCURRENCY = int(os.environ.get('WEATHER_BATCH_CONCURRENCY', '8'))
+WEATHER_BATCH_TIMEOUT = float(os.environ.get('WEATHER_BATCH_TIMEOUT', '15'))
+# GET /metrics needs "Authorization: Bearer METRICS_TOKEN" when that is set.
+# With PROFILE_SLOW_MS, requests slower than that have the stacks sampled
+# every PROFILE_INTERVAL_MS while they ran written to PROFILE_DIR
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', '0'))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+EMAIL_PATTERN = re.compile(r'^[^@\s<>,;"]+@[^@\s<>,;"]+\.[^@\s<>,;"]+$')
+# HTML, JSON, CSS and JS responses of COMPRESS_MIN_BYTES or more are
+# compressed for clients that accept it, unless COMPRESS=0. Rendered pages
+# are cached per user in up to PAGE_CACHE_MB
+COMPRESS = os.environ.get('COMPRESS', '1') == '1'
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+PAGE_CACHE_MB = int(os.environ.get('PAGE_CACHE_MB', '16'))
+PROXY_HEADERS = ('Content-Type', 'Content-Length', 'Content-Encoding', 'Content-Disposition', 'ETag', 'Cache-Control',
+                 'Vary', 'X-Accel-Buffering')
+# Break reminders are pushed to the wellness page over an event stream that
+# holds a thread and an upstream connection open for as long as the page is;
+# the upstream sends a keep-alive well within BREAK_STREAM_TIMEOUT seconds.
+# Past BREAK_STREAM_MAX open streams a worker answers 503, so the pages left
+# open can't take every thread it has
+BREAK_STREAM = '/api/wellness/breaks/stream'
+BREAK_STREAM_TIMEOUT = float(os.environ.get('BREAK_STREAM_TIMEOUT', '60'))
+BREAK_STREAM_MAX = int(os.environ.get('BREAK_STREAM_MAX', '8'))
+BREAK_STREAM_RETRY = 30
+
+
+def make_session(pool_size, retries, backoff):
+    # Keep-alive connection pool. Connection failures are retried for every
+    # method (nothing reached the server); 502/503/504 only for GET.
+    retry = Retry(total=retries, connect=retries, read=0, status=retries, backoff_factor=backoff,
+                  status_forcelist=(502, 503, 504), allowed_methods=frozenset(['GET']),
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# Settings create_app copies into app.config (overridable there) to build
+# each app's connection pools, caches and background workers from
+SERVICE_SETTINGS = (
+    'WELLNESS_POOL_SIZE', 'WELLNESS_RETRIES', 'WELLNESS_RETRY_BACKOFF', 'WEATHER_POOL_SIZE', 'WEATHER_TTL',
+    'WEATHER_STALE_TTL', 'WEATHER_CACHE_SIZE', 'WEATHER_BATCH_CONCURRENCY', 'JOKEAPI_URL', 'JOKE_POOL_SIZE',
+    'JOKE_POOL_LOW', 'JOKE_BATCH', 'QR_WORKERS', 'QR_QUEUE', 'QR_TIMEOUT', 'QR_CACHE_MB', 'QR_CACHE_DIR', 'MAIL_DB',
+    'MAIL_WORKERS', 'MAIL_BATCH', 'MAIL_MAX_ATTEMPTS', 'SMTP_SERVER', 'SMTP_PORT', 'SMTP_STARTTLS', 'PAGE_CACHE_MB',
+    'PROFILE_SLOW_MS', 'PROFILE_INTERVAL_MS', 'PROFILE_DIR', 'BREAK_STREAM_MAX',
+)
+
+
+class Services:
+    """The upstream sessions, caches and background workers of one app.
+
+    create_app builds them from the app's config and starts them, so
+    importing this module starts nothing; close() stops them.
+    """
+
+    def __init__(self, config):
+        self.wellness_session = make_session(config['WELLNESS_POOL_SIZE'], config['WELLNESS_RETRIES'],
+                                             config['WELLNESS_RETRY_BACKOFF'])
+        self.weather_session = make_session(config['WEATHER_POOL_SIZE'], 1, 0.2)
+        # Fetches run on the cache's own threads, outside any app context
+        self.weather_cache = WeatherCache(functools.partial(fetch_weather, self.weather_session),
+                                          config['WEATHER_TTL'], config['WEATHER_STALE_TTL'],
+                                          max_entries=config['WEATHER_CACHE_SIZE'],
+                                          fetch_workers=config['WEATHER_BATCH_CONCURRENCY'])
+        self.joke_pool = JokePool(make_session(2, 1, 0.5), config['JOKEAPI_URL'], config['JOKE_POOL_SIZE'],
+                                  config['JOKE_POOL_LOW'], config['JOKE_BATCH'])
+        self.qr_pool = RenderPool(config['QR_WORKERS'], config['QR_QUEUE'], config['QR_TIMEOUT']) \
+            if config['QR_WORKERS'] > 0 else None
+        self.qr_cache = QRCache(config['QR_CACHE_MB'] * 1024 * 1024, config['QR_CACHE_DIR'], self.qr_pool)
+        self.mailer = MailDispatcher(config['MAIL_DB'],
+                                     SMTPSettings(config['SMTP_SERVER'], config['SMTP_PORT'], EMAIL_ADDRESS,
+                                                  EMAIL_PASSWORD, config['SMTP_STARTTLS']),
+                                     config['MAIL_WORKERS'], config['MAIL_BATCH'], config['MAIL_MAX_ATTEMPTS'])
+        self.page_cache = PageCache(config['PAGE_CACHE_MB'] * 1024 * 1024)
+        self.break_streams = threading.BoundedSemaphore(config['BREAK_STREAM_MAX'])
+        self.profiler = None
+        if config['PROFILE_SLOW_MS'] > 0:
+            self.profiler = SlowRequestProfiler(config['PROFILE_DIR'], config['PROFILE_SLOW_MS'] / 1000,
+                                                config['PROFILE_INTERVAL_MS'] / 1000)
+
+    def start(self):
+        self.joke_pool.start()
+        self.mailer.start()
+        # The registry is per process, so the last app started reports here
+        REGISTRY.stats('page_cache', self.page_cache.stats)
+        REGISTRY.stats('weather_cache', self.weather_cache.stats)
+        REGISTRY.stats('qr_cache', self.qr_cache.stats)
+        REGISTRY.stats('joke_pool', self.joke_pool.stats)
+        REGISTRY.stats('mail', self.mailer.stats)
+        if self.profiler:
+            REGISTRY.stats('profiler', self.profiler.stats)
+
+    def close(self):
+        self.mailer.stop()
+        self.joke_pool.close()
+        self.weather_cache.close()
+        if self.qr_pool:
+            self.qr_pool.shutdown()
+        self.wellness_session.close()
+        self.weather_session.close()
+
+
+def service(name):
+    """A stand-in for the current app's Services attribute `name`."""
+    return LocalProxy(lambda: getattr(current_app.extensions['hub'], name))
+
+
+wellness_session = service('wellness_session')
+joke_pool = service('joke_pool')
+qr_cache = service('qr_cache')
+mailer = service('mailer')
+page_cache = service('page_cache')
+break_streams = service('break_streams')
+weather_cache = service('weather_cache')
+assets = StaticAssets(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
 
 # OAuth Configuration
-oauth = OAuth(app)
+oauth = OAuth()
 google = oauth.register(
     name='google',
     client_id=os.environ.get('GOOGLE_CLIENT_ID', 'YOUR_GOOGLE_CLIENT_ID'),
     client_secret=os.environ.get('GOOGLE_CLIENT_SECRET', 'YOUR_GOOGLE_CLIENT_SECRET'),
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+    server_metadata_url=os.environ.get('GOOGLE_DISCOVERY_URL',
+                                       'https://accounts.google.com/.well-known/openid-configuration'),
     client_kwargs={
         'scope': 'openid email profile'
     }
 )
 
-@app.route('/')
+def render_page(template):
+    """`template` rendered for the signed-in user, once per user while it stays in page_cache."""
+    user = session.get('user')
+    # Flashed messages are for one response only; edited templates must show
+    if '_flashes' in session or current_app.jinja_env.auto_reload:
+        return render_template(template, user=user)
+    key = (template, tuple(sorted(user.items())) if user else None)
+    content = page_cache.get(key) or page_cache.put(
+        key, Content(render_template(template, user=user).encode(), 'text/html'))
+    return content.response('private, no-cache')
+
+
+@bp.route('/')
 def home():
-    return render_template('home.html')
+    return render_page('home.html')
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 def dashboard():
     if 'user' in session:
-        return render_template('dashboard.html', user=session['user'])
-    return redirect(url_for('login'))
+        return render_page('dashboard.html')
+    return redirect(url_for('.login'))
 
 
-@app.route('/weather')
+@bp.route('/weather')
 def weather():
     if 'user' not in session:
-        return redirect(url_for('login'))
-    return render_template('weather.html', user=session['user'])
+        return redirect(url_for('.login'))
+    return render_page('weather.html')
 
-@app.route('/jokes')
+@bp.route('/jokes')
 def jokes():
     if 'user' not in session:
-        return redirect(url_for('login'))
-    return render_template('jokes.html', user=session['user'])
+        return redirect(url_for('.login'))
+    return render_page('jokes.html')
 
 
-@app.route('/encrypt')
+@bp.route('/encrypt')
 def encrypt():
     if 'user' not in session:
-        return redirect(url_for('login'))
-    return render_template('encrypt.html', user=session['user'])
+        return redirect(url_for('.login'))
+    return render_page('encrypt.html')
 
 
-@app.route('/wellness')
+@bp.route('/wellness')
 def wellness():
     if 'user' not in session:
-        return redirect(url_for('login'))
-    return render_template('wellness.html', user=session['user'])
+        return redirect(url_for('.login'))
+    return render_page('wellness.html')
 
-@app.route('/profile')
+@bp.route('/profile')
 def profile():
     if 'user' not in session:
-        return redirect(url_for('login'))
-    return render_template('profile.html', user=session['user'])
+        return redirect(url_for('.login'))
+    return render_page('profile.html')
 
 # Wellness Tracker Proxy Routes (Forward to FastAPI)
-@app.route('/api/wellness/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
+@bp.route('/api/wellness/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
 def wellness_proxy(path):
     if 'user' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
+    # Bulk rows name their own users, so imports go to the wellness service
+    # directly, from whoever administers it
+    if path.startswith('bulk/'):
+        return jsonify({'error': 'Bulk import is not available through the hub'}), 403
 
     try:
         user_email = session['user']['email']
@@ -95,26 +318,83 @@ def wellness_proxy(path):
         if request.method == 'GET':
             params = dict(request.args)
             params['user_email'] = user_email
-            response = requests.get(url, params=params, timeout=10)
+            # The body is passed through as it comes, so only in an encoding the client accepts
+            headers = {'Accept-Encoding': request.headers.get('Accept-Encoding', 'identity')}
+            if request.headers.get('If-None-Match'):
+                headers['If-None-Match'] = request.headers['If-None-Match']
+            with span('upstream.wellness'):
+                response = wellness_session.get(url, params=params, headers=headers, timeout=10,
+                                                stream=WELLNESS_PROXY_STREAM)
         else:
-            data = request.get_json() or {}
+            data = request.get_json(silent=True)
+            if data is None and request.get_data():
+                return jsonify({'error': 'Request body must be JSON'}), 415
+            data = data or {}
+            if not isinstance(data, dict):
+                return jsonify({'error': 'Request body must be a JSON object'}), 400
             data['user_email'] = user_email
 
-            if request.method == 'POST':
-                response = requests.post(url, json=data, timeout=10)
-            elif request.method == 'PUT':
-                response = requests.put(url, json=data, timeout=10)
-            elif request.method == 'DELETE':
-                response = requests.delete(url, json=data, timeout=10)
-
-        return jsonify(response.json()), response.status_code
+            with span('upstream.wellness'):
+                response = wellness_session.request(request.method, url, json=data, timeout=10,
+                                                    headers={'Accept-Encoding': request.headers.get(
+                                                        'Accept-Encoding', 'identity')},
+                                                    stream=WELLNESS_PROXY_STREAM)
+
+        if WELLNESS_PROXY_STREAM:
+            return proxy_response(response)
+
+        # Pass caching headers through so unchanged dashboards cost a 304
+        cache_headers = {name: response.headers[name] for name in ('ETag', 'Cache-Control')
+                         if name in response.headers}
+        if response.status_code == 304:
+            return '', 304, cache_headers
+        return jsonify(fastjson.loads(response.content)), response.status_code, cache_headers
     except requests.exceptions.ConnectionError:
         return jsonify(
             {'error': 'Wellness Tracker service is not running. Please start the FastAPI server on port 8001'}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/encrypt-text', methods=['POST'])
+
+@bp.route(BREAK_STREAM)
+def break_stream():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    if not break_streams.acquire(blocking=False):
+        return jsonify({'error': 'Too many reminder streams open'}), 503, {'Retry-After': str(BREAK_STREAM_RETRY)}
+    try:
+        response = wellness_session.get(f'{FASTAPI_URL}/api/breaks/stream',
+                                        params={'user_email': session['user']['email']},
+                                        headers={'Accept-Encoding': 'identity'},
+                                        timeout=(10, BREAK_STREAM_TIMEOUT), stream=True)
+    except requests.exceptions.ConnectionError:
+        break_streams.release()
+        return jsonify({'error': 'Wellness Tracker service is not running'}), 503
+    except BaseException:
+        break_streams.release()
+        raise
+    # The upstream body is chunked, and each chunk is passed on as it arrives
+    return proxy_response(response, on_close=break_streams.release)
+
+
+def proxy_response(response, on_close=None):
+    headers = {name: response.headers[name] for name in PROXY_HEADERS if name in response.headers}
+
+    def body():
+        try:
+            yield from response.raw.stream(64 * 1024, decode_content=False)
+        finally:
+            response.close()
+
+    proxied = Response(stream_with_context(body()), status=response.status_code, headers=headers)
+    # Also runs when the client goes away before the body is started
+    proxied.call_on_close(response.close)
+    if on_close is not None:
+        proxied.call_on_close(on_close)
+    return proxied
+
+
+@bp.route('/api/encrypt-text', methods=['POST'])
 def encrypt_text():
     if 'user' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
@@ -124,6 +404,10 @@ def encrypt_text():
     ciphers = data.get('ciphers', [])
     shift = data.get('shift', 3)
     keyword = data.get('keyword', '')
+    # mode: 'encrypt' or 'decrypt'; chain: apply the ciphers one after
+    # another (in the order given) and return a single result
+    mode = data.get('mode', 'encrypt')
+    chain = bool(data.get('chain', False))
 
     if not text:
         return jsonify({'error': 'Text is required'}), 400
@@ -131,117 +415,180 @@ def encrypt_text():
     if not ciphers:
         return jsonify({'error': 'Please select at least one cipher'}), 400
 
+    if mode not in ('encrypt', 'decrypt'):
+        return jsonify({'error': "Mode must be 'encrypt' or 'decrypt'"}), 400
+
+    if 'vigenere' in ciphers and not keyword:
+        return jsonify({'error': 'Keyword required for Vigenere cipher'}), 400
+
     try:
+        stages = [(cipher, CIPHER_KEYS[cipher](shift, keyword), False)
+                  for cipher in ciphers if cipher in CIPHER_KEYS]
+        groups = [stages] if chain else [[stage] for stage in stages]
+        pipelines = [Pipeline(group) for group in groups]
+        if mode == 'decrypt':
+            pipelines = [pipeline.inverse() for pipeline in pipelines]
+
+        # All results come out of one shared pass over the text
+        with span('cipher.apply_many'):
+            outputs = apply_many(text, pipelines)
         results = []
-
-        # Apply each cipher separately to the original text
-        for cipher in ciphers:
-            if cipher == 'atbash':
-                encrypted_text = atbash_cipher(text)
-                results.append({
-                    'cipher': 'Atbash',
-                    'description': 'Reverses the alphabet',
-                    'encrypted_text': encrypted_text
-                })
-
-            elif cipher == 'caesar':
-                encrypted_text = caesar_cipher(text, shift)
-                results.append({
-                    'cipher': 'Caesar',
-                    'description': f'Shift by {shift}',
-                    'encrypted_text': encrypted_text
-                })
-
-            elif cipher == 'vigenere':
-                if not keyword:
-                    return jsonify({'error': 'Keyword required for Vigenere cipher'}), 400
-                encrypted_text = vigenere_cipher(text, keyword)
-                results.append({
-                    'cipher': 'Vigenere',
-                    'description': f'Keyword: {keyword}',
-                    'encrypted_text': encrypted_text
-                })
+        for group, output in zip(groups, outputs):
+            results.append({
+                'cipher': ' → '.join(CIPHER_NAMES[cipher] for cipher, _, _ in group),
+                'description': ', then '.join(
+                    cipher_description(cipher, shift, keyword) for cipher, _, _ in group),
+                f'{mode}ed_text': output
+            })
 
         return jsonify({
             'success': True,
             'original_text': text,
+            'mode': mode,
             'results': results
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-def atbash_cipher(text):
-    result = []
-    for char in text:
-        if char.isupper():
-            result.append(chr(90 - (ord(char) - 65)))
-        elif char.islower():
-            result.append(chr(122 - (ord(char) - 97)))
-        else:
-            result.append(char)
-    return ''.join(result)
+# Encrypts the request body through one cipher pipeline as it is read and
+# streams the ciphertext back, so memory use does not grow with the size of
+# the upload. Several ciphers are chained in the order given:
+#   curl -T big.txt 'http://localhost:8000/api/encrypt-stream?ciphers=caesar,vigenere&shift=3&keyword=key'
+@bp.route('/api/encrypt-stream', methods=['POST', 'PUT'])
+def encrypt_stream():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
 
+    ciphers = [cipher for cipher in request.args.get('ciphers', '').split(',') if cipher]
+    shift = request.args.get('shift', 3, type=int)
+    keyword = request.args.get('keyword', '')
+    mode = request.args.get('mode', 'encrypt')
 
-def caesar_cipher(text, shift):
-    result = []
-    for char in text:
-        if char.isupper():
-            result.append(chr((ord(char) - 65 + shift) % 26 + 65))
-        elif char.islower():
-            result.append(chr((ord(char) - 97 + shift) % 26 + 97))
-        else:
-            result.append(char)
-    return ''.join(result)
-
-
-def vigenere_cipher(text, keyword):
-    result = []
-    keyword = keyword.upper()
-    keyword_index = 0
-
-    for char in text:
-        if char.isalpha():
-            shift = ord(keyword[keyword_index % len(keyword)]) - 65
-            if char.isupper():
-                result.append(chr((ord(char) - 65 + shift) % 26 + 65))
-            else:
-                result.append(chr((ord(char) - 97 + shift) % 26 + 97))
-            keyword_index += 1
-        else:
-            result.append(char)
+    if not ciphers:
+        return jsonify({'error': 'Please select at least one cipher'}), 400
 
-    return ''.join(result)
+    unknown = [cipher for cipher in ciphers if cipher not in CIPHER_KEYS]
+    if unknown:
+        return jsonify({'error': f"Unknown cipher: {', '.join(unknown)}"}), 400
 
-@app.route('/api/joke', methods=['GET'])
+    if mode not in ('encrypt', 'decrypt'):
+        return jsonify({'error': "Mode must be 'encrypt' or 'decrypt'"}), 400
+
+    if 'vigenere' in ciphers and not keyword:
+        return jsonify({'error': 'Keyword required for Vigenere cipher'}), 400
+
+    pipeline = Pipeline((cipher, CIPHER_KEYS[cipher](shift, keyword), False) for cipher in ciphers)
+    if mode == 'decrypt':
+        pipeline = pipeline.inverse()
+
+    def chunks():
+        # Chunks can end mid-character; the incremental decoder holds the
+        # partial bytes back until the rest arrives.
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        for block in iter(lambda: request.stream.read(STREAM_CHUNK_SIZE), b''):
+            yield decoder.decode(block)
+        yield decoder.decode(b'', final=True)
+
+    # Most HTTP/1.1 clients only read the response once their upload is
+    # done, so the ciphertext is spooled (to disk past STREAM_SPOOL_SIZE)
+    # while the body is read rather than written back concurrently.
+    spool = tempfile.SpooledTemporaryFile(max_size=STREAM_SPOOL_SIZE)
+    try:
+        # Includes reading the upload, which the pipeline consumes as it goes
+        with span('cipher.stream'):
+            for output in pipeline.stream(chunks()):
+                spool.write(output.encode('utf-8'))
+    except UnicodeDecodeError:
+        spool.close()
+        return jsonify({'error': 'Text must be UTF-8'}), 400
+    size = spool.tell()
+    spool.seek(0)
+
+    def body():
+        with spool:
+            yield from iter(lambda: spool.read(STREAM_CHUNK_SIZE), b'')
+
+    return Response(body(), mimetype='text/plain; charset=utf-8', headers={'Content-Length': str(size)})
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_SPOOL_SIZE = 8 * 1024 * 1024
+CIPHER_NAMES = {'atbash': 'Atbash', 'caesar': 'Caesar', 'vigenere': 'Vigenere'}
+CIPHER_KEYS = {
+    'atbash': lambda shift, keyword: None,
+    'caesar': lambda shift, keyword: shift,
+    'vigenere': lambda shift, keyword: keyword,
+}
+
+
+def cipher_description(cipher, shift, keyword):
+    if cipher == 'atbash':
+        return 'Reverses the alphabet'
+    if cipher == 'caesar':
+        return f'Shift by {shift}'
+    return f'Keyword: {keyword}'
+
+
+@bp.route('/api/joke', methods=['GET'])
 def get_joke():
     if 'user' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
 
-    try:
-        # Get joke from JokeAPI
-        response = requests.get('https://v2.jokeapi.dev/joke/Any?safe-mode', timeout=10)
+    category = request.args.get('category', '').strip().title() or None
+    if category == 'Any':
+        category = None
+    if category and category not in JOKE_CATEGORIES:
+        return jsonify({'error': f"category must be one of Any, {', '.join(JOKE_CATEGORIES)}"}), 400
 
-        if response.status_code == 200:
-            joke_data = response.json()
+    # Served from the prefetched pool (or the built-in jokes), never waiting on JokeAPI
+    joke_text, joke_category, source = joke_pool.get(category)
+    return jsonify({
+        'success': True,
+        'joke': joke_text,
+        'category': joke_category,
+        'source': source
+    })
 
-            if joke_data['type'] == 'single':
-                joke_text = joke_data['joke']
-            else:
-                joke_text = f"{joke_data['setup']}\n\n{joke_data['delivery']}"
 
-            return jsonify({
-                'success': True,
-                'joke': joke_text,
-                'category': joke_data.get('category', 'General')
-            })
-        else:
-            return jsonify({'error': 'Failed to fetch joke'}), 500
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+@bp.route('/api/joke/stats')
+def joke_stats():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify(joke_pool.stats())
 
 
-@app.route('/api/generate-qr', methods=['POST'])
+def qr_options(values):
+    """Rendering options from request JSON or query args; ValueError if invalid."""
+    options = qr_cache.options(
+        box_size=values.get('box_size'),
+        border=values.get('border'),
+        fill_color=values.get('fill_color'),
+        back_color=values.get('back_color'),
+    )
+    try:
+        options['box_size'] = int(options['box_size'])
+        options['border'] = int(options['border'])
+    except (TypeError, ValueError):
+        # TypeError for JSON lists and objects
+        raise ValueError('box_size and border must be numbers') from None
+    if not 1 <= options['box_size'] <= 40 or not 0 <= options['border'] <= 20:
+        raise ValueError('box_size must be 1-40 and border 0-20')
+    for name in ('fill_color', 'back_color'):
+        value = str(options[name])
+        if not QR_COLOR.fullmatch(value):
+            raise ValueError(f'Invalid {name}')
+        # The renderer takes any color PIL knows, and a transparent background
+        if name == 'back_color' and value.lower() == 'transparent':
+            continue
+        try:
+            ImageColor.getrgb(value)
+        except ValueError:
+            raise ValueError(f'Unknown {name} {value!r}') from None
+    return options
+
+
+@bp.route('/api/generate-qr', methods=['POST'])
 def generate_qr():
     if 'user' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
@@ -253,50 +600,133 @@ def generate_qr():
         return jsonify({'error': 'Text is required'}), 400
 
     try:
-        # Generate QR code
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(text)
-        qr.make(fit=True)
-
-        img = qr.make_image(fill_color="black", back_color="white")
+        options = qr_options(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-        # Convert to base64
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        img_base64 = base64.b64encode(buffer.getvalue()).decode()
+    try:
+        _, png = qr_cache.get(text, options)
+        img_base64 = base64.b64encode(png).decode()
 
         return jsonify({
             'success': True,
-            'qr_code': f'data:image/png;base64,{img_base64}'
+            'qr_code': f'data:image/png;base64,{img_base64}',
+            'qr_url': qr_url(text, options)
         })
+    except (PoolBusy, RenderTimeout) as e:
+        return render_unavailable(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/send-joke-email', methods=['POST'])
-def send_joke_email():
+# The raw PNG for ?text=... (plus optional rendering options). The URL fully
+# determines the image, so browsers may keep it forever.
+@bp.route('/api/qr.png', methods=['GET'])
+def qr_png():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    text = request.args.get('text', '')
+    if not text:
+        return jsonify({'error': 'Text is required'}), 400
+
+    try:
+        options = qr_options(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    headers = {'Cache-Control': 'private, max-age=31536000, immutable'}
+    etag = f'"{qr_key(text, options)}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        return '', 304, {'ETag': etag, **headers}
+
+    try:
+        key, png = qr_cache.get(text, options)
+        return Response(png, mimetype='image/png', headers={'ETag': f'"{key}"', **headers})
+    except (PoolBusy, RenderTimeout) as e:
+        return render_unavailable(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Renders up to QR_BATCH_MAX codes in one call. format=url (the default)
+# returns links to /api/qr.png, already rendered and cached; format=data
+# returns base64 data URIs as /api/generate-qr does.
+@bp.route('/api/generate-qr/batch', methods=['POST'])
+def generate_qr_batch():
     if 'user' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
 
     data = request.get_json()
-    recipient_email = data.get('email', '')
-    joke_text = data.get('joke', '')
-    include_qr = data.get('include_qr', False)
-    qr_image = data.get('qr_image', '')
+    texts = data.get('texts', [])
+    output = data.get('format', 'url')
 
-    if not recipient_email or not joke_text:
-        return jsonify({'error': 'Email and joke are required'}), 400
+    if not texts or not all(isinstance(text, str) and text for text in texts):
+        return jsonify({'error': 'texts must be a list of non-empty strings'}), 400
+
+    if len(texts) > QR_BATCH_MAX:
+        return jsonify({'error': f'At most {QR_BATCH_MAX} texts per batch'}), 400
+
+    if output not in ('url', 'data'):
+        return jsonify({'error': "format must be 'url' or 'data'"}), 400
+
+    try:
+        options = qr_options(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     try:
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_ADDRESS
-        msg['To'] = recipient_email
-        msg['Subject'] = '😂 Your Daily Joke from IntegrativeHub!'
-
-        # Email body
-        html_body = f"""
+        results = []
+        for text, (key, png) in zip(texts, qr_cache.get_many(texts, options)):
+            result = {'text': text, 'qr_url': qr_url(text, options), 'etag': key}
+            if output == 'data':
+                result['qr_code'] = f'data:image/png;base64,{base64.b64encode(png).decode()}'
+            results.append(result)
+        return jsonify({'success': True, 'results': results})
+    except (PoolBusy, RenderTimeout) as e:
+        return render_unavailable(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def qr_url(text, options):
+    return url_for('.qr_png', text=text, **{name: value for name, value in options.items()
+                                           if value != QR_DEFAULTS[name]})
+
+
+def render_unavailable(e):
+    if isinstance(e, PoolBusy):
+        return jsonify({'error': str(e)}), 429, {'Retry-After': str(e.retry_after)}
+    return jsonify({'error': str(e)}), 504
+
+
+@bp.route('/api/qr/stats', methods=['GET'])
+def qr_stats():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify(qr_cache.stats())
+
+
+def attach_qr(msg, text, filename):
+    # Rendered here (usually a cache hit) rather than uploaded back by the
+    # page as base64. The email goes without it if rendering is backed up
+    try:
+        _, qr_bytes = qr_cache.get(text)
+    except (PoolBusy, RenderTimeout) as e:
+        current_app.logger.warning('Sending email without its QR code: %s', e)
+        return
+    image = MIMEImage(qr_bytes, name=filename)
+    image.add_header('Content-ID', '<qr_image>')
+    msg.attach(image)
+
+
+def joke_email(joke_text, include_qr):
+    msg = MIMEMultipart()
+    msg['From'] = EMAIL_ADDRESS
+    msg['Subject'] = '😂 Your Daily Joke from IntegrativeHub!'
+
+    # Email body
+    html_body = f"""
         <html>
             <body style="font-family: Arial, sans-serif; padding: 20px; background-color: #f5f5f5;">
                 <div style="max-width: 600px; margin: 0 auto; background: white; padding: 30px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
@@ -313,61 +743,22 @@ def send_joke_email():
         </html>
         """
 
-        msg.attach(MIMEText(html_body, 'html'))
+    msg.attach(MIMEText(html_body, 'html'))
 
-        # Attach QR code if requested
-        if include_qr and qr_image:
-            # Extract base64 data
-            qr_data = qr_image.split(',')[1]
-            qr_bytes = base64.b64decode(qr_data)
+    # Attach QR code if requested
+    if include_qr:
+        attach_qr(msg, joke_text, 'joke_qr.png')
 
-            image = MIMEImage(qr_bytes, name='joke_qr.png')
-            image.add_header('Content-ID', '<qr_image>')
-            msg.attach(image)
+    return msg
 
-        # Send email
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            server.send_message(msg)
 
-        return jsonify({
-            'success': True,
-            'message': 'Email sent successfully!'
-        })
-    except Exception as e:
-        return jsonify({'error': f'Failed to send email: {str(e)}'}), 500
-
-
-@app.route('/api/send-encrypted-email', methods=['POST'])
-def send_encrypted_email():
-    if 'user' not in session:
-        return jsonify({'error': 'Unauthorized'}), 401
-
-    data = request.get_json()
-    recipient_email = data.get('email', '')
-    encrypted_text = data.get('encrypted_text', '')
-    cipher_name = data.get('cipher_name', '')
-    cipher_description = data.get('cipher_description', '')
-    include_qr = data.get('include_qr', False)
-    qr_image = data.get('qr_image', '')
-
-    if not recipient_email or not encrypted_text:
-        return jsonify({'error': 'Email and encrypted text are required'}), 400
+def encrypted_email(encrypted_text, cipher_name, cipher_description, include_qr):
+    msg = MIMEMultipart()
+    msg['From'] = EMAIL_ADDRESS
+    msg['Subject'] = f'🔒 Encrypted Message ({cipher_name} Cipher) from IntegrativeHub'
 
-    # Check if email is configured
-    if EMAIL_ADDRESS == 'YOUR_EMAIL@gmail.com' or EMAIL_PASSWORD == 'YOUR_APP_PASSWORD':
-        return jsonify({'error': 'Please configure email settings in app.py (EMAIL_ADDRESS and EMAIL_PASSWORD)'}), 500
-
-    try:
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_ADDRESS
-        msg['To'] = recipient_email
-        msg['Subject'] = f'🔒 Encrypted Message ({cipher_name} Cipher) from IntegrativeHub'
-
-        # Email body
-        html_body = f"""
+    # Email body
+    html_body = f"""
         <html>
             <body style="font-family: Arial, sans-serif; padding: 20px; background-color: #f5f5f5;">
                 <div style="max-width: 600px; margin: 0 auto; background: white; padding: 30px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
@@ -390,100 +781,397 @@ def send_encrypted_email():
         </html>
         """
 
-        msg.attach(MIMEText(html_body, 'html'))
+    msg.attach(MIMEText(html_body, 'html'))
 
-        # Attach QR code if requested
-        if include_qr and qr_image:
-            # Extract base64 data
-            qr_data = qr_image.split(',')[1]
-            qr_bytes = base64.b64decode(qr_data)
+    # Attach QR code if requested
+    if include_qr:
+        attach_qr(msg, encrypted_text, 'encrypted_qr.png')
 
-            image = MIMEImage(qr_bytes, name='encrypted_qr.png')
-            image.add_header('Content-ID', '<qr_image>')
-            msg.attach(image)
+    return msg
 
-        # Send email
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            server.send_message(msg)
 
-        return jsonify({
-            'success': True,
-            'message': 'Email sent successfully!'
-        })
-    except smtplib.SMTPAuthenticationError as e:
-        return jsonify({
-                           'error': 'Gmail authentication failed. Please use an App Password. See: https://support.google.com/accounts/answer/185833'}), 500
+def email_configured():
+    return EMAIL_ADDRESS != 'YOUR_EMAIL@gmail.com' and EMAIL_PASSWORD != 'YOUR_APP_PASSWORD'
+
+
+def queue_email(msg, recipient_email):
+    # Queue it; the page polls /api/email-status/<job_id> for the outcome
+    msg['To'] = recipient_email
+    job_id = mailer.submit(msg, EMAIL_ADDRESS, [recipient_email], owner=session['user']['email'])
+
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'message': 'Email queued for delivery'
+    }), 202
+
+
+def bulk_recipients(emails):
+    """Split `emails` into (valid, invalid), dropping repeats."""
+    valid, invalid, seen = [], [], set()
+    for email in emails:
+        email = email.strip() if isinstance(email, str) else email
+        if not isinstance(email, str) or not email.isascii() or not EMAIL_PATTERN.match(email):
+            invalid.append(email)
+        elif email.lower() not in seen:
+            seen.add(email.lower())
+            valid.append(email)
+    return valid, invalid
+
+
+def queue_bulk_email(msg, recipients, invalid):
+    # One copy of the message is stored for the whole batch; the mail workers
+    # send it to everyone over their pooled sessions
+    batch_id, job_ids = mailer.submit_batch(msg, EMAIL_ADDRESS, recipients, owner=session['user']['email'])
+
+    return jsonify({
+        'success': True,
+        'batch_id': batch_id,
+        'queued': len(recipients),
+        'invalid': invalid,
+        'recipients': [{'email': email, 'job_id': job_id} for email, job_id in zip(recipients, job_ids)],
+        'message': f'{len(recipients)} emails queued for delivery'
+    }), 202
+
+
+def bulk_request(data):
+    """Validate the recipient list of a bulk send; returns (recipients, invalid, error response)."""
+    emails = data.get('emails')
+    if not isinstance(emails, list) or not emails:
+        return None, None, (jsonify({'error': 'emails must be a non-empty list'}), 400)
+    if len(emails) > MAIL_BULK_MAX:
+        return None, None, (jsonify({'error': f'At most {MAIL_BULK_MAX} recipients per request'}), 400)
+    recipients, invalid = bulk_recipients(emails)
+    if not recipients:
+        return None, None, (jsonify({'error': 'No valid email addresses', 'invalid': invalid}), 400)
+    return recipients, invalid, None
+
+
+@bp.route('/api/send-joke-email', methods=['POST'])
+def send_joke_email():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    data = request.get_json()
+    recipient_email = data.get('email', '')
+    joke_text = data.get('joke', '')
+    include_qr = data.get('include_qr', False)
+
+    if not recipient_email or not joke_text:
+        return jsonify({'error': 'Email and joke are required'}), 400
+
+    try:
+        return queue_email(joke_email(joke_text, include_qr), recipient_email)
     except Exception as e:
         return jsonify({'error': f'Failed to send email: {str(e)}'}), 500
 
-@app.route('/api/weather', methods=['POST'])
-def get_weather():
+
+@bp.route('/api/send-joke-email/bulk', methods=['POST'])
+def send_joke_email_bulk():
     if 'user' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
 
     data = request.get_json()
+    joke_text = data.get('joke', '')
+    include_qr = data.get('include_qr', False)
+
+    if not joke_text:
+        return jsonify({'error': 'Joke is required'}), 400
+
+    recipients, invalid, error = bulk_request(data)
+    if error:
+        return error
+
+    try:
+        return queue_bulk_email(joke_email(joke_text, include_qr), recipients, invalid)
+    except Exception as e:
+        return jsonify({'error': f'Failed to send email: {str(e)}'}), 500
+
+
+@bp.route('/api/send-encrypted-email', methods=['POST'])
+def send_encrypted_email():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    data = request.get_json()
+    recipient_email = data.get('email', '')
+    encrypted_text = data.get('encrypted_text', '')
+    cipher_name = data.get('cipher_name', '')
+    cipher_description = data.get('cipher_description', '')
+    include_qr = data.get('include_qr', False)
+
+    if not recipient_email or not encrypted_text:
+        return jsonify({'error': 'Email and encrypted text are required'}), 400
+
+    # Check if email is configured
+    if not email_configured():
+        return jsonify({'error': 'Please configure email settings in app.py (EMAIL_ADDRESS and EMAIL_PASSWORD)'}), 500
+
+    try:
+        return queue_email(encrypted_email(encrypted_text, cipher_name, cipher_description, include_qr),
+                           recipient_email)
+    except Exception as e:
+        return jsonify({'error': f'Failed to send email: {str(e)}'}), 500
+
+
+@bp.route('/api/send-encrypted-email/bulk', methods=['POST'])
+def send_encrypted_email_bulk():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    data = request.get_json()
+    encrypted_text = data.get('encrypted_text', '')
+    cipher_name = data.get('cipher_name', '')
+    cipher_description = data.get('cipher_description', '')
+    include_qr = data.get('include_qr', False)
+
+    if not encrypted_text:
+        return jsonify({'error': 'Encrypted text is required'}), 400
+
+    recipients, invalid, error = bulk_request(data)
+    if error:
+        return error
+
+    if not email_configured():
+        return jsonify({'error': 'Please configure email settings in app.py (EMAIL_ADDRESS and EMAIL_PASSWORD)'}), 500
+
+    try:
+        return queue_bulk_email(encrypted_email(encrypted_text, cipher_name, cipher_description, include_qr),
+                                recipients, invalid)
+    except Exception as e:
+        return jsonify({'error': f'Failed to send email: {str(e)}'}), 500
+
+
+@bp.route('/api/email-status/<job_id>')
+def email_status(job_id):
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    job = mailer.status(job_id)
+    if job is None or job.pop('owner') != session['user']['email']:
+        return jsonify({'error': 'Email job not found'}), 404
+    job['error'] = explain_mail_error(job['error'])
+    return jsonify({'success': True, **job})
+
+
+@bp.route('/api/email-batch/<batch_id>')
+def email_batch_status(batch_id):
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    batch = mailer.batch_status(batch_id)
+    if batch is None or batch.pop('owner') != session['user']['email']:
+        return jsonify({'error': 'Email batch not found'}), 404
+    for recipient in batch['recipients']:
+        recipient['error'] = explain_mail_error(recipient['error'])
+    return jsonify({'success': True, **batch})
+
+
+def explain_mail_error(error):
+    if error and error.startswith('535'):
+        return 'Gmail authentication failed. Please use an App Password. See: https://support.google.com/accounts/answer/185833'
+    return error
+
+
+def fetch_weather(session, location, units):
+    """Ask OpenWeatherMap about a city or (lat, lon) over `session`; returns (status, payload) for the API."""
+    if isinstance(location, tuple):
+        params = {'lat': location[0], 'lon': location[1]}
+    else:
+        params = {'q': location}
+    params.update(appid=OPENWEATHER_API_KEY, units=units)
+    with span('upstream.openweathermap'):
+        response = session.get(OPENWEATHER_URL, params=params, timeout=10)
+
+    if response.status_code == 200:
+        weather_data = fastjson.loads(response.content)
+        wind_speed = weather_data['wind']['speed']
+        return 200, {
+            'success': True,
+            'city': weather_data['name'],
+            'country': weather_data['sys']['country'],
+            'units': units,
+            'temperature': round(weather_data['main']['temp']),
+            'feels_like': round(weather_data['main']['feels_like']),
+            'description': weather_data['weather'][0]['description'].title(),
+            'humidity': weather_data['main']['humidity'],
+            # km/h, except imperial where OpenWeatherMap already gives mph
+            'wind_speed': round(wind_speed if units == 'imperial' else wind_speed * 3.6, 1),
+            'pressure': weather_data['main']['pressure'],
+            'icon': weather_data['weather'][0]['icon'],
+            'lat': weather_data['coord']['lat'],
+            'lon': weather_data['coord']['lon']
+        }
+    elif response.status_code == 404:
+        return 404, {'error': 'City not found'}
+    else:
+        return 500, {'error': 'Failed to fetch weather data'}
+
+
+@bp.route('/api/weather', methods=['POST'])
+def get_weather():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
     city = data.get('city', '')
+    units = data.get('units', 'metric')
 
-    if not city:
+    if not isinstance(city, str) or not city.strip():
         return jsonify({'error': 'City name is required'}), 400
 
+    if units not in WEATHER_UNITS:
+        return jsonify({'error': f"units must be one of {', '.join(WEATHER_UNITS)}"}), 400
+
     try:
-        # Get weather data from OpenWeatherMap
-        url = f'http://api.openweathermap.org/data/2.5/weather?q={city}&appid={OPENWEATHER_API_KEY  }&units=metric'
-        response = requests.get(url, timeout=10)
-
-        if response.status_code == 200:
-            weather_data = response.json()
-            return jsonify({
-                'success': True,
-                'city': weather_data['name'],
-                'country': weather_data['sys']['country'],
-                'temperature': round(weather_data['main']['temp']),
-                'feels_like': round(weather_data['main']['feels_like']),
-                'description': weather_data['weather'][0]['description'].title(),
-                'humidity': weather_data['main']['humidity'],
-                'wind_speed': round(weather_data['wind']['speed'] * 3.6, 1),  # Convert m/s to km/h
-                'pressure': weather_data['main']['pressure'],
-                'icon': weather_data['weather'][0]['icon'],
-                'lat': weather_data['coord']['lat'],
-                'lon': weather_data['coord']['lon']
-            })
-        elif response.status_code == 404:
-            return jsonify({'error': 'City not found'}), 404
-        else:
-            return jsonify({'error': 'Failed to fetch weather data'}), 500
+        status, payload, how = weather_cache.get(city, units)
+        response = jsonify(payload)
+        response.headers['X-Cache'] = how
+        return response, status
     except requests.exceptions.Timeout:
         return jsonify({'error': 'Request timeout. Please try again'}), 500
     except requests.exceptions.RequestException as e:
-        print(f"Request Error: {str(e)}")  # Debug log
+        current_app.logger.warning('Weather request for %r failed: %s', city, e)
         return jsonify({'error': 'Network error. Please check your connection'}), 500
     except Exception as e:
-        print(f"Error: {str(e)}")  # Debug log
+        current_app.logger.exception('Weather lookup for %r failed', city)
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 
-@app.route('/login')
+def weather_location(value):
+    """A city name or {'lat', 'lon'} from a batch request as a cache location."""
+    if isinstance(value, str) and value.strip():
+        return value
+    if isinstance(value, dict):
+        lat, lon = value.get('lat'), value.get('lon')
+        if (all(isinstance(n, (int, float)) and not isinstance(n, bool) for n in (lat, lon))
+                and -90 <= lat <= 90 and -180 <= lon <= 180):
+            return float(lat), float(lon)
+    raise ValueError('Each location must be a city name or {"lat": ..., "lon": ...}')
+
+
+def weather_failure(error):
+    if isinstance(error, TimeoutError) or isinstance(error, requests.exceptions.Timeout):
+        return 504, 'Request timeout. Please try again'
+    if isinstance(error, requests.exceptions.RequestException):
+        return 502, 'Network error. Please check your connection'
+    return 500, f'Server error: {str(error)}'
+
+
+@bp.route('/api/weather/batch', methods=['POST'])
+def get_weather_batch():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    values = data.get('locations', [])
+    units = data.get('units', 'metric')
+
+    if not isinstance(values, list) or not values:
+        return jsonify({'error': 'locations must be a non-empty list'}), 400
+
+    if len(values) > WEATHER_BATCH_MAX:
+        return jsonify({'error': f'At most {WEATHER_BATCH_MAX} locations per batch'}), 400
+
+    if units not in WEATHER_UNITS:
+        return jsonify({'error': f"units must be one of {', '.join(WEATHER_UNITS)}"}), 400
+
+    try:
+        locations = [weather_location(value) for value in values]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Cached answers are used as they are; the rest are fetched concurrently
+    # and one failure does not fail the batch
+    results, failed = [], 0
+    for value, outcome in zip(values, weather_cache.get_many(locations, units, WEATHER_BATCH_TIMEOUT)):
+        if isinstance(outcome, BaseException):
+            status, error = weather_failure(outcome)
+            result = {'error': error}
+        else:
+            status, result, how = outcome
+            result = {**result, 'cache': how}
+        failed += status != 200
+        results.append({'query': value, 'status': status, **result})
+
+    return jsonify({'success': True, 'units': units, 'results': results, 'failed': failed})
+
+
+@bp.route('/api/weather/stats')
+def weather_stats():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify(weather_cache.stats())
+
+
+# Prometheus scrape target: request latencies, spans and the stats above
+@bp.route('/metrics')
+def metrics():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+@bp.route('/login')
 def login():
-    redirect_uri = url_for('authorize', _external=True)
+    redirect_uri = url_for('.authorize', _external=True)
     return google.authorize_redirect(redirect_uri)
 
-@app.route('/accounts/google/login/callback/')
+@bp.route('/accounts/google/login/callback/')
 def authorize():
     token = google.authorize_access_token()
     user_info = token.get('userinfo')
+    # A fresh session (and, server-side, a fresh id) for the signed-in user
+    session.clear()
     session['user'] = {
         'email': user_info['email'],
         'name': user_info.get('name', 'User'),
         'picture': user_info.get('picture', '')
     }
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('.dashboard'))
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.pop('user', None)
-    return redirect(url_for('home'))
+    return redirect(url_for('.home'))
+
+
+
+def create_app(config=None):
+    """The Flask app, configured from the environment and then `config`, with its services started.
+
+    Call it in each worker process (`gunicorn 'app:create_app()'`), not
+    before a fork: the services' threads and SQLite connections don't
+    survive one.
+    """
+    app = Flask(__name__, static_folder=None)
+    app.json = FastJSONProvider(app)
+    app.config.update(SESSION_BACKEND=SESSION_BACKEND, SESSION_DB=SESSION_DB, SESSION_CACHE_SIZE=SESSION_CACHE_SIZE,
+                      SESSION_COOKIE_SAMESITE='Lax', COMPRESS=COMPRESS, COMPRESS_MIN_BYTES=COMPRESS_MIN_BYTES)
+    app.config.update({name: globals()[name] for name in SERVICE_SETTINGS})
+    app.config.update(config or {})
+    if not app.config['SECRET_KEY']:
+        app.config['SECRET_KEY'] = SECRET_KEY or load_secret_key(SECRET_KEY_FILE)
+    if app.config['SESSION_BACKEND'] == 'sqlite':
+        store = SQLiteSessionStore(app.config['SESSION_DB'], app.config['SESSION_CACHE_SIZE'])
+        app.session_interface = ServerSessionInterface(store)
+        REGISTRY.stats('sessions', store.stats)
+    elif app.config['SESSION_BACKEND'] != 'cookie':
+        raise ValueError(f"Unknown SESSION_BACKEND {app.config['SESSION_BACKEND']!r}")
+    services = app.extensions['hub'] = Services(app.config)
+    oauth.init_app(app)
+    instrument_flask(app, services.profiler, streams=[BREAK_STREAM])
+    assets.init_app(app)
+    compress_responses(app)
+    app.register_blueprint(bp)
+    services.start()
+    return app
+
 
 if __name__ == '__main__':
-    app.run(debug=True, port=8000)
+    create_app().run(debug=os.environ.get('FLASK_DEBUG', '1') == '1', port=int(os.environ.get('PORT', '8000')))
@@ -0,0 +1,55 @@
+"""Bulk NDJSON ingest and streaming export throughput, with peak RSS.
+
+Drives the same ingest()/export path the /api/bulk and /api/export
+endpoints use, in-process, against a temporary database.
+
+Usage: python benchmarks/bench_bulk.py [records]   (default 1,000,000)
+"""
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def ndjson_lines(count):
+    for i in range(count):
+        yield json.dumps({'user_email': f'student{i % 5000}@example.edu', 'date': '2024-01-01',
+                          'mood': 'happy', 'stress_level': i % 10 + 1, 'notes': ''}).encode()
+        if i % 1000 == 0:
+            await asyncio.sleep(0)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['WELLNESS_DB'] = os.path.join(tmp, 'bench.db')
+        import wellness_api
+
+        started = time.perf_counter()
+        result = asyncio.run(wellness_api.ingest(ndjson_lines(count), 'mood_logs', wellness_api.MoodLog))
+        elapsed = time.perf_counter() - started
+        print(f'ingest: {result["inserted"]} records in {elapsed:.1f}s '
+              f'({result["inserted"] / elapsed:,.0f}/s), peak RSS {peak_rss_mb():.0f} MB')
+
+        started = time.perf_counter()
+        exported = 0
+        fields = ['id', *wellness_api.MoodLog.model_fields, 'created_at']
+        for chunk in wellness_api._export_chunks(wellness_api.store.iter_records('mood_logs'), fields, 'ndjson'):
+            exported += chunk.count(b'\n')
+        elapsed = time.perf_counter() - started
+        print(f'export: {exported} records in {elapsed:.1f}s '
+              f'({exported / elapsed:,.0f}/s), peak RSS {peak_rss_mb():.0f} MB')
+        wellness_api.store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Cipher throughput: translation-table engine vs the per-character loops.
+
+Runs each cipher over random ASCII prose of growing size and checks the two
+implementations agree. The character loops are skipped above --max-reference
+bytes since they take minutes at the larger sizes.
+
+A second table compares pipelines: all three ciphers in one apply_many()
+call vs three separate calls, and a fused Caesar -> Vigenere -> Vigenere
+chain vs running the stages one after another.
+
+Usage: python benchmarks/bench_ciphers.py [sizes...] [--max-reference BYTES]
+       sizes accept K/M suffixes (default 1K 64K 1M 10M 50M)
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ciphers
+
+CIPHERS = {
+    'atbash': (ciphers.atbash_cipher, ciphers._atbash_chars, ()),
+    'caesar': (ciphers.caesar_cipher, ciphers._caesar_chars, (3,)),
+    'vigenere': (ciphers.vigenere_cipher, ciphers._vigenere_chars, ('Wellness',)),
+}
+
+
+def parse_size(value):
+    units = {'K': 1024, 'M': 1024 * 1024}
+    if value[-1].upper() in units:
+        return int(float(value[:-1]) * units[value[-1].upper()])
+    return int(value)
+
+
+def sample_text(size, seed=0):
+    rng = random.Random(seed)
+    words = [''.join(rng.choice('etaoinshrdlucmfwyp') for _ in range(rng.randint(1, 9)))
+             for _ in range(2000)]
+    parts, length = [], 0
+    while length < size:
+        word = rng.choice(words)
+        if rng.random() < 0.1:
+            word = word.capitalize() + rng.choice('.,!?')
+        parts.append(word)
+        length += len(word) + 1
+    return ' '.join(parts)[:size]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    args = sys.argv[1:]
+    max_reference = 10 * 1024 * 1024
+    if '--max-reference' in args:
+        i = args.index('--max-reference')
+        max_reference = parse_size(args[i + 1])
+        del args[i:i + 2]
+    sizes = [parse_size(a) for a in args] or [parse_size(s) for s in ('1K', '64K', '1M', '10M', '50M')]
+
+    bench_ciphers(sizes, max_reference)
+    print()
+    bench_pipelines(sizes)
+
+
+def bench_ciphers(sizes, max_reference):
+    print(f"{'cipher':<10}{'size':>12}{'engine':>12}{'loop':>12}{'speedup':>10}{'MB/s':>10}")
+    for size in sizes:
+        text = sample_text(size)
+        for name, (fast, slow, extra) in CIPHERS.items():
+            result, fast_time = timed(fast, text, *extra)
+            if size <= max_reference:
+                expected, slow_time = timed(slow, text, *extra)
+                assert result == expected, f'{name} output differs at size {size}'
+                loop, speedup = f'{slow_time * 1000:.1f}ms', f'{slow_time / fast_time:.0f}x'
+            else:
+                loop, speedup = '-', '-'
+            print(f'{name:<10}{size:>12,}{fast_time * 1000:>10.1f}ms{loop:>12}{speedup:>10}'
+                  f'{size / fast_time / 1e6:>10.0f}')
+
+
+def bench_pipelines(sizes):
+    single = [ciphers.Pipeline().atbash(), ciphers.Pipeline().caesar(3), ciphers.Pipeline().vigenere('Wellness')]
+    chain = ciphers.Pipeline().caesar(3).vigenere('Wellness').vigenere('Focus')
+    print(f"{'pipeline':<16}{'size':>12}{'one pass':>12}{'separate':>12}{'speedup':>10}")
+    for size in sizes:
+        text = sample_text(size)
+        outputs, together = timed(ciphers.apply_many, text, single)
+        expected, separate = timed(lambda: [p.apply(text) for p in single])
+        assert outputs == expected
+        print(f"{'all three':<16}{size:>12,}{together * 1000:>10.1f}ms{separate * 1000:>10.1f}ms"
+              f"{separate / together:>9.1f}x")
+        output, fused = timed(chain.apply, text)
+        expected, staged = timed(chain.apply_stages, text)
+        assert output == expected
+        print(f"{'chain of three':<16}{size:>12,}{fused * 1000:>10.1f}ms{staged * 1000:>10.1f}ms"
+              f"{staged / fused:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Time until the wellness page has all the data for its first render.
+
+Compares the old five separate requests (analytics, mood, sleep, goals,
+breaks) with the single /api/dashboard request, and with a revalidation
+that comes back 304. Needs the FastAPI service running
+(python wellness_api.py).
+
+Usage: python benchmarks/bench_dashboard.py [wellness_url] [rounds]
+"""
+import statistics
+import sys
+import time
+
+import requests
+
+SECTIONS = ['analytics', 'mood', 'sleep', 'goals', 'breaks']
+USER = 'bench-dashboard@example.edu'
+
+
+def seed(base_url):
+    for day in range(60):
+        requests.post(f'{base_url}/api/mood', json={
+            'user_email': USER, 'date': f'2024-01-{day % 28 + 1:02d}', 'mood': 'happy', 'stress_level': day % 10 + 1,
+        }, timeout=10)
+        requests.post(f'{base_url}/api/sleep', json={
+            'user_email': USER, 'date': f'2024-01-{day % 28 + 1:02d}', 'sleep_hours': 7.5,
+            'sleep_quality': 'good', 'academic_performance': 'good',
+        }, timeout=10)
+    for i in range(10):
+        requests.post(f'{base_url}/api/goals', json={
+            'user_email': USER, 'title': f'Goal {i}', 'description': '', 'target_date': '2024-12-01', 'status': 'pending',
+        }, timeout=10)
+
+
+def timed(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    base_url = sys.argv[1] if len(sys.argv) > 1 else 'http://localhost:8001'
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    seed(base_url)
+    params = {'user_email': USER}
+
+    def separate():
+        for section in SECTIONS:
+            requests.get(f'{base_url}/api/{section}', params=params, timeout=10).json()
+
+    def composite():
+        requests.get(f'{base_url}/api/dashboard', params=params, timeout=10).json()
+
+    etag = requests.get(f'{base_url}/api/dashboard', params=params, timeout=10).headers['ETag']
+
+    def revalidate():
+        response = requests.get(f'{base_url}/api/dashboard', params=params,
+                                headers={'If-None-Match': etag}, timeout=10)
+        assert response.status_code == 304
+
+    for name, fn in [('5 separate requests', separate), ('1 dashboard request', composite),
+                     ('dashboard 304', revalidate)]:
+        p50, p95 = timed(fn, rounds)
+        print(f'{name:<22} p50 {p50:7.2f} ms   p95 {p95:7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
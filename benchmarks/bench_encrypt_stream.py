@@ -0,0 +1,84 @@
+"""Throughput and memory of the streaming encryption endpoint.
+
+Uploads generated text to /api/encrypt-stream with chunked transfer
+encoding, hashes the streamed-back ciphertext and checks it
+against the pipeline run locally over the same chunks. Peak RSS of the
+whole process (server and client) is reported, and should stay flat as
+the size grows.
+
+Usage: python benchmarks/bench_encrypt_stream.py [megabytes...]   (default 10 100 300)
+"""
+import codecs
+import hashlib
+import os
+import random
+import resource
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as hub
+from benchmarks.stubs import serve_flask, session_cookie
+from ciphers import Pipeline
+
+CHUNK = 256 * 1024
+PARAMS = {'ciphers': 'caesar,vigenere', 'shift': 3, 'keyword': 'Wellness'}
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def text_chunks(megabytes, seed=0):
+    # Odd-sized blocks with the odd accented letter, so chunk boundaries fall
+    # mid-word and sometimes mid-character.
+    rng = random.Random(seed)
+    blocks = []
+    for n in range(7):
+        chars = [rng.choice('etaoin shrdlu ETAOIN,.\n') for _ in range(CHUNK + n * 1000)]
+        for _ in range(5):
+            chars[rng.randrange(len(chars))] = 'é'
+        blocks.append(''.join(chars).encode())
+    remaining = megabytes * 1024 * 1024
+    while remaining > 0:
+        block = rng.choice(blocks)
+        remaining -= len(block)
+        yield block
+
+
+def expected_digest(megabytes):
+    pipeline = Pipeline().caesar(PARAMS['shift']).vigenere(PARAMS['keyword'])
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    digest = hashlib.sha256()
+    for output in pipeline.stream(decoder.decode(block) for block in text_chunks(megabytes)):
+        digest.update(output.encode())
+    return digest.hexdigest()
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 100, 300]
+    flask_app = hub.create_app()
+    server, base_url = serve_flask(flask_app)
+    cookies = session_cookie(flask_app)
+    print(f"{'size':>8}{'seconds':>10}{'MB/s':>8}{'peak RSS':>12}  output")
+    try:
+        for megabytes in sizes:
+            digest = hashlib.sha256()
+            started = time.perf_counter()
+            with requests.post(f'{base_url}/api/encrypt-stream', params=PARAMS, cookies=cookies,
+                               data=text_chunks(megabytes), stream=True) as response:
+                response.raise_for_status()
+                for block in response.iter_content(CHUNK):
+                    digest.update(block)
+            elapsed = time.perf_counter() - started
+            status = 'matches' if digest.hexdigest() == expected_digest(megabytes) else 'DIFFERS'
+            print(f'{megabytes:>6}MB{elapsed:>10.1f}{megabytes / elapsed:>8.1f}{peak_rss_mb():>10.0f}MB  {status}')
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Latency of GET /api/joke: a live JokeAPI call per request (the old
+handler) vs popping from the prefetched JokePool, and how the pool copes
+with a burst, a category that is rarely returned, and JokeAPI failing.
+
+Runs app.py against a local JokeAPI stand-in that takes `delay` ms.
+
+Usage: python benchmarks/bench_jokes.py [requests] [delay ms]   (default 2000, 100ms)
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as hub
+from benchmarks.stubs import JokeAPIStub, serve, session_cookie
+from joke_pool import JokePool, joke_text
+
+
+class LiveCall:
+    """What /api/joke did before the pool: one upstream call per request."""
+
+    def __init__(self, session, url):
+        self.session, self.url = session, url
+
+    def get(self, category=None):
+        response = self.session.get(f'{self.url}/{category or "Any"}?safe-mode', timeout=10)
+        joke_data = response.json()
+        return joke_text(joke_data), joke_data.get('category', 'General'), 'live'
+
+
+def measure(client, count, category=None):
+    samples, sources = [], {}
+    query = {'category': category} if category else {}
+    for _ in range(count):
+        started = time.perf_counter()
+        data = client.get('/api/joke', query_string=query).get_json()
+        samples.append((time.perf_counter() - started) * 1000)
+        sources[data['source']] = sources.get(data['source'], 0) + 1
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1], sources
+
+
+def measure_paced(client, count):
+    # Slow enough for the refills to keep up
+    samples, sources = [], {}
+    for _ in range(count):
+        started = time.perf_counter()
+        data = client.get('/api/joke').get_json()
+        samples.append((time.perf_counter() - started) * 1000)
+        sources[data['source']] = sources.get(data['source'], 0) + 1
+        time.sleep(max(0.0, 0.02 - (time.perf_counter() - started)))
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1], sources
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    JokeAPIStub.delay = (float(sys.argv[2]) if len(sys.argv) > 2 else 100) / 1000
+    _, base_url = serve(JokeAPIStub)
+    url = f'{base_url}/joke'
+    session = hub.make_session(2, 1, 0.5)
+    flask_app = hub.create_app()
+    services = flask_app.extensions['hub']
+    client = flask_app.test_client()
+    for name, value in session_cookie(flask_app).items():
+        client.set_cookie(name, value)
+
+    def row(name, result, calls):
+        p50, p99, sources = result
+        print(f'{name:<34}{p50:>9.3f}{p99:>9.3f}{calls:>10}  {sources}')
+
+    print(f'{JokeAPIStub.delay * 1000:.0f}ms upstream; latency through the Flask test client')
+    print(f"{'path':<34}{'p50 ms':>9}{'p99 ms':>9}{'upstream':>10}  served from")
+
+    services.joke_pool = LiveCall(session, url)
+    before = JokeAPIStub.calls
+    row('live JokeAPI call', measure(client, min(count, 100)), JokeAPIStub.calls - before)
+
+    services.joke_pool = pool = JokePool(session, url)
+    pool.start()
+    while pool.stats()['size'] < pool.capacity:
+        time.sleep(0.01)
+    before = JokeAPIStub.calls
+    row('pool, steady (50 requests/s)', measure_paced(client, 250), JokeAPIStub.calls - before)
+    before = JokeAPIStub.calls
+    row('pool, burst', measure(client, count), JokeAPIStub.calls - before)
+    time.sleep(JokeAPIStub.delay * 20)
+    before = JokeAPIStub.calls
+    row('pool, category=Christmas', measure(client, 50, 'Christmas'), JokeAPIStub.calls - before)
+    refilled = time.perf_counter() + 5
+    while pool.stats()['size'] < pool.capacity and time.perf_counter() < refilled:
+        time.sleep(0.01)
+    started = time.perf_counter()
+    for _ in range(pool.capacity // 2):
+        pool.get()
+    print(f'{"JokePool.get() alone":<34}{(time.perf_counter() - started) / (pool.capacity // 2) * 1000:>9.4f}')
+    JokeAPIStub.fail = True
+    before = JokeAPIStub.calls
+    row('pool, JokeAPI failing', measure(client, count), JokeAPIStub.calls - before)
+    print(pool.stats())
+
+
+if __name__ == '__main__':
+    main()
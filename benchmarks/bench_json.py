@@ -0,0 +1,93 @@
+"""JSON encoding cost of large wellness listings and analytics payloads.
+
+For each payload, compares what the services used to do with fastjson
+(orjson when installed):
+  - FastAPI: jsonable_encoder + JSONResponse (the default for a returned
+    dict) vs returning FastJSONResponse directly
+  - Flask: jsonify with Flask's default provider vs FastJSONProvider
+  - store: json.loads/json.dumps of each record's data column vs fastjson
+
+Usage: python benchmarks/bench_json.py [records,...] [rounds]
+       (default 100,1000,10000 records, 20 rounds)
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Importing the services opens their databases; keep them out of the way
+_scratch = tempfile.mkdtemp()
+os.environ.update(QR_WORKERS='0', MAIL_DB=os.path.join(_scratch, 'mail.db'),
+                  WELLNESS_DB=os.path.join(_scratch, 'wellness.db'))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from flask import Flask, jsonify
+
+import fastjson
+from app import FastJSONProvider
+from wellness_api import FastJSONResponse, _analytics
+
+
+def mood_logs(count):
+    return [{'user_email': 'student@example.edu', 'date': f'2024-{n % 12 + 1:02d}-{n % 28 + 1:02d}',
+             'mood': ('happy', 'okay', 'stressed')[n % 3], 'stress_level': n % 10 + 1,
+             'notes': 'Exam week, slept badly but the walk helped' if n % 4 else '',
+             'created_at': f'2024-03-01T12:{n % 60:02d}:00.123456', 'id': n + 1} for n in range(count)]
+
+
+def analytics_payload(count):
+    stats = {'mood_logs': {'count': count, 'values': [n % 10 + 1 for n in range(90)]},
+             'sleep_logs': {'count': count, 'values': [6 + n % 3 * 0.5 for n in range(90)]},
+             'goals': {'completed': 3, 'in_progress': 2, 'pending': 5}}
+    return {'success': True, 'analytics': _analytics(stats), 'mood': mood_logs(min(count, 30))}
+
+
+def timed(fn, rounds):
+    fn()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1000
+
+
+def main():
+    counts = [int(n) for n in sys.argv[1].split(',')] if len(sys.argv) > 1 else [100, 1000, 10000]
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    stdlib_app, fast_app = Flask('stdlib'), Flask('fast')
+    fast_app.json = FastJSONProvider(fast_app)
+
+    print(f'fastjson backend: {fastjson.BACKEND}')
+    print(f"{'payload':<22}{'path':<10}{'KB':>8}{'before ms':>11}{'after ms':>10}{'speedup':>9}")
+    for count in counts:
+        logs = mood_logs(count)
+        payloads = [(f'{count} mood logs', {'success': True, 'logs': logs, 'next_cursor': None}),
+                    (f'analytics ({count})', analytics_payload(count))]
+        for name, payload in payloads:
+            size = len(fastjson.dumpb(payload)) / 1024
+            with stdlib_app.app_context():
+                flask_before = timed(lambda: jsonify(payload), rounds)
+            with fast_app.app_context():
+                flask_after = timed(lambda: jsonify(payload), rounds)
+            rows = [
+                ('fastapi', timed(lambda: JSONResponse(jsonable_encoder(payload)), rounds),
+                 timed(lambda: FastJSONResponse(payload), rounds)),
+                ('flask', flask_before, flask_after),
+            ]
+            for path, before, after in rows:
+                print(f'{name:<22}{path:<10}{size:>8.0f}{before:>11.2f}{after:>10.2f}{before / after:>8.1f}x')
+
+        rows = [json.dumps({k: v for k, v in log.items() if k != 'id'}) for log in logs]
+        before = timed(lambda: [json.loads(row) for row in rows], rounds)
+        after = timed(lambda: [fastjson.loads(row) for row in rows], rounds)
+        print(f"{f'{count} mood logs':<22}{'store rd':<10}{'':>8}{before:>11.2f}{after:>10.2f}{before / after:>8.1f}x")
+        before = timed(lambda: [json.dumps(log) for log in logs], rounds)
+        after = timed(lambda: [fastjson.dumps(log) for log in logs], rounds)
+        print(f"{f'{count} mood logs':<22}{'store wr':<10}{'':>8}{before:>11.2f}{after:>10.2f}{before / after:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Email throughput: one SMTP connection per message (what the email
+endpoints used to do) vs MailDispatcher reusing sessions from its workers,
+and one bulk request to a whole class vs a request per recipient.
+
+Messages go to a local SMTP sink that sleeps `connect` ms before its
+greeting and `command` ms before each reply, standing in for the TLS
+handshake and network round trips of a real server.
+
+Usage: python benchmarks/bench_mail.py [messages] [connect ms] [command ms] [class size]
+       (default 200 messages, 30ms connect, 2ms per command, class of 500)
+"""
+import os
+import smtplib
+import sys
+import tempfile
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import SMTPSink, serve_smtp
+from mailer import MailDispatcher, SMTPSettings
+
+SENDER = 'hub@example.edu'
+
+
+def message(n):
+    msg = MIMEMultipart()
+    msg['From'] = SENDER
+    msg['To'] = f'student{n}@example.edu'
+    msg['Subject'] = 'Your Daily Joke from IntegrativeHub!'
+    msg.attach(MIMEText(f'<html><body><p>Joke number {n}</p></body></html>' + ' ' * 2000, 'html'))
+    return msg
+
+
+def connect_per_message(settings, messages):
+    started = time.perf_counter()
+    for msg in messages:
+        with smtplib.SMTP(settings.host, settings.port) as server:
+            server.login(settings.username, settings.password)
+            server.send_message(msg)
+    return time.perf_counter() - started
+
+
+def dispatcher(settings, messages, workers):
+    with tempfile.TemporaryDirectory() as directory:
+        mailer = MailDispatcher(os.path.join(directory, 'mail.db'), settings, workers=workers)
+        started = time.perf_counter()
+        mailer.start()
+        for msg in messages:
+            mailer.submit(msg, SENDER, [msg['To']])
+        queued = time.perf_counter() - started
+        while mailer.stats()['jobs'].get('sent', 0) < len(messages):
+            time.sleep(0.005)
+        elapsed = time.perf_counter() - started
+        mailer.stop()
+        return elapsed, queued, mailer.stats()
+
+
+def class_send(port, size, directory):
+    # The app reads its mail settings at import, so point them at the sink first
+    os.environ.update(MAIL_DB=os.path.join(directory, 'app-mail.db'), SMTP_SERVER='127.0.0.1',
+                      SMTP_PORT=str(port), SMTP_STARTTLS='0', QR_WORKERS='0')
+    import app as hub
+    from benchmarks.stubs import session_cookie
+
+    flask_app = hub.create_app()
+    mailer = flask_app.extensions['hub'].mailer
+    client = flask_app.test_client()
+    for name, value in session_cookie(flask_app).items():
+        client.set_cookie(name, value)
+    emails = [f'student{n}@example.edu' for n in range(size)]
+    payload = {'joke': 'Why do programmers prefer dark mode? Because light attracts bugs.', 'include_qr': True}
+
+    def wait_sent(total):
+        while mailer.stats()['jobs'].get('sent', 0) < total:
+            time.sleep(0.005)
+
+    rows = []
+    connections = mailer.connections
+    started = time.perf_counter()
+    for email in emails:
+        client.post('/api/send-joke-email', json={**payload, 'email': email})
+    requested = time.perf_counter() - started
+    wait_sent(size)
+    rows.append(('request per recipient', size, requested, time.perf_counter() - started,
+                 mailer.connections - connections))
+    connections = mailer.connections
+    started = time.perf_counter()
+    client.post('/api/send-joke-email/bulk', json={**payload, 'emails': emails})
+    requested = time.perf_counter() - started
+    wait_sent(size * 2)
+    rows.append(('one bulk request', 1, requested, time.perf_counter() - started,
+                 mailer.connections - connections))
+    mailer.stop()
+    return rows
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    SMTPSink.connect_delay = (float(sys.argv[2]) if len(sys.argv) > 2 else 30) / 1000
+    SMTPSink.command_delay = (float(sys.argv[3]) if len(sys.argv) > 3 else 2) / 1000
+    size = int(sys.argv[4]) if len(sys.argv) > 4 else 500
+    server, port = serve_smtp()
+    settings = SMTPSettings('127.0.0.1', port, 'hub', 'secret', starttls=False)
+    messages = [message(n) for n in range(count)]
+
+    print(f"{'path':<26}{'msgs/s':>10}{'connections':>13}{'submit ms/msg':>15}")
+    try:
+        before = SMTPSink.connections
+        elapsed = connect_per_message(settings, messages)
+        print(f"{'connect per message':<26}{count / elapsed:>10.0f}{SMTPSink.connections - before:>13}"
+              f"{elapsed / count * 1000:>15.2f}")
+        for workers in (1, 2, 4):
+            elapsed, queued, stats = dispatcher(settings, messages, workers)
+            print(f"{f'dispatcher, {workers} workers':<26}{count / elapsed:>10.0f}"
+                  f"{stats['connections_opened']:>13}{queued / count * 1000:>15.2f}")
+
+        print(f"\nJoke with QR code to a class of {size}, through the app")
+        print(f"{'path':<26}{'requests':>10}{'request s':>11}{'all sent s':>12}{'connections':>13}")
+        with tempfile.TemporaryDirectory() as directory:
+            for name, requests, requested, sent, connections in class_send(port, size, directory):
+                print(f'{name:<26}{requests:>10}{requested:>11.2f}{sent:>12.2f}{connections:>13}')
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
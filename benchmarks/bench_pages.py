@@ -0,0 +1,137 @@
+"""Bytes on the wire and server time for loading each page of the Flask app.
+
+Loads every page as a signed-in browser would: the HTML, then each local
+stylesheet and script it links to. Responses are kept in a simulated
+browser cache that follows Cache-Control, ETag and Last-Modified, so a
+repeat visit only costs the revalidations and downloads a real browser
+would make. Each load is done twice, once with `Accept-Encoding: identity`
+and once with the encodings a browser sends. Bytes count the status line,
+headers and body of each response.
+
+Usage: python benchmarks/bench_pages.py [rounds]   (default 50)
+"""
+import gzip
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The app opens its databases; keep them out of the way
+_scratch = tempfile.mkdtemp()
+os.environ.update(QR_WORKERS='0', MAIL_DB=os.path.join(_scratch, 'mail.db'),
+                  SESSION_DB=os.path.join(_scratch, 'sessions.db'),
+                  SECRET_KEY_FILE=os.path.join(_scratch, 'secret.key'))
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import app as hub
+from benchmarks.stubs import session_cookie
+
+flask_app = hub.create_app()
+
+PAGES = ['/dashboard', '/weather', '/jokes', '/encrypt', '/wellness', '/profile']
+LOCAL_ASSET = re.compile(r'(?:src|href)="(/static/[^"]+)"')
+BROWSER_ENCODINGS = 'gzip, deflate, br'
+
+
+class Browser:
+    """A test client with an HTTP cache in front of it."""
+
+    def __init__(self, client, encodings):
+        self.client = client
+        self.encodings = encodings
+        self.cache = {}
+
+    def get(self, url):
+        """(bytes received, requests made, body) for `url`."""
+        now = time.time()
+        cached = self.cache.get(url)
+        headers = {'Accept-Encoding': self.encodings}
+        if cached:
+            if cached['fresh_until'] > now:
+                return 0, 0, cached['body']
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+        response = self.client.get(url, headers=headers)
+        body = response.get_data()
+        size = len(f'HTTP/1.1 {response.status}\r\n') + len(body) + \
+            sum(len(name) + len(value) + 4 for name, value in response.headers.items())
+        if response.status_code == 304:
+            cached['fresh_until'] = now + max_age(response.headers.get('Cache-Control', ''))
+            return size, 1, cached['body']
+        if response.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        elif response.headers.get('Content-Encoding') == 'br':
+            body = brotli.decompress(body)
+        self.cache[url] = {'body': body, 'etag': response.headers.get('ETag'),
+                           'last_modified': response.headers.get('Last-Modified'),
+                           'fresh_until': now + max_age(response.headers.get('Cache-Control', ''))}
+        return size, 1, body
+
+    def load(self, page):
+        size, requests, body = self.get(page)
+        for asset in LOCAL_ASSET.findall(body.decode()):
+            asset_size, asset_requests, _ = self.get(asset.replace('&amp;', '&'))
+            size += asset_size
+            requests += asset_requests
+        return size, requests
+
+
+def max_age(cache_control):
+    if 'no-cache' in cache_control or 'no-store' in cache_control:
+        return 0
+    match = re.search(r'max-age=(\d+)', cache_control)
+    return int(match.group(1)) if match else 0
+
+
+def client():
+    test_client = flask_app.test_client()
+    for name, value in session_cookie(flask_app).items():
+        test_client.set_cookie(name, value)
+    return test_client
+
+
+def timed_loads(page, encodings, rounds, repeat):
+    """Median ms of server time for a first (or repeat) visit to `page`."""
+    times = []
+    for _ in range(rounds):
+        browser = Browser(client(), encodings)
+        if repeat:
+            browser.load(page)
+        started = time.perf_counter()
+        browser.load(page)
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(f"{'page':<12}{'encoding':<10}{'first KB':>10}{'reqs':>6}{'first ms':>10}"
+          f"{'repeat KB':>11}{'reqs':>6}{'repeat ms':>11}")
+    totals = {}
+    for page in PAGES:
+        for label, encodings in (('identity', 'identity'), ('browser', BROWSER_ENCODINGS)):
+            browser = Browser(client(), encodings)
+            first, first_requests = browser.load(page)
+            repeat, repeat_requests = browser.load(page)
+            first_ms = timed_loads(page, encodings, rounds, repeat=False)
+            repeat_ms = timed_loads(page, encodings, rounds, repeat=True)
+            total = totals.setdefault(label, [0, 0])
+            total[0] += first
+            total[1] += repeat
+            print(f'{page:<12}{label:<10}{first / 1024:>10.1f}{first_requests:>6}{first_ms:>10.2f}'
+                  f'{repeat / 1024:>11.1f}{repeat_requests:>6}{repeat_ms:>11.2f}')
+    for label, (first, repeat) in totals.items():
+        print(f"{'all pages':<12}{label:<10}{first / 1024:>10.1f}{'':>16}{repeat / 1024:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Requests per second through the Flask wellness proxy.
+
+Runs app.py against a local stand-in for the FastAPI service and compares
+the old proxy (a new connection per call, body re-encoded with jsonify)
+with the pooled, streaming pass-through proxy.
+
+Usage: python benchmarks/bench_proxy.py [clients] [requests_per_client]
+"""
+import os
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as hub
+from benchmarks.stubs import WellnessStub, serve, serve_flask, session_cookie
+
+
+def load(base_url, cookies, clients, per_client):
+    def client():
+        with requests.Session() as http:
+            http.cookies.update(cookies)
+            for _ in range(per_client):
+                http.get(f'{base_url}/api/wellness/mood').raise_for_status()
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return clients * per_client / (time.perf_counter() - started)
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_client = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    _, hub.FASTAPI_URL = serve(WellnessStub)
+    flask_app = hub.create_app()
+    services = flask_app.extensions['hub']
+    _, base_url = serve_flask(flask_app)
+    cookies = session_cookie(flask_app)
+    pooled = services.wellness_session
+
+    # Before: module-level requests calls (fresh connection each time) + jsonify
+    services.wellness_session, hub.WELLNESS_PROXY_STREAM = requests, False
+    before = load(base_url, cookies, clients, per_client)
+
+    services.wellness_session, hub.WELLNESS_PROXY_STREAM = pooled, True
+    after = load(base_url, cookies, clients, per_client)
+
+    print(f'{clients} clients x {per_client} requests')
+    print(f'per-call connection + jsonify: {before:8.0f} req/s')
+    print(f'pooled streaming pass-through: {after:8.0f} req/s')
+
+
+if __name__ == '__main__':
+    main()
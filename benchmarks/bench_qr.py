@@ -0,0 +1,57 @@
+"""QR code latency: rendering vs the memory and disk tiers of QRCache,
+and bytes on the wire for the base64 JSON vs the raw PNG endpoint.
+
+Usage: python benchmarks/bench_qr.py [texts] [repeats]   (default 200 texts, 5 repeats)
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as hub
+from benchmarks.stubs import session_cookie
+from qr_cache import QR_DEFAULTS, QRCache
+
+
+def timed_ms(fn, texts):
+    samples = []
+    for text in texts:
+        started = time.perf_counter()
+        fn(text)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    texts = [f'Why did test {i} cross the road? To get to the other side, eventually.' for i in range(count)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = QRCache(64 * 1024 * 1024, directory)
+        rows = [('render (miss)', timed_ms(lambda t: cache.get(t, QR_DEFAULTS), texts))]
+        rows.append(('memory hit', timed_ms(lambda t: cache.get(t, QR_DEFAULTS), texts * repeats)))
+        cold = QRCache(64 * 1024 * 1024, directory)
+        rows.append(('disk hit', timed_ms(lambda t: cold.get(t, QR_DEFAULTS), texts)))
+        print(f"{'path':<16}{'p50 ms':>10}{'max ms':>10}")
+        for name, (p50, worst) in rows:
+            print(f'{name:<16}{p50:>10.3f}{worst:>10.3f}')
+        print(cache.stats())
+
+    flask_app = hub.create_app()
+    client = flask_app.test_client()
+    for name, value in session_cookie(flask_app).items():
+        client.set_cookie(name, value)
+    json_bytes = len(client.post('/api/generate-qr', json={'text': texts[0]}).data)
+    png = client.get('/api/qr.png', query_string={'text': texts[0]})
+    revalidated = client.get('/api/qr.png', query_string={'text': texts[0]},
+                             headers={'If-None-Match': png.headers['ETag']})
+    print(f'\n/api/generate-qr JSON: {json_bytes} bytes; /api/qr.png: {len(png.data)} bytes; '
+          f'revalidation: {revalidated.status_code} with {len(revalidated.data)} bytes')
+
+
+if __name__ == '__main__':
+    main()
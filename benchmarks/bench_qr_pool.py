@@ -0,0 +1,86 @@
+"""QR rendering throughput with and without the worker pool, and the
+latency of an unrelated route while QR requests are being rendered.
+
+Each configuration runs the Flask app on a threaded server. Client threads
+request /api/qr.png for texts that are never cached, while a probe thread
+requests a cheap route (/api/qr/stats) and records its latency. Inline
+rendering holds the GIL in the web process; with the pool that work moves
+to other processes and should scale with cores.
+
+Usage: python benchmarks/bench_qr_pool.py [seconds] [clients] [worker counts...]
+       (default 5 seconds, 8 clients, workers 0 (inline) 1 2 and cpu count)
+"""
+import itertools
+import os
+import statistics
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as hub
+from benchmarks.stubs import serve_flask, session_cookie
+from qr_cache import QRCache, RenderPool
+
+
+def run(services, workers, seconds, clients, base_url, cookies):
+    pool = RenderPool(workers, max_pending=clients * 2) if workers else None
+    services.qr_cache = QRCache(64 * 1024 * 1024, pool=pool)
+    if pool:
+        services.qr_cache.get('warm up')  # start the worker processes before timing
+    counter = itertools.count()
+    stop = time.perf_counter() + seconds
+    rendered, rejected, probes = [], [], []
+
+    def client():
+        with requests.Session() as http:
+            http.cookies.update(cookies)
+            while time.perf_counter() < stop:
+                text = f'Benchmark text number {next(counter)} that is long enough to need a bigger code'
+                response = http.get(f'{base_url}/api/qr.png', params={'text': text})
+                (rendered if response.status_code == 200 else rejected).append(1)
+
+    def probe():
+        with requests.Session() as http:
+            http.cookies.update(cookies)
+            while time.perf_counter() < stop:
+                started = time.perf_counter()
+                http.get(f'{base_url}/api/qr/stats').raise_for_status()
+                probes.append((time.perf_counter() - started) * 1000)
+                time.sleep(0.01)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)] + [threading.Thread(target=probe)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if pool:
+        pool.shutdown()
+    probes.sort()
+    return (len(rendered) / seconds, len(rejected), statistics.median(probes),
+            probes[int(len(probes) * 0.99) - 1])
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    counts = [int(arg) for arg in sys.argv[3:]] or sorted({0, 1, 2, os.cpu_count() or 1})
+    flask_app = hub.create_app()
+    server, base_url = serve_flask(flask_app)
+    cookies = session_cookie(flask_app)
+    print(f'{os.cpu_count()} cpus, {clients} clients, {seconds:.0f}s each')
+    print(f"{'workers':<10}{'QR/s':>8}{'429s':>8}{'probe p50':>12}{'probe p99':>12}")
+    try:
+        for workers in counts:
+            rate, rejected, p50, p99 = run(flask_app.extensions['hub'], workers, seconds, clients, base_url, cookies)
+            label = str(workers) if workers else 'inline'
+            print(f'{label:<10}{rate:>8.0f}{rejected:>8}{p50:>10.1f}ms{p99:>10.1f}ms')
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
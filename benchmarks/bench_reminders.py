@@ -0,0 +1,83 @@
+"""Cost of holding and firing break reminders in one process.
+
+With `reminders` breaks spread over `users` users and the day's minutes,
+measures the scheduler's startup load from the store, scheduling and
+cancelling single reminders, firing a day's worth of them, and the
+memory they hold. Then, with the scheduler running, adds a break through
+the store due two seconds ahead and times how late it reaches a
+subscriber's queue.
+
+Usage: python benchmarks/bench_reminders.py [reminders] [users]   (default 100000 5000)
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from break_scheduler import BreakScheduler, Subscribers
+from wellness_store import WellnessStore
+
+ZONES = [None, 'Asia/Manila', 'Europe/Berlin', 'America/New_York']
+
+
+def break_record(i, users):
+    minute = random.randrange(24 * 60)
+    return {'user_email': f'student{i % users}@example.edu', 'activity': 'Walk', 'duration_minutes': 10,
+            'scheduled_time': f'{minute // 60:02d}:{minute % 60:02d}', 'timezone': ZONES[i % len(ZONES)]}
+
+
+def timed(label, count, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f'{label:<34}{elapsed * 1000:>10.1f} ms{elapsed / count * 1e6:>10.2f} us each')
+    return result
+
+
+async def push_latency(store, subscribers):
+    queue = subscribers.subscribe('latency@example.edu')
+    due = int(time.time()) + 2
+    store.insert('breaks', {'user_email': 'latency@example.edu', 'activity': 'Walk', 'duration_minutes': 10,
+                            'scheduled_time': time.strftime('%H:%M:%S', time.localtime(due))})
+    await queue.get()
+    return time.time() - due
+
+
+def main():
+    reminders = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as scratch:
+        store = WellnessStore(os.path.join(scratch, 'wellness.db'))
+        store.insert_many('breaks', [break_record(i, users) for i in range(reminders)])
+        subscribers = Subscribers()
+        # Firing a day at once makes most of them late; count them as fired
+        scheduler = BreakScheduler(store, subscribers, misfire_grace=2 * 86400)
+
+        timed('load every break from the store', reminders, scheduler._load_all)
+        tracemalloc.start()
+        scheduler._load_all()
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{'memory held':<34}{held / 1024 / 1024:>10.1f} MB{held / reminders:>10.0f} B each")
+
+        extra = [dict(break_record(i, users), id=reminders + 1 + i) for i in range(10000)]
+        timed('schedule one more', len(extra), lambda: [scheduler.schedule(record) for record in extra])
+        timed('cancel one', len(extra), lambda: [scheduler.cancel(record['id']) for record in extra])
+        timed("fire a day's reminders", reminders, lambda: scheduler._due(time.time() + 86400))
+        print(scheduler.stats())
+
+        scheduler.start()
+        scheduler.ready.wait()
+        print(f"{'due to subscriber queue':<34}{asyncio.run(push_latency(store, subscribers)) * 1000:>10.1f} ms")
+        scheduler.stop()
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Read/write latency of WellnessStore as the mood log table grows.
+
+Usage: python benchmarks/bench_store.py [rows ...]   (default 1k 10k 100k 1M)
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wellness_store import WellnessStore
+
+USERS = 1000
+SAMPLES = 2000
+
+
+def mood_log(user):
+    return {
+        'user_email': f'student{user}@example.edu',
+        'date': '2024-01-01',
+        'mood': random.choice(['happy', 'neutral', 'sad', 'stressed', 'anxious']),
+        'stress_level': random.randint(1, 10),
+        'notes': '',
+    }
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return (
+        statistics.median(samples) * 1000,
+        samples[int(len(samples) * 0.99) - 1] * 1000,
+    )
+
+
+def fill(store, rows):
+    batch = 10000
+    for start in range(0, rows, batch):
+        store.insert_many('mood_logs', [mood_log(i % USERS) for i in range(start, min(rows, start + batch))])
+
+
+def measure(fn):
+    samples = []
+    for _ in range(SAMPLES):
+        user = random.randrange(USERS)
+        started = time.perf_counter()
+        fn(user)
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000, 1_000_000]
+    print(f'{"rows":>10} {"read p50":>10} {"read p99":>10} {"write p50":>10} {"write p99":>10}  (ms)')
+    with tempfile.TemporaryDirectory() as tmp:
+        store = WellnessStore(os.path.join(tmp, 'bench.db'))
+        filled = 0
+        for size in sorted(sizes):
+            fill(store, size - filled)
+            filled = size
+            read = measure(lambda user: store.list('mood_logs', f'student{user}@example.edu', 30))
+            write = measure(lambda user: store.insert('mood_logs', mood_log(user)))
+            filled += SAMPLES
+            print(f'{size:>10} {read[0]:>10.3f} {read[1]:>10.3f} {write[0]:>10.3f} {write[1]:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
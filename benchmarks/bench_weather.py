@@ -0,0 +1,115 @@
+"""Latency and upstream calls of POST /api/weather with and without the cache.
+
+Runs app.py against a local OpenWeatherMap stand-in that takes `delay` ms
+per answer. Clients ask about cities drawn from a skewed distribution, the
+way a class tends to ask about the same few places. Compared:
+a fresh connection and upstream call per request (the old handler), the
+cache with a long TTL, and a TTL short enough that entries keep expiring
+and are refreshed in the background while the stale copy is served.
+Then, on a cold cache, N cities one request at a time vs one
+POST /api/weather/batch.
+
+Usage: python benchmarks/bench_weather.py [clients] [requests_per_client] [delay ms] [cities]
+       (default 16 clients, 100 requests each, 50ms, 200 cities)
+"""
+import os
+import random
+import sys
+import threading
+import time
+from functools import partial
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as hub
+from benchmarks.stubs import OpenWeatherStub, serve, serve_flask, session_cookie
+from weather_cache import WeatherCache
+
+
+class NoCache:
+    def get(self, city, units):
+        return (*hub.fetch_weather(requests, city, units), 'miss')
+
+
+def load(base_url, cookies, clients, per_client, cities):
+    latencies = []
+
+    def client(seed):
+        rng = random.Random(seed)
+        with requests.Session() as http:
+            http.cookies.update(cookies)
+            for _ in range(per_client):
+                city = cities[min(int(rng.paretovariate(1.2)) - 1, len(cities) - 1)]
+                started = time.perf_counter()
+                http.post(f'{base_url}/api/weather', json={'city': city}).raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1]
+
+
+def batch_vs_single(services, base_url, cookies, count):
+    rows = []
+    with requests.Session() as http:
+        http.cookies.update(cookies)
+        for name in ('one request per city', 'one batch request'):
+            services.weather_cache = WeatherCache(partial(hub.fetch_weather, services.weather_session),
+                                                  fetch_workers=hub.WEATHER_BATCH_CONCURRENCY)
+            cities = [f'{name} city {n}' for n in range(count)]
+            before = OpenWeatherStub.calls
+            started = time.perf_counter()
+            if name == 'one batch request':
+                http.post(f'{base_url}/api/weather/batch', json={'locations': cities}).raise_for_status()
+            else:
+                for city in cities:
+                    http.post(f'{base_url}/api/weather', json={'city': city}).raise_for_status()
+            rows.append((name, (time.perf_counter() - started) * 1000, OpenWeatherStub.calls - before))
+    return rows
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_client = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    OpenWeatherStub.delay = (float(sys.argv[3]) if len(sys.argv) > 3 else 50) / 1000
+    cities = [f'City {n}' for n in range(int(sys.argv[4]) if len(sys.argv) > 4 else 200)]
+
+    _, base_url = serve(OpenWeatherStub)
+    hub.OPENWEATHER_URL = f'{base_url}/data/2.5/weather'
+    flask_app = hub.create_app()
+    services = flask_app.extensions['hub']
+    _, app_url = serve_flask(flask_app)
+    cookies = session_cookie(flask_app)
+    pooled = partial(hub.fetch_weather, services.weather_session)
+
+    runs = [
+        ('per-call connection, no cache', NoCache()),
+        ('pooled, ttl 600s', WeatherCache(pooled, ttl=600)),
+        ('pooled, ttl 0.2s + stale', WeatherCache(pooled, ttl=0.2, stale_ttl=600)),
+    ]
+    print(f'{clients} clients x {per_client} requests, {len(cities)} cities, '
+          f'{OpenWeatherStub.delay * 1000:.0f}ms upstream')
+    print(f"{'path':<32}{'req/s':>8}{'p50 ms':>9}{'p99 ms':>9}{'upstream':>10}")
+    for name, cache in runs:
+        services.weather_cache = cache
+        before = OpenWeatherStub.calls
+        rate, p50, p99 = load(app_url, cookies, clients, per_client, cities)
+        print(f'{name:<32}{rate:>8.0f}{p50:>9.1f}{p99:>9.1f}{OpenWeatherStub.calls - before:>10}')
+
+    time.sleep(1)  # let the last run's background refreshes finish
+    for count in (5, 10, 25):
+        print(f'\n{count} uncached cities, {hub.WEATHER_BATCH_CONCURRENCY} fetched at once')
+        for name, elapsed, calls in batch_vs_single(services, app_url, cookies, count):
+            print(f'{name:<32}{elapsed:>8.0f}ms{calls:>10} upstream')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Throughput of the FastAPI service as clients and uvicorn workers grow.
+
+Starts wellness_api.py with 1, 2 and 4 uvicorn workers on a fresh
+database each time, then runs a mix of 90% reads (dashboard, mood list,
+analytics) and 10% mood writes from 1 to 64 concurrent clients. Every
+write is followed by a read of that user's mood list on a new connection,
+which may land on another worker; a read that misses the new entry is
+counted as stale.
+
+Workers only add throughput with CPUs to run them on; on a single core
+the interesting numbers are the tail latencies and the stale count.
+
+Usage: python benchmarks/bench_wellness_concurrency.py [requests_per_client] [workers,...] [clients,...]
+       (default 100 requests, workers 1,2,4, clients 1,4,16,64)
+"""
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stubs import free_port
+
+USERS = [f'student{n}@example.edu' for n in range(20)]
+
+
+def start_service(workers, directory):
+    port = free_port()
+    env = dict(os.environ, WELLNESS_DB=os.path.join(directory, f'wellness-{workers}.db'),
+               WELLNESS_WORKERS=str(workers), WELLNESS_PORT=str(port))
+    process = subprocess.Popen([sys.executable, 'wellness_api.py'], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    for _ in range(200):
+        try:
+            requests.get(f'{base_url}/api/cache/stats', timeout=1)
+            return process, base_url
+        except requests.ConnectionError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError('wellness_api did not start')
+
+
+def mood(user, rng):
+    return {'user_email': user, 'date': f'2024-03-{rng.randrange(1, 29):02d}', 'mood': 'okay',
+            'stress_level': rng.randrange(1, 11)}
+
+
+def seed(base_url):
+    rng = random.Random(0)
+    with requests.Session() as http:
+        for user in USERS:
+            for _ in range(30):
+                http.post(f'{base_url}/api/mood', json=mood(user, rng)).raise_for_status()
+
+
+def load(base_url, clients, per_client):
+    latencies, stale = [], [0]
+
+    def client(seed):
+        rng = random.Random(seed)
+        with requests.Session() as http:
+            for _ in range(per_client):
+                user = rng.choice(USERS)
+                params = {'user_email': user}
+                roll = rng.random()
+                started = time.perf_counter()
+                if roll < 0.1:
+                    created = http.post(f'{base_url}/api/mood', json=mood(user, rng)).json()['log']
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    # A new connection, so the read can be served by any worker
+                    logs = requests.get(f'{base_url}/api/mood', params={**params, 'limit': 5}).json()['logs']
+                    if created['id'] not in [log['id'] for log in logs]:
+                        stale[0] += 1
+                    continue
+                if roll < 0.5:
+                    http.get(f'{base_url}/api/dashboard', params=params).raise_for_status()
+                elif roll < 0.8:
+                    http.get(f'{base_url}/api/mood', params=params).raise_for_status()
+                else:
+                    http.get(f'{base_url}/api/analytics', params=params).raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return (len(latencies) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1],
+            stale[0])
+
+
+def main():
+    per_client = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    worker_counts = [int(n) for n in sys.argv[2].split(',')] if len(sys.argv) > 2 else [1, 2, 4]
+    client_counts = [int(n) for n in sys.argv[3].split(',')] if len(sys.argv) > 3 else [1, 4, 16, 64]
+
+    print(f'{per_client} requests per client, {os.cpu_count()} CPUs')
+    print(f"{'workers':>8}{'clients':>9}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'stale':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in worker_counts:
+            process, base_url = start_service(workers, directory)
+            try:
+                seed(base_url)
+                for clients in client_counts:
+                    rate, p50, p99, stale = load(base_url, clients, per_client)
+                    print(f'{workers:>8}{clients:>9}{rate:>9.0f}{p50:>9.1f}{p99:>9.1f}{stale:>7}')
+            finally:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Write throughput under a burst of mood/sleep logs.
+
+Compares the old "rewrite the whole JSON file per write" approach with
+WellnessStore's group-committed writes.
+
+Usage: python benchmarks/bench_writes.py [writes] [threads] [existing_rows]
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wellness_store import WellnessStore
+
+
+def mood_log(i):
+    return {'user_email': f'student{i % 500}@example.edu', 'date': '2024-01-01',
+            'mood': 'happy', 'stress_level': i % 10 + 1, 'notes': ''}
+
+
+def run_threads(threads, writes, fn):
+    per_thread = writes // threads
+    workers = [
+        threading.Thread(target=lambda t=t: [fn(t * per_thread + i) for i in range(per_thread)])
+        for t in range(threads)
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return per_thread * threads / (time.perf_counter() - started)
+
+
+def bench_json_file(path, writes, threads, existing):
+    data = {'mood_logs': [mood_log(i) for i in range(existing)], 'sleep_logs': [], 'goals': [], 'breaks': []}
+    with open(path, 'w') as f:
+        json.dump(data, f)
+    lock = threading.Lock()
+
+    def write(i):
+        with lock:
+            with open(path) as f:
+                current = json.load(f)
+            current['mood_logs'].append(mood_log(i))
+            with open(path, 'w') as f:
+                json.dump(current, f, indent=2)
+    return run_threads(threads, writes, write)
+
+
+def bench_store(path, writes, threads, existing):
+    store = WellnessStore(path)
+    store.insert_many('mood_logs', [mood_log(i) for i in range(existing)])
+    rate = run_threads(threads, writes, lambda i: store.insert('mood_logs', mood_log(i)))
+    store.close()
+    return rate
+
+
+def main():
+    writes = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    existing = int(sys.argv[3]) if len(sys.argv) > 3 else 10000
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = bench_json_file(os.path.join(tmp, 'wellness_data.json'), min(writes, 200), threads, existing)
+        grouped = bench_store(os.path.join(tmp, 'wellness.db'), writes, threads, existing)
+    print(f'JSON file rewrite: {legacy:>10.0f} writes/s')
+    print(f'group commit:      {grouped:>10.0f} writes/s')
+
+
+if __name__ == '__main__':
+    main()
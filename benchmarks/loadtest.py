@@ -0,0 +1,461 @@
+"""Load test of the whole hub against local stand-ins for every upstream.
+
+Starts stand-ins for OpenWeatherMap, JokeAPI, Google sign-in and an SMTP
+server (benchmarks/stubs.py), then wellness_api.py and app.py as their own
+processes on a scratch directory, pointed at them. Each virtual user signs
+in once through the real OAuth callback and keeps that session. The
+wellness database is seeded through the bulk import with `--history` days
+of mood and sleep logs per user.
+
+Each scenario is a traffic mix run by `--clients` closed-loop clients for
+`--duration` seconds:
+
+    dashboard   wellness page loads (half of them revalidations) and history pages
+    writes      bursts of mood and sleep log writes
+    encrypt_qr  encrypt a text, then fetch a QR code of the ciphertext
+    weather     weather lookups over a skewed set of cities, some batched
+    mixed       all of the above plus jokes and joke emails
+
+The report is JSON, written to `--output` or stdout. It holds the run's
+settings, the git commit, and for each scenario: throughput, errors,
+p50/p95/p99 latency overall and per action, and the RSS of both services.
+Errors are counted by action and status, so load shed with 429 (the QR
+render queue is full) shows apart from failures.
+A human-readable summary goes to stderr. To compare two runs:
+
+    python benchmarks/loadtest.py --output before.json
+    python benchmarks/loadtest.py --output after.json
+    python benchmarks/loadtest.py --compare before.json after.json
+
+Client and services share this machine, so compare runs made on the same
+hardware with the same settings.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stubs import JokeAPIStub, OAuthStub, OpenWeatherStub, SMTPSink, free_port, serve, serve_smtp
+
+CITIES = [f'City {n}' for n in range(200)]
+TEXT = ('The quick brown fox jumps over the lazy dog while the students revise for their exams. ' * 40)
+
+
+# Actions: each makes one or more requests through the Flask app and
+# records their latencies via `record(name, response, started)`.
+
+def dashboard(client, record):
+    started = time.perf_counter()
+    headers = {'If-None-Match': client.etag} if client.etag and client.rng.random() < 0.5 else {}
+    response = client.http.get(f'{client.app_url}/api/wellness/dashboard', headers=headers)
+    if response.status_code == 200:
+        client.etag = response.headers.get('ETag')
+    record('dashboard', response, started, ok=(200, 304))
+
+
+def history(client, record):
+    started = time.perf_counter()
+    kind = client.rng.choice(('mood', 'sleep'))
+    response = client.http.get(f'{client.app_url}/api/wellness/{kind}', params={'limit': 30})
+    record('history', response, started)
+
+
+def mood_write(client, record):
+    started = time.perf_counter()
+    response = client.http.post(f'{client.app_url}/api/wellness/mood', json={
+        'date': time.strftime('%Y-%m-%d'), 'mood': client.rng.choice(('happy', 'okay', 'stressed')),
+        'stress_level': client.rng.randint(1, 10), 'notes': 'load test'})
+    record('mood_write', response, started)
+
+
+def sleep_write(client, record):
+    started = time.perf_counter()
+    response = client.http.post(f'{client.app_url}/api/wellness/sleep', json={
+        'date': time.strftime('%Y-%m-%d'), 'sleep_hours': round(client.rng.uniform(4, 10), 1),
+        'sleep_quality': 'good', 'academic_performance': 'good', 'notes': ''})
+    record('sleep_write', response, started)
+
+
+def encrypt_qr(client, record):
+    started = time.perf_counter()
+    text = TEXT[:client.rng.randint(200, len(TEXT))]
+    response = client.http.post(f'{client.app_url}/api/encrypt-text', json={
+        'text': text, 'ciphers': client.rng.sample(['atbash', 'caesar', 'vigenere'], 2),
+        'shift': client.rng.randint(1, 25), 'keyword': 'wellness', 'mode': 'encrypt'})
+    record('encrypt', response, started)
+    if response.status_code != 200:
+        return
+    ciphertext = response.json()['results'][0]['encrypted_text'][:300]
+    started = time.perf_counter()
+    response = client.http.get(f'{client.app_url}/api/qr.png?text={quote(ciphertext)}')
+    record('qr', response, started)
+
+
+def weather(client, record):
+    started = time.perf_counter()
+    city = CITIES[min(int(client.rng.paretovariate(1.2)) - 1, len(CITIES) - 1)]
+    response = client.http.post(f'{client.app_url}/api/weather', json={'city': city})
+    record('weather', response, started)
+
+
+def weather_batch(client, record):
+    started = time.perf_counter()
+    response = client.http.post(f'{client.app_url}/api/weather/batch',
+                                json={'locations': client.rng.sample(CITIES, 5)})
+    record('weather_batch', response, started)
+
+
+def joke(client, record):
+    started = time.perf_counter()
+    response = client.http.get(f'{client.app_url}/api/joke')
+    record('joke', response, started)
+
+
+def joke_email(client, record):
+    started = time.perf_counter()
+    response = client.http.post(f'{client.app_url}/api/send-joke-email', json={
+        'email': f'friend{client.rng.randrange(1000)}@example.edu', 'joke': 'Why? Because.', 'include_qr': False})
+    record('joke_email', response, started, ok=(202,))
+
+
+SCENARIOS = {
+    'dashboard': [(dashboard, 70), (history, 30)],
+    'writes': [(mood_write, 55), (sleep_write, 45)],
+    'encrypt_qr': [(encrypt_qr, 100)],
+    'weather': [(weather, 90), (weather_batch, 10)],
+    'mixed': [(dashboard, 30), (history, 10), (mood_write, 10), (sleep_write, 5), (encrypt_qr, 15),
+              (weather, 18), (weather_batch, 2), (joke, 8), (joke_email, 2)],
+}
+
+
+class Client:
+    def __init__(self, app_url, http, seed):
+        self.app_url = app_url
+        self.http = http
+        self.rng = random.Random(seed)
+        self.etag = None
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {}
+    latencies = sorted(latencies)
+
+    def rank(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2)
+
+    return {'p50': rank(0.50), 'p95': rank(0.95), 'p99': rank(0.99), 'max': round(latencies[-1], 2),
+            'mean': round(sum(latencies) / len(latencies), 2)}
+
+
+def rss_mb(pid):
+    """Resident memory of a process and all its descendants, from /proc."""
+    total, pending = 0, [pid]
+    while pending:
+        pid = pending.pop()
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+            for task in os.listdir(f'/proc/{pid}/task'):
+                with open(f'/proc/{pid}/task/{task}/children') as f:
+                    pending += [int(child) for child in f.read().split()]
+        except (OSError, StopIteration):
+            pass
+    return round(total / 1024, 1)
+
+
+class RSSSampler:
+    def __init__(self, processes, interval=0.25):
+        self.processes = processes
+        self.interval = interval
+        self.peak = {name: 0 for name in processes}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for name, process in self.processes.items():
+                self.peak[name] = max(self.peak[name], rss_mb(process.pid))
+
+    def __enter__(self):
+        self.start = {name: rss_mb(process.pid) for name, process in self.processes.items()}
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        end = {name: rss_mb(process.pid) for name, process in self.processes.items()}
+        self.result = {name: {'start': self.start[name], 'peak': max(self.peak[name], end[name]), 'end': end[name]}
+                       for name in self.processes}
+
+
+def wait_until_up(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{url} exited with {process.returncode}')
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f'{url} did not come up within {timeout}s')
+
+
+def start_services(args, directory):
+    _, weather_url = serve(OpenWeatherStub)
+    _, joke_url = serve(JokeAPIStub)
+    _, oauth_url = serve(OAuthStub)
+    smtp, smtp_port = serve_smtp()
+    OpenWeatherStub.delay = JokeAPIStub.delay = args.upstream_delay / 1000
+    SMTPSink.command_delay = args.smtp_delay / 1000
+
+    wellness_port, app_port = free_port(), free_port()
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    wellness = subprocess.Popen(
+        [sys.executable, 'wellness_api.py'], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env=dict(env, WELLNESS_DB=os.path.join(directory, 'wellness.db'), WELLNESS_PORT=str(wellness_port),
+                 WELLNESS_WORKERS=str(args.wellness_workers), PROFILE_DIR=os.path.join(directory, 'profiles')))
+    app = subprocess.Popen(
+        [sys.executable, 'app.py'], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env=dict(env, PORT=str(app_port), FLASK_DEBUG='0', FASTAPI_URL=f'http://127.0.0.1:{wellness_port}',
+                 OPENWEATHER_URL=f'{weather_url}/data/2.5/weather', OPENWEATHER_API_KEY='stub',
+                 JOKEAPI_URL=f'{joke_url}/joke', SMTP_SERVER='127.0.0.1', SMTP_PORT=str(smtp_port),
+                 SMTP_STARTTLS='0', EMAIL_ADDRESS='hub@example.edu', EMAIL_PASSWORD='stub',
+                 MAIL_DB=os.path.join(directory, 'mail.db'), SESSION_DB=os.path.join(directory, 'sessions.db'),
+                 SECRET_KEY_FILE=os.path.join(directory, 'secret.key'), GOOGLE_CLIENT_ID='loadtest',
+                 GOOGLE_CLIENT_SECRET='stub', GOOGLE_DISCOVERY_URL=f'{oauth_url}/.well-known/openid-configuration',
+                 AUTHLIB_INSECURE_TRANSPORT='1', PROFILE_DIR=os.path.join(directory, 'profiles')))
+    processes = {'app': app, 'wellness': wellness}
+    try:
+        wait_until_up(f'http://127.0.0.1:{wellness_port}/metrics', wellness)
+        wait_until_up(f'http://127.0.0.1:{app_port}/metrics', app)
+    except Exception:
+        stop_services(processes, smtp)
+        raise
+    return processes, smtp, f'http://127.0.0.1:{app_port}', f'http://127.0.0.1:{wellness_port}'
+
+
+def stop_services(processes, smtp):
+    for process in processes.values():
+        process.terminate()
+    for process in processes.values():
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    smtp.shutdown()
+
+
+def seed(wellness_url, users, days):
+    """Bulk-load `days` of mood and sleep logs and a few goals and breaks per user."""
+    rng = random.Random(0)
+    lines = {'mood': [], 'sleep': [], 'goals': [], 'breaks': []}
+    for user in users:
+        for day in range(days):
+            date = time.strftime('%Y-%m-%d', time.gmtime(time.time() - (days - day) * 86400))
+            lines['mood'].append({'user_email': user, 'date': date, 'mood': rng.choice(('happy', 'okay', 'stressed')),
+                                  'stress_level': rng.randint(1, 10), 'notes': ''})
+            lines['sleep'].append({'user_email': user, 'date': date, 'sleep_hours': round(rng.uniform(4, 10), 1),
+                                   'sleep_quality': 'good', 'academic_performance': 'good', 'notes': ''})
+        for n in range(10):
+            lines['goals'].append({'user_email': user, 'title': f'Goal {n}', 'description': '',
+                                   'target_date': '2030-01-01', 'status': rng.choice(('pending', 'completed'))})
+        for n in range(5):
+            lines['breaks'].append({'user_email': user, 'activity': 'Walk', 'duration_minutes': 10,
+                                    'scheduled_time': f'{9 + n * 2:02d}:00'})
+    inserted = 0
+    for name, records in lines.items():
+        body = ''.join(json.dumps(record) + '\n' for record in records)
+        response = requests.post(f'{wellness_url}/api/bulk/{name}', params={'format': 'ndjson'}, data=body,
+                                 timeout=600)
+        response.raise_for_status()
+        inserted += response.json()['inserted']
+    return inserted
+
+
+def sign_in(app_url, email):
+    """A session logged in through /login and the stand-in Google."""
+    http = requests.Session()
+    response = http.get(f'{app_url}/login', allow_redirects=False)
+    response.raise_for_status()
+    # The client picks who signs in; the stand-in approves without a form
+    http.get(f"{response.headers['Location']}&login_hint={quote(email)}").raise_for_status()
+    if not http.get(f'{app_url}/api/joke/stats').ok:
+        raise RuntimeError(f'Sign-in as {email} failed')
+    return http
+
+
+def run_scenario(name, sessions, app_url, args):
+    actions, weights = zip(*SCENARIOS[name])
+    latencies, errors, lock = {}, {}, threading.Lock()
+    measuring = threading.Event()
+    stop = threading.Event()
+
+    def record(action, response, started, ok=(200,)):
+        elapsed = (time.perf_counter() - started) * 1000
+        response.close()
+        if not measuring.is_set():
+            return
+        with lock:
+            latencies.setdefault(action, []).append(elapsed)
+            if response.status_code not in ok:
+                key = f'{action} {response.status_code}'
+                errors[key] = errors.get(key, 0) + 1
+
+    def run(n):
+        client = Client(app_url, sessions[n % len(sessions)], seed=hash((name, n)))
+        while not stop.is_set():
+            try:
+                client.rng.choices(actions, weights)[0](client, record)
+            except requests.RequestException:
+                with lock:
+                    errors['connection'] = errors.get('connection', 0) + 1
+            if args.think:
+                time.sleep(client.rng.expovariate(1000 / args.think))
+
+    calls = (OpenWeatherStub.calls, JokeAPIStub.calls, SMTPSink.messages)
+    threads = [threading.Thread(target=run, args=(n,), daemon=True) for n in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.warmup)
+    measuring.set()
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    measuring.clear()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    everything = [latency for values in latencies.values() for latency in values]
+    return {
+        'requests': len(everything),
+        'errors': sum(errors.values()),
+        'errors_by_status': errors,
+        'duration_s': round(elapsed, 2),
+        'throughput_rps': round(len(everything) / elapsed, 1),
+        'latency_ms': percentiles(everything),
+        'actions': {action: {'requests': len(values), 'latency_ms': percentiles(values)}
+                    for action, values in sorted(latencies.items())},
+        'upstream_calls': {'openweathermap': OpenWeatherStub.calls - calls[0], 'jokeapi': JokeAPIStub.calls - calls[1],
+                           'smtp_messages': SMTPSink.messages - calls[2]},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              timeout=10).stdout.strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+
+def summary(report):
+    lines = [f"{'scenario':<12}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+             f"{'app MB':>9}{'wellness MB':>13}"]
+    for name, result in report['scenarios'].items():
+        latency, rss = result['latency_ms'], result['rss_mb']
+        lines.append(f"{name:<12}{result['throughput_rps']:>8.1f}{latency.get('p50', 0):>9.1f}"
+                     f"{latency.get('p95', 0):>9.1f}{latency.get('p99', 0):>9.1f}{result['errors']:>8}"
+                     f"{rss['app']['peak']:>9.1f}{rss['wellness']['peak']:>13.1f}")
+    return '\n'.join(lines)
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before_path} ({(before['meta']['git_commit'] or '?')[:10]}) -> "
+          f"{after_path} ({(after['meta']['git_commit'] or '?')[:10]})")
+    print(f"{'scenario':<12}{'metric':<16}{'before':>10}{'after':>10}{'change':>9}")
+    for name in after['scenarios']:
+        if name not in before['scenarios']:
+            continue
+        old, new = before['scenarios'][name], after['scenarios'][name]
+        rows = [('req/s', old['throughput_rps'], new['throughput_rps'])]
+        rows += [(f'{p} ms', old['latency_ms'].get(p), new['latency_ms'].get(p)) for p in ('p50', 'p95', 'p99')]
+        rows += [(f'{service} peak MB', old['rss_mb'][service]['peak'], new['rss_mb'][service]['peak'])
+                 for service in ('app', 'wellness')]
+        for metric, was, now in rows:
+            change = f'{(now - was) / was * 100:+.0f}%' if was and now is not None else ''
+            print(f'{name:<12}{metric:<16}{was or 0:>10.1f}{now or 0:>10.1f}{change:>9}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f'comma-separated, from {", ".join(SCENARIOS)} (default all)')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent clients (default 16)')
+    parser.add_argument('--duration', type=float, default=20, help='measured seconds per scenario (default 20)')
+    parser.add_argument('--warmup', type=float, default=3, help='unmeasured seconds first (default 3)')
+    parser.add_argument('--think', type=float, default=0, help='mean ms a client waits between actions (default 0)')
+    parser.add_argument('--users', type=int, default=20, help='signed-in users the clients share (default 20)')
+    parser.add_argument('--history', type=int, default=90, help='days of mood and sleep logs per user (default 90)')
+    parser.add_argument('--upstream-delay', type=float, default=50,
+                        help='ms the OpenWeatherMap and JokeAPI stand-ins take (default 50)')
+    parser.add_argument('--smtp-delay', type=float, default=2, help='ms per SMTP reply (default 2)')
+    parser.add_argument('--wellness-workers', type=int, default=1, help='wellness_api.py workers (default 1)')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two reports and exit')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    scenarios = [name for name in args.scenarios.split(',') if name]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+
+    report = {
+        'meta': {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'git_commit': git_commit(),
+                 'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+                 'settings': {name: value for name, value in vars(args).items() if name not in ('output', 'compare')}},
+        'setup': {},
+        'scenarios': {},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        processes, smtp, app_url, wellness_url = start_services(args, directory)
+        try:
+            users = [f'student{n}@example.edu' for n in range(args.users)]
+            started = time.perf_counter()
+            report['setup']['records_seeded'] = seed(wellness_url, users, args.history)
+            report['setup']['seed_s'] = round(time.perf_counter() - started, 2)
+            started = time.perf_counter()
+            sessions = [sign_in(app_url, user) for user in users]
+            report['setup']['sign_in_s'] = round(time.perf_counter() - started, 2)
+            for name in scenarios:
+                print(f'running {name}...', file=sys.stderr)
+                with RSSSampler(processes) as rss:
+                    result = run_scenario(name, sessions, app_url, args)
+                result['rss_mb'] = rss.result
+                report['scenarios'][name] = result
+        finally:
+            stop_services(processes, smtp)
+
+    print(summary(report), file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+"""Local stand-ins for the services the hub talks to, for benchmarks."""
+import json
+import random
+import socket
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+
+class WellnessStub(JSONHandler):
+    """Answers every wellness API call with a fixed dashboard-sized payload."""
+
+    logs = [{'id': i, 'user_email': 'student@example.edu', 'date': '2024-01-01', 'mood': 'happy',
+             'stress_level': 5, 'notes': '', 'created_at': '2024-01-01T09:00:00'} for i in range(30)]
+
+    def do_GET(self):
+        self.send_json({'success': True, 'logs': self.logs})
+
+    def do_POST(self):
+        self.read_body()
+        self.send_json({'success': True, 'log': self.logs[0]})
+
+    do_PUT = do_POST
+    do_DELETE = do_POST
+
+
+class OpenWeatherStub(JSONHandler):
+    """Answers /data/2.5/weather like OpenWeatherMap after `delay` seconds.
+
+    Any city is found except "nowhere"; `calls` counts requests.
+    """
+
+    delay = 0.0
+    calls = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            type(self).calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        query = parse_qs(urlparse(self.path).query)
+        city = query.get('q', ['Somewhere'])[0]
+        if city.casefold() == 'nowhere':
+            self.send_json({'cod': '404', 'message': 'city not found'}, 404)
+            return
+        self.send_json({
+            'name': city.title(), 'sys': {'country': 'GB'}, 'coord': {'lat': 51.5, 'lon': -0.1},
+            'main': {'temp': 14.2, 'feels_like': 13.1, 'humidity': 71, 'pressure': 1012},
+            'weather': [{'description': 'light rain', 'icon': '10d'}], 'wind': {'speed': 4.1},
+        })
+
+
+class JokeAPIStub(JSONHandler):
+    """Answers /joke/<category>?amount=N like JokeAPI after `delay` seconds.
+
+    "Any" mostly returns Programming and Misc jokes, as the real thing
+    does. Set `fail` to answer 500. `calls` counts requests.
+    """
+
+    delay = 0.0
+    fail = False
+    calls = 0
+    next_id = 0
+    lock = threading.Lock()
+    weights = {'Programming': 5, 'Misc': 4, 'Pun': 2, 'Spooky': 1, 'Christmas': 1}
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        category = url.path.rstrip('/').rsplit('/', 1)[-1]
+        amount = int(parse_qs(url.query).get('amount', ['1'])[0])
+        with self.lock:
+            type(self).calls += 1
+            first = type(self).next_id
+            type(self).next_id += amount
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail:
+            self.send_json({'error': True, 'message': 'Internal error'}, 500)
+            return
+        rng = random.Random(first)
+        jokes = []
+        for joke_id in range(first, first + amount):
+            name = category if category in self.weights else rng.choices(
+                list(self.weights), list(self.weights.values()))[0]
+            jokes.append({'id': joke_id, 'category': name, 'type': 'twopart', 'safe': True,
+                          'setup': f'Setup of {name} joke {joke_id}?', 'delivery': 'The punchline.'})
+        self.send_json({'error': False, 'amount': amount, 'jokes': jokes} if amount > 1 else jokes[0])
+
+
+class OAuthStub(JSONHandler):
+    """Stands in for Google's OpenID Connect endpoints.
+
+    Point the app's GOOGLE_DISCOVERY_URL at /.well-known/openid-configuration.
+    /authorize approves at once and redirects back with a code for the user
+    named in `login_hint` (appended to the app's redirect by the client);
+    /token exchanges the code for an RS256-signed ID token that authlib
+    verifies against /jwks like a real one.
+    """
+
+    codes = {}
+    lock = threading.Lock()
+    _key = None
+
+    @classmethod
+    def key(cls):
+        from authlib.jose import JsonWebKey
+
+        with cls.lock:
+            if cls._key is None:
+                cls._key = JsonWebKey.generate_key('RSA', 2048, is_private=True, options={'kid': 'stub'})
+            return cls._key
+
+    def base_url(self):
+        return f'http://{self.headers["Host"]}'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        if url.path == '/.well-known/openid-configuration':
+            base = self.base_url()
+            self.send_json({
+                'issuer': base, 'authorization_endpoint': f'{base}/authorize', 'token_endpoint': f'{base}/token',
+                'userinfo_endpoint': f'{base}/userinfo', 'jwks_uri': f'{base}/jwks',
+                'id_token_signing_alg_values_supported': ['RS256'],
+            })
+        elif url.path == '/jwks':
+            self.send_json({'keys': [self.key().as_dict(is_private=False)]})
+        elif url.path == '/authorize':
+            code = f'code-{random.getrandbits(64):x}'
+            with self.lock:
+                self.codes[code] = (query.get('login_hint', 'student@example.edu'), query['client_id'],
+                                    query.get('nonce'))
+            location = f"{query['redirect_uri']}?code={code}&state={query['state']}"
+            self.send_response(302)
+            self.send_header('Location', location)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        else:
+            self.send_json({'error': 'not_found'}, 404)
+
+    def do_POST(self):
+        from authlib.jose import jwt
+
+        form = {name: values[0] for name, values in parse_qs(self.read_body().decode()).items()}
+        with self.lock:
+            grant = self.codes.pop(form.get('code'), None)
+        if grant is None:
+            self.send_json({'error': 'invalid_grant'}, 400)
+            return
+        email, client_id, nonce = grant
+        now = int(time.time())
+        claims = {'iss': self.base_url(), 'aud': client_id, 'sub': email, 'iat': now, 'exp': now + 3600,
+                  'email': email, 'email_verified': True, 'name': email.split('@')[0].title(), 'picture': ''}
+        if nonce:
+            claims['nonce'] = nonce
+        id_token = jwt.encode({'alg': 'RS256', 'kid': 'stub'}, claims, self.key()).decode()
+        self.send_json({'access_token': f'token-{email}', 'token_type': 'Bearer', 'expires_in': 3600,
+                        'scope': 'openid email profile', 'id_token': id_token})
+
+
+class SMTPSink(socketserver.StreamRequestHandler):
+    """Accepts any login and message and throws the message away.
+
+    `connect_delay` is slept before the greeting and `command_delay` before
+    every reply, to stand in for the round trips and TLS handshake of a real
+    server. `messages` and `connections` count what the sink has seen.
+    """
+
+    connect_delay = 0.0
+    command_delay = 0.0
+    messages = 0
+    connections = 0
+    lock = threading.Lock()
+
+    def reply(self, line):
+        if self.command_delay:
+            time.sleep(self.command_delay)
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        with self.lock:
+            type(self).connections += 1
+        if self.connect_delay:
+            time.sleep(self.connect_delay)
+        self.wfile.write(b'220 sink ESMTP\r\n')
+        for raw in self.rfile:
+            command = raw.decode('ascii', 'replace').strip().upper()
+            if command.startswith('EHLO'):
+                self.wfile.write(b'250-sink\r\n250-AUTH PLAIN LOGIN\r\n')
+                self.reply('250 8BITMIME')
+            elif command.startswith('AUTH'):
+                self.reply('235 2.7.0 Authentication successful')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                for line in self.rfile:
+                    if line == b'.\r\n':
+                        break
+                with self.lock:
+                    type(self).messages += 1
+                self.reply('250 2.0.0 Ok: queued')
+            elif command == 'QUIT':
+                self.reply('221 2.0.0 Bye')
+                return
+            else:  # HELO, MAIL, RCPT, RSET, NOOP
+                self.reply('250 2.0.0 Ok')
+
+
+def serve_smtp(handler=SMTPSink, port=0):
+    """Start an SMTP stand-in on a background thread; return (server, port)."""
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+def free_port():
+    """A local TCP port nothing is listening on right now."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class StubServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-keep-alive is routine under load
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def serve(handler, port=0):
+    """Start `handler` on a background thread; return (server, base_url)."""
+    server = StubServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def serve_flask(flask_app):
+    """Run a Flask app on a threaded WSGI server; return (server, base_url)."""
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def session_cookie(flask_app, user=None):
+    """The session cookie of a logged-in user, skipping OAuth."""
+    from flask import request
+
+    user = user or {'email': 'student@example.edu', 'name': 'Bench Student', 'picture': ''}
+    interface = flask_app.session_interface
+    with flask_app.test_request_context():
+        session = interface.open_session(flask_app, request)
+        session['user'] = user
+        response = flask_app.response_class()
+        interface.save_session(flask_app, session, response)
+    name = flask_app.config['SESSION_COOKIE_NAME']
+    return {name: response.headers['Set-Cookie'].split(';')[0][len(name) + 1:]}
@@ -0,0 +1,308 @@
+"""Fires break reminders at their time of day and pushes them to clients.
+
+A break's scheduled_time is a time of day ("HH:MM") in its timezone (an
+IANA name; the server's local time when it has none), and it fires every
+day at that time. Pending reminders are kept in a heap ordered by when
+they next fire, so scheduling one costs O(log n) and firing the earliest
+O(log n). Cancelling marks the heap entry dead in O(1); dead entries are
+skipped when they come up and swept out once they outnumber the live ones.
+
+The scheduler follows the wellness store rather than the API: it loads
+every break when it starts and reloads a user's breaks whenever a commit
+touches them, whether from this process or (checked every
+`sync_interval` seconds) another worker sharing the database.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from datetime import time as time_of_day
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+logger = logging.getLogger(__name__)
+
+TIME_PATTERN = re.compile(r'(\d{1,2}):(\d{2})(?::(\d{2}))?')
+
+
+@lru_cache(maxsize=None)
+def parse_time(value):
+    """The datetime.time of an "HH:MM" or "HH:MM:SS" string; ValueError otherwise."""
+    match = TIME_PATTERN.fullmatch(value) if isinstance(value, str) else None
+    try:
+        return time_of_day(*(int(part) for part in match.groups('0')))
+    except (AttributeError, ValueError):
+        raise ValueError(f'scheduled_time must be HH:MM, not {value!r}') from None
+
+
+@lru_cache(maxsize=None)
+def zone(name):
+    """The ZoneInfo for an IANA name, None (local time) for no name; ValueError if unknown."""
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f'unknown timezone {name!r}') from None
+
+
+def next_fire(at, tz, after):
+    """Epoch seconds of the first time of day `at` in `tz` later than `after`."""
+    day = datetime.fromtimestamp(after, tz).date()
+    # Two days on covers a time skipped by a DST change
+    for offset in range(3):
+        fire = datetime.combine(day + timedelta(days=offset), at, tzinfo=tz).timestamp()
+        if fire > after:
+            return fire
+
+
+class Subscribers:
+    """Per-user asyncio queues of events, fed from any thread.
+
+    Each queue holds at most `max_queued` events; a client too slow to
+    take them loses the newest rather than holding memory.
+    """
+
+    def __init__(self, max_queued=100):
+        self.max_queued = max_queued
+        self.published = self.dropped = 0
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_email):
+        """A new queue for `user_email`'s events; call from the event loop that reads it."""
+        queue = asyncio.Queue(self.max_queued)
+        with self._lock:
+            self._queues.setdefault(user_email, {})[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, user_email, queue):
+        with self._lock:
+            queues = self._queues.get(user_email, {})
+            queues.pop(queue, None)
+            if not queues:
+                self._queues.pop(user_email, None)
+
+    def publish(self, user_email, event):
+        """Queue `event` for every subscriber of `user_email`; returns how many there were."""
+        with self._lock:
+            queues = list(self._queues.get(user_email, {}).items())
+            self.published += 1
+        for queue, loop in queues:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, event)
+            except RuntimeError:  # the loop has closed
+                self.unsubscribe(user_email, queue)
+        return len(queues)
+
+    def _offer(self, queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            with self._lock:
+                self.dropped += 1
+
+    def stats(self):
+        with self._lock:
+            return {'users': len(self._queues), 'connections': sum(map(len, self._queues.values())),
+                    'published': self.published, 'dropped': self.dropped}
+
+
+class BreakScheduler:
+    """Fires the breaks in a WellnessStore to a Subscribers, on a thread of its own.
+
+    A reminder more than `misfire_grace` seconds late (the process was
+    stopped or suspended) is skipped until its next day.
+    """
+
+    MIN_DEAD_TO_SWEEP = 1024
+
+    def __init__(self, store, subscribers, sync_interval=1.0, misfire_grace=60):
+        self.store = store
+        self.subscribers = subscribers
+        self.sync_interval = sync_interval
+        self.misfire_grace = misfire_grace
+        self.fired = self.missed = 0
+        self.ready = threading.Event()  # set once every break has been loaded
+        self._heap = []
+        self._dead = 0
+        self._entries = {}    # break id -> its live heap entry [fire_at, seq, break id]
+        self._reminders = {}  # break id -> (user_email, time of day, tz, details)
+        self._by_user = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._dirty = set()
+        self._reload = True
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='break-scheduler', daemon=True)
+        store.add_listener(self._changed)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        with self._wake:
+            self._stopped = True
+            self._wake.notify()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    @staticmethod
+    def _details(record):
+        # What a reminder event says, and what tells a changed record apart
+        return (record.get('activity'), record.get('duration_minutes'), record.get('scheduled_time'),
+                record.get('timezone'))
+
+    def _reminder(self, record):
+        try:
+            at, tz = parse_time(record.get('scheduled_time')), zone(record.get('timezone'))
+        except ValueError as e:
+            logger.warning('Not scheduling break %s: %s', record.get('id'), e)
+            return None
+        # Thousands of reminders share each user's email
+        return sys.intern(record['user_email']), at, tz, self._details(record)
+
+    def schedule(self, record, now=None):
+        """Schedule (or reschedule) a break record; returns when it fires, or None if it never can."""
+        reminder = self._reminder(record)
+        if reminder is None:
+            self.cancel(record['id'])
+            return None
+        fire_at = next_fire(reminder[1], reminder[2], time.time() if now is None else now)
+        with self._wake:
+            self._cancel(record['id'])
+            self._push(record['id'], fire_at)
+            self._reminders[record['id']] = reminder
+            self._by_user.setdefault(reminder[0], set()).add(record['id'])
+            if self._heap[0][2] == record['id']:
+                self._wake.notify()
+        return fire_at
+
+    def cancel(self, break_id):
+        """Stop firing a break; returns whether it was scheduled."""
+        with self._lock:
+            return self._cancel(break_id)
+
+    def _push(self, break_id, fire_at):
+        entry = [fire_at, next(self._seq), break_id]
+        self._entries[break_id] = entry
+        heapq.heappush(self._heap, entry)
+
+    def _cancel(self, break_id):
+        entry = self._entries.pop(break_id, None)
+        if entry is None:
+            return False
+        entry[2] = None
+        self._dead += 1
+        user_email = self._reminders.pop(break_id)[0]
+        ids = self._by_user[user_email]
+        ids.discard(break_id)
+        if not ids:
+            del self._by_user[user_email]
+        if self._dead >= self.MIN_DEAD_TO_SWEEP and self._dead * 2 > len(self._heap):
+            self._heap = [entry for entry in self._heap if entry[2] is not None]
+            heapq.heapify(self._heap)
+            self._dead = 0
+        return True
+
+    def _changed(self, owners):
+        # Called by the store on its writer or sync thread
+        with self._wake:
+            if owners is None:
+                self._reload = True
+            else:
+                self._dirty.update(user_email for collection, user_email in owners if collection == 'breaks')
+            self._wake.notify()
+
+    def _due(self, now):
+        """Pop what is due at `now`, rescheduling each for its next day."""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, _, break_id = heapq.heappop(self._heap)
+                if break_id is None:
+                    self._dead -= 1
+                    continue
+                user_email, at, tz, (activity, duration_minutes, scheduled_time, _) = self._reminders[break_id]
+                if now - fire_at > self.misfire_grace:
+                    self.missed += 1
+                else:
+                    self.fired += 1
+                    due.append((user_email, {
+                        'id': break_id, 'activity': activity, 'duration_minutes': duration_minutes,
+                        'scheduled_time': scheduled_time,
+                        'due': datetime.fromtimestamp(fire_at, tz).isoformat(timespec='seconds'),
+                    }))
+                self._push(break_id, next_fire(at, tz, max(fire_at, now)))
+        return due
+
+    def _load_all(self):
+        # Built aside and heapified once: O(n) rather than n pushes
+        now = time.time()
+        heap, entries, reminders, by_user = [], {}, {}, {}
+        for record in self.store.iter_records('breaks'):
+            reminder = self._reminder(record)
+            if reminder is None:
+                continue
+            entry = [next_fire(reminder[1], reminder[2], now), next(self._seq), record['id']]
+            heap.append(entry)
+            entries[record['id']] = entry
+            reminders[record['id']] = reminder
+            by_user.setdefault(reminder[0], set()).add(record['id'])
+        heapq.heapify(heap)
+        with self._wake:
+            self._heap, self._dead, self._entries, self._reminders, self._by_user = heap, 0, entries, reminders, by_user
+            self._wake.notify()
+
+    def _load_user(self, user_email):
+        records = {record['id']: record for record in self.store.iter_records('breaks', user_email)}
+        with self._lock:
+            for break_id in self._by_user.get(user_email, set()) - records.keys():
+                self._cancel(break_id)
+            unchanged = {break_id for break_id in self._by_user.get(user_email, ())
+                         if self._reminders[break_id][3] == self._details(records[break_id])}
+        for break_id, record in records.items():
+            if break_id not in unchanged:
+                self.schedule(record)
+
+    def _run(self):
+        while True:
+            with self._wake:
+                if self._stopped:
+                    return
+                reload, dirty = self._reload, self._dirty
+                self._reload, self._dirty = False, set()
+            failed = False
+            try:
+                self.store.sync()
+                if reload:
+                    self._load_all()
+                    self.ready.set()
+                else:
+                    for user_email in dirty:
+                        self._load_user(user_email)
+                for user_email, event in self._due(time.time()):
+                    self.subscribers.publish(user_email, event)
+            except Exception:
+                logger.exception('Break scheduler pass failed; reloading')
+                failed = True
+                with self._lock:
+                    self._reload = True
+            with self._wake:
+                if failed or not (self._stopped or self._reload or self._dirty):
+                    timeout = self.sync_interval
+                    if self._heap and not failed:
+                        timeout = min(timeout, max(0, self._heap[0][0] - time.time()))
+                    self._wake.wait(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {'scheduled': len(self._entries), 'heap_entries': len(self._heap), 'users': len(self._by_user),
+                    'fired': self.fired, 'missed': self.missed,
+                    'next_due_seconds': round(max(0, self._heap[0][0] - time.time()), 1) if self._heap else None}
@@ -0,0 +1,337 @@
+import math
+import re
+import string
+
+try:
+    import numpy
+except ImportError:  # optional: speeds up Vigenere on large texts
+    numpy = None
+
+# Fast paths work on ASCII text as bytes. Every cipher here maps letter x
+# (0-25, case kept) at letter index i to (sign * x + shifts[i % period]) % 26:
+# Atbash is (-1, [25]), Caesar (1, [shift]) and Vigenere (1, keyword shifts).
+# Such (sign, shifts) transforms compose into another one, which is how
+# pipelines fuse. Each (sign, shift) has a 256-entry bytes.translate table, so
+# the per-character work happens in C. Anything else (non-ASCII text, odd
+# shift or keyword types) goes through the original character loops, which
+# define the exact output.
+UPPER = string.ascii_uppercase.encode()
+LOWER = string.ascii_lowercase.encode()
+LETTERS = UPPER + LOWER
+CIPHERS = ('atbash', 'caesar', 'vigenere')
+
+
+def _letter_table(sign, shift):
+    upper = bytes(UPPER[(sign * x + shift) % 26] for x in range(26))
+    return bytes.maketrans(LETTERS, upper + upper.lower())
+
+
+TABLES = {(sign, shift): _letter_table(sign, shift) for sign in (1, -1) for shift in range(26)}
+
+# Fusing two periodic stages gives the lcm of their periods; chains whose
+# period would exceed this are run as several passes instead.
+MAX_FUSED_PERIOD = 4096
+
+# Bytes per numpy block; bounds the temporary arrays to a few MB.
+NUMPY_BLOCK = 1 << 20
+NUMPY_MIN_SIZE = 4096
+
+# Splits ASCII text into letter runs (even indexes, possibly empty) and the
+# non-letter runs between them (odd indexes).
+_NON_LETTERS = re.compile(rb'([^A-Za-z]+)')
+_NON_ASCII = re.compile(r'([^\x00-\x7f]+)')
+
+
+def atbash_cipher(text):
+    if text.isascii():
+        return text.encode('ascii').translate(TABLES[-1, 25]).decode('ascii')
+    return _atbash_chars(text)
+
+
+def caesar_cipher(text, shift):
+    if text.isascii() and isinstance(shift, int):
+        return text.encode('ascii').translate(TABLES[1, shift % 26]).decode('ascii')
+    return _caesar_chars(text, shift)
+
+
+def vigenere_cipher(text, keyword):
+    transform = _transform('vigenere', keyword, False)
+    if not text.isascii() or transform is None:
+        return _vigenere_chars(text, keyword)
+    return _run(text.encode('ascii'), [[transform]])[0]
+
+
+class Pipeline:
+    """Cipher stages applied left to right, e.g. Pipeline().caesar(3).vigenere('KEY').
+
+    Stages are (cipher, key, decrypt) tuples and `inverse()` gives the
+    pipeline that undoes this one. On ASCII text the stages are fused into
+    a single (sign, shifts) transform, so a chain costs one pass.
+    """
+
+    def __init__(self, stages=()):
+        self.stages = tuple(stages)
+        for cipher, _, _ in self.stages:
+            if cipher not in CIPHERS:
+                raise ValueError(f'Unknown cipher: {cipher}')
+
+    def then(self, cipher, key=None, decrypt=False):
+        return Pipeline(self.stages + ((cipher, key, decrypt),))
+
+    def atbash(self):
+        return self.then('atbash')
+
+    def caesar(self, shift, decrypt=False):
+        return self.then('caesar', shift, decrypt)
+
+    def vigenere(self, keyword, decrypt=False):
+        return self.then('vigenere', keyword, decrypt)
+
+    def inverse(self):
+        return Pipeline((cipher, key, not decrypt) for cipher, key, decrypt in reversed(self.stages))
+
+    def apply(self, text):
+        return apply_many(text, [self])[0]
+
+    def stream(self, chunks):
+        """Apply the pipeline to an iterable of text chunks, yielding output chunks.
+
+        Vigenere keyword positions carry across chunk boundaries, so the
+        joined output equals apply() on the joined input.
+        """
+        # Letters each stage has consumed so far. On ASCII text every stage
+        # sees the same letters; the character loops may not, so each stage
+        # keeps its own count.
+        offsets = [0] * len(self.stages)
+        for chunk in chunks:
+            # ASCII runs take the fused path, anything else the character loops
+            parts = (chunk,) if chunk.isascii() else _NON_ASCII.split(chunk)
+            output = ''.join(self._apply_at(part, offsets) for part in parts if part)
+            if output:
+                yield output
+
+    def _apply_at(self, text, offsets):
+        if text.isascii():
+            output = self._rotated(offsets).apply(text)
+            data = text.encode('ascii')
+            letters = len(data) - len(data.translate(None, LETTERS))
+            offsets[:] = [offset + letters for offset in offsets]
+            return output
+        for n, stage in enumerate(self.stages):
+            if stage[0] == 'vigenere':
+                letters = sum(map(str.isalpha, text))
+                text = Pipeline([_rotate_stage(stage, offsets[n])]).apply_stages(text)
+                offsets[n] += letters
+            else:
+                text = Pipeline([stage]).apply_stages(text)
+        return text
+
+    def _rotated(self, offsets):
+        return Pipeline(_rotate_stage(stage, offset) for stage, offset in zip(self.stages, offsets))
+
+    def fused(self):
+        """The stages as a list of (sign, shifts) passes, or None if a stage cannot be fused."""
+        chain = []
+        for stage in self.stages:
+            transform = _transform(*stage)
+            if transform is None:
+                return None
+            if chain and _lcm(len(chain[-1][1]), len(transform[1])) <= MAX_FUSED_PERIOD:
+                chain[-1] = _compose(chain[-1], transform)
+            else:
+                chain.append(transform)
+        return chain
+
+    def apply_stages(self, text):
+        """Run the stages one after another through the character-level ciphers."""
+        for cipher, key, decrypt in self.stages:
+            if cipher == 'atbash':
+                text = atbash_cipher(text)
+            elif cipher == 'caesar':
+                text = caesar_cipher(text, -key if decrypt else key)
+            else:
+                text = vigenere_cipher(text, _inverse_keyword(key) if decrypt else key)
+        return text
+
+
+def apply_many(text, pipelines):
+    """Run several pipelines over the same text and return their outputs.
+
+    Fusable pipelines on ASCII text share one segmentation of the text into
+    letters, so asking for three ciphers costs about one pass, not three.
+    """
+    chains = [pipeline.fused() if text.isascii() else None for pipeline in pipelines]
+    outputs = [None] * len(pipelines)
+    fast = [n for n, chain in enumerate(chains) if chain is not None]
+    if fast:
+        for n, output in zip(fast, _run(text.encode('ascii'), [chains[n] for n in fast])):
+            outputs[n] = output
+    for n, chain in enumerate(chains):
+        if chain is None:
+            outputs[n] = pipelines[n].apply_stages(text)
+    return outputs
+
+
+def _transform(cipher, key, decrypt):
+    if cipher == 'atbash':
+        sign, shifts = -1, [25]
+    elif cipher == 'caesar':
+        if not isinstance(key, int):
+            return None
+        sign, shifts = 1, [key % 26]
+    else:
+        if not isinstance(key, str) or not key:
+            return None
+        sign, shifts = 1, [(ord(char) - 65) % 26 for char in key.upper()]
+    if decrypt:
+        # x -> sign * x + b is undone by x -> sign * x - sign * b
+        shifts = [-sign * shift % 26 for shift in shifts]
+    return sign, shifts
+
+
+def _compose(first, second):
+    (sign1, shifts1), (sign2, shifts2) = first, second
+    period = _lcm(len(shifts1), len(shifts2))
+    return sign1 * sign2, [(sign2 * shifts1[i % len(shifts1)] + shifts2[i % len(shifts2)]) % 26
+                           for i in range(period)]
+
+
+def _lcm(a, b):
+    return a * b // math.gcd(a, b)
+
+
+def _rotate_stage(stage, offset):
+    # A Vigenere stage that starts `offset` letters into its keyword
+    cipher, key, decrypt = stage
+    if cipher != 'vigenere' or not isinstance(key, str) or not key:
+        return stage
+    key = key.upper()
+    offset %= len(key)
+    return cipher, key[offset:] + key[:offset], decrypt
+
+
+def _inverse_keyword(keyword):
+    return ''.join(chr(65 + (65 - ord(char)) % 26) for char in keyword.upper())
+
+
+def _run(data, chains):
+    # Each chain is a list of (sign, shifts) passes over ASCII bytes.
+    outputs = [None] * len(chains)
+    periodic = []
+    for n, chain in enumerate(chains):
+        if not chain:
+            outputs[n] = data
+        elif len(chain) == 1 and len(chain[0][1]) == 1:
+            sign, (shift,) = chain[0]
+            outputs[n] = data.translate(TABLES[sign, shift])
+        else:
+            periodic.append(n)
+    if periodic:
+        run = _run_numpy if numpy is not None and len(data) >= NUMPY_MIN_SIZE else _run_bytes
+        for n, output in zip(periodic, run(data, [chains[n] for n in periodic])):
+            outputs[n] = output
+    return [output.decode('ascii') for output in outputs]
+
+
+def _run_bytes(data, chains):
+    parts = _NON_LETTERS.split(data)
+    letters = b''.join(parts[0::2])
+    outputs = []
+    for chain in chains:
+        encrypted = letters
+        for sign, shifts in chain:
+            encrypted = _translate_periodic(encrypted, sign, shifts)
+        outputs.append(_reinsert(parts, encrypted))
+    return outputs
+
+
+def _translate_periodic(letters, sign, shifts):
+    # Letter i uses shifts[i % period], so every period-th letter shares one
+    # table: translate those strided slices in one call each.
+    out = bytearray(letters)
+    period = len(shifts)
+    for offset in range(min(period, len(letters))):
+        out[offset::period] = letters[offset::period].translate(TABLES[sign, shifts[offset]])
+    return out
+
+
+def _reinsert(parts, letters):
+    if len(parts) == 1:
+        return bytes(letters)
+    pieces = list(parts)
+    start = 0
+    for i in range(0, len(pieces), 2):
+        end = start + len(pieces[i])
+        pieces[i] = letters[start:end]
+        start = end
+    return b''.join(pieces)
+
+
+def _run_numpy(data, chains):
+    source = numpy.frombuffer(data, dtype=numpy.uint8)
+    outputs = [source.copy() for _ in chains]
+    keys = [[(sign, numpy.array(shifts, dtype=numpy.uint8)) for sign, shifts in chain] for chain in chains]
+    letter_index = 0
+    for start in range(0, len(source), NUMPY_BLOCK):
+        block = source[start:start + NUMPY_BLOCK]
+        base = numpy.where(block - 65 < 26, 65, 97).astype(numpy.uint8)
+        offset = block - base  # wraps around for non-letters, leaving them >= 26
+        letters = offset < 26
+        count = int(numpy.count_nonzero(letters))
+        if not count:
+            continue
+        base, offset = base[letters], offset[letters]
+        index = numpy.arange(letter_index, letter_index + count)
+        for output, chain in zip(outputs, keys):
+            values = offset
+            for sign, key in chain:
+                shift = key[index % len(key)]
+                values = (values + shift) % 26 if sign > 0 else (shift + 26 - values) % 26
+            output[start:start + NUMPY_BLOCK][letters] = values + base
+        letter_index += count
+    return [output.tobytes() for output in outputs]
+
+
+# Reference implementations, one character at a time.
+
+def _atbash_chars(text):
+    result = []
+    for char in text:
+        if char.isupper():
+            result.append(chr(90 - (ord(char) - 65)))
+        elif char.islower():
+            result.append(chr(122 - (ord(char) - 97)))
+        else:
+            result.append(char)
+    return ''.join(result)
+
+
+def _caesar_chars(text, shift):
+    result = []
+    for char in text:
+        if char.isupper():
+            result.append(chr((ord(char) - 65 + shift) % 26 + 65))
+        elif char.islower():
+            result.append(chr((ord(char) - 97 + shift) % 26 + 97))
+        else:
+            result.append(char)
+    return ''.join(result)
+
+
+def _vigenere_chars(text, keyword):
+    result = []
+    keyword = keyword.upper()
+    keyword_index = 0
+
+    for char in text:
+        if char.isalpha():
+            shift = ord(keyword[keyword_index % len(keyword)]) - 65
+            if char.isupper():
+                result.append(chr((ord(char) - 65 + shift) % 26 + 65))
+            else:
+                result.append(chr((ord(char) - 97 + shift) % 26 + 97))
+            keyword_index += 1
+        else:
+            result.append(char)
+
+    return ''.join(result)
@@ -0,0 +1,43 @@
+"""JSON encoding for both services and the wellness store.
+
+Uses orjson when it is installed and the json module otherwise; either way
+the output is compact UTF-8 and dict keys that aren't strings are
+converted the way json.dumps converts them.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # optional: 5-10x faster encoding and decoding
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def dumpb(obj, default=None, indent=False, sort_keys=False):
+    """Encode `obj` as UTF-8 JSON bytes.
+
+    `default(value)` is called for values neither backend knows how to
+    encode and must return something that can be encoded or raise TypeError.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default, option=option)
+    return json.dumps(obj, default=default, indent=2 if indent else None, sort_keys=sort_keys,
+                      separators=(',', ': ') if indent else (',', ':'), ensure_ascii=False).encode()
+
+
+def dumps(obj, **kwargs):
+    """Like dumpb, but returns str."""
+    return dumpb(obj, **kwargs).decode()
+
+
+def loads(data):
+    """Decode JSON from str, bytes or bytearray."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,220 @@
+"""Compressed, validated and cached responses for the Flask app.
+
+Responses are gzip-encoded for clients that accept it, or brotli-encoded
+when the brotli package is installed and the client prefers it. Static
+files are served under content-hashed URLs that browsers can cache for
+good, and rendered pages are kept per user with an ETag so a revisit
+costs a 304.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response, current_app, request
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+from metrics import span
+
+try:
+    import brotli
+except ImportError:  # optional: output about 15% smaller than gzip
+    brotli = None
+
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+COMPRESSIBLE = frozenset({'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+                          'application/javascript', 'application/json', 'application/x-ndjson', 'image/svg+xml'})
+# (gzip level, brotli quality): per request, and for content compressed once and kept
+LEVELS = {False: (6, 5), True: (9, 11)}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def negotiate(accept_encodings):
+    """The encoding of ENCODINGS the client rates highest, or None.
+
+    `accept_encodings` is werkzeug's request.accept_encodings.
+    """
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding, best=False):
+    gzip_level, brotli_quality = LEVELS[best]
+    with span('http.compress'):
+        if encoding == 'br':
+            return brotli.compress(data, quality=brotli_quality)
+        return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def _wanted_encoding(size):
+    if not current_app.config['COMPRESS'] or size < current_app.config['COMPRESS_MIN_BYTES']:
+        return None
+    return negotiate(request.accept_encodings)
+
+
+def compress_responses(app):
+    """Compress a Flask app's responses for clients that accept it.
+
+    Only whole (not streamed) bodies of COMPRESSIBLE types of at least
+    COMPRESS_MIN_BYTES are compressed; setting COMPRESS to False turns
+    this off, e.g. behind a proxy that compresses.
+    """
+    app.config.setdefault('COMPRESS', True)
+    app.config.setdefault('COMPRESS_MIN_BYTES', 1024)
+
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed or response.mimetype not in COMPRESSIBLE
+                or response.status_code in (204, 206, 304) or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        body = response.get_data()
+        encoding = _wanted_encoding(len(body))
+        if encoding is None:
+            return response
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        # The ETag named the uncompressed body
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+class Content:
+    """A response body with its ETag, and its compressed forms once made."""
+
+    __slots__ = ('body', 'mimetype', 'etag', 'best', '_encoded')
+
+    def __init__(self, body, mimetype, best=False):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:20]
+        self.best = best
+        self._encoded = {}
+
+    def encoded(self, encoding):
+        """The body as `encoding`, or None if that would not be smaller."""
+        if encoding not in self._encoded:
+            data = compress(self.body, encoding, self.best)
+            # Racing threads compute the same bytes
+            self._encoded[encoding] = data if len(data) < len(self.body) else None
+        return self._encoded[encoding]
+
+    def response(self, cache_control):
+        """The Flask response for this request: 304 if the client has it, else the best encoding."""
+        response = Response(status=304) if request.if_none_match.contains_weak(self.etag) else None
+        if response is None:
+            compressible = self.mimetype in COMPRESSIBLE
+            encoding = _wanted_encoding(len(self.body)) if compressible else None
+            data = self.encoded(encoding) if encoding else None
+            response = Response(data or self.body, mimetype=self.mimetype)
+            if data:
+                response.headers['Content-Encoding'] = encoding
+            if compressible:
+                response.vary.add('Accept-Encoding')
+        response.set_etag(self.etag)
+        response.headers['Cache-Control'] = cache_control
+        return response
+
+
+class StaticAssets:
+    """Serves a folder of static files under content-hashed URLs.
+
+    Installed on an app, url_for('static', filename=...) gains a `v`
+    argument with a hash of the file. A request with the current hash is
+    cached by browsers as immutable for a year; any other (such as a page
+    cached before a deploy asking for an old hash) gets the current file
+    with no-cache. Files are kept in memory with their compressed forms
+    and reread when their mtime changes, so this is meant for the app's
+    own CSS and JavaScript rather than large downloads.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.add_url_rule('/static/<path:filename>', endpoint='static', view_func=self.serve)
+        app.url_defaults(self.url_defaults)
+
+    def get(self, filename):
+        """The Content of `filename`, or None if there is no such file."""
+        path = safe_join(self.folder, filename)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._files.get(filename)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            content = Content(f.read(), mimetypes.guess_type(filename)[0] or 'application/octet-stream', best=True)
+        with self._lock:
+            self._files[filename] = (version, content)
+        return content
+
+    def url_defaults(self, endpoint, values):
+        if endpoint == 'static' and 'v' not in values:
+            content = self.get(values.get('filename', ''))
+            if content is not None:
+                values['v'] = content.etag
+
+    def serve(self, filename):
+        content = self.get(filename)
+        if content is None:
+            raise NotFound()
+        return content.response(IMMUTABLE if request.args.get('v') == content.etag else 'no-cache')
+
+
+class PageCache:
+    """LRU cache of rendered pages as Content, bounded by their total body size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            content = self._entries.get(key)
+            if content is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return content
+
+    def put(self, key, content):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old.body)
+            self._entries[key] = content
+            self.size += len(content.body)
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.body)
+                self.evictions += 1
+        return content
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.size, 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions}
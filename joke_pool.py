@@ -0,0 +1,197 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import fastjson
+from metrics import span
+
+# JokeAPI categories that safe mode can return
+CATEGORIES = ('Programming', 'Misc', 'Pun', 'Spooky', 'Christmas')
+
+# Served when the pool has nothing suitable, e.g. while JokeAPI is down
+FALLBACK_JOKES = (
+    {'joke': 'Why do programmers prefer dark mode?\n\nBecause light attracts bugs.', 'category': 'Programming'},
+    {'joke': 'There are 10 kinds of people in the world: those who understand binary and those who don\'t.',
+     'category': 'Programming'},
+    {'joke': 'Why did the developer go broke?\n\nBecause they used up all their cache.', 'category': 'Programming'},
+    {'joke': 'How many programmers does it take to change a light bulb?\n\nNone, that\'s a hardware problem.',
+     'category': 'Programming'},
+    {'joke': 'A SQL query walks into a bar, walks up to two tables and asks: "Can I join you?"',
+     'category': 'Programming'},
+    {'joke': 'Why don\'t scientists trust atoms?\n\nBecause they make up everything.', 'category': 'Misc'},
+    {'joke': 'What do you call a fake noodle?\n\nAn impasta.', 'category': 'Misc'},
+    {'joke': 'Why did the scarecrow win an award?\n\nBecause he was outstanding in his field.', 'category': 'Misc'},
+    {'joke': 'I told my friend she drew her eyebrows too high. She looked surprised.', 'category': 'Misc'},
+    {'joke': 'I used to be a banker, but I lost interest.', 'category': 'Pun'},
+    {'joke': 'I\'m reading a book about anti-gravity. It\'s impossible to put down.', 'category': 'Pun'},
+    {'joke': 'The past, the present and the future walked into a bar. It was tense.', 'category': 'Pun'},
+    {'joke': 'Why didn\'t the skeleton go to the party?\n\nHe had no body to go with.', 'category': 'Spooky'},
+    {'joke': 'What room does a ghost not need?\n\nA living room.', 'category': 'Spooky'},
+    {'joke': 'What do you call an obnoxious reindeer?\n\nRude-olph.', 'category': 'Christmas'},
+    {'joke': 'What do snowmen eat for breakfast?\n\nFrosted flakes.', 'category': 'Christmas'},
+)
+
+
+def joke_text(joke_data):
+    if joke_data['type'] == 'single':
+        return joke_data['joke']
+    return f"{joke_data['setup']}\n\n{joke_data['delivery']}"
+
+
+class JokePool:
+    """Jokes fetched ahead of time from JokeAPI, so serving one is a pop.
+
+    Holds up to `capacity` jokes. Taking one that leaves fewer than
+    `low_water` starts a background refill of `amount` jokes per upstream
+    call until the pool is full again. A category with no jokes left
+    triggers a refill of that category alone. If the pool runs dry (demand
+    outpaces JokeAPI, or it is failing) a recently served joke is repeated,
+    and with none of those either a joke from FALLBACK_JOKES. Failed
+    refills back off exponentially up to `max_backoff` seconds.
+    """
+
+    def __init__(self, session, url, capacity=100, low_water=25, amount=10, timeout=10, max_backoff=60):
+        self.session = session
+        self.url = url.rstrip('/')
+        self.capacity = capacity
+        self.low_water = low_water
+        self.amount = amount
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.served = 0
+        self.repeats = 0
+        self.fallbacks = 0
+        self.refills = 0
+        self.refill_errors = 0
+        self.fetched = 0
+        self.last_error = None
+        self._jokes = deque()
+        self._recent = deque(maxlen=capacity)
+        self._ids = set()
+        self._pending = set()
+        self._retry_at = 0.0
+        self._backoff = 0.0
+        self._lock = threading.Lock()
+        self._refiller = ThreadPoolExecutor(1, thread_name_prefix='joke-refill')
+
+    def start(self):
+        """Fill the pool in the background."""
+        with self._lock:
+            self._schedule('Any')
+
+    def get(self, category=None):
+        """Return (joke, category, source); source is pool, recent or fallback."""
+        with self._lock:
+            joke = self._take(category)
+            if len(self._jokes) < self.low_water:
+                self._schedule('Any')
+            if joke is None and category:
+                self._schedule(category)
+            if joke is not None:
+                self.served += 1
+                self._recent.append(joke)
+                return joke['joke'], joke['category'], 'pool'
+            recent = [joke for joke in self._recent if not category or joke['category'] == category]
+            if recent:
+                self.repeats += 1
+                joke = random.choice(recent)
+                return joke['joke'], joke['category'], 'recent'
+            self.fallbacks += 1
+        candidates = [joke for joke in FALLBACK_JOKES if not category or joke['category'] == category]
+        joke = random.choice(candidates or FALLBACK_JOKES)
+        return joke['joke'], joke['category'], 'fallback'
+
+    def _take(self, category):
+        if not category:
+            if not self._jokes:
+                return None
+            joke = self._jokes.popleft()
+        else:
+            index = next((i for i, joke in enumerate(self._jokes) if joke['category'] == category), None)
+            if index is None:
+                return None
+            joke = self._jokes[index]
+            del self._jokes[index]
+        self._ids.discard(joke['id'])
+        return joke
+
+    def _schedule(self, category):
+        # Called with the lock held; one refill per category at a time
+        if category in self._pending or time.monotonic() < self._retry_at:
+            return
+        self._pending.add(category)
+        self._refiller.submit(self._refill, category)
+
+    def _refill(self, category):
+        try:
+            while True:
+                with self._lock:
+                    room = self.capacity - len(self._jokes)
+                # A category refill makes one call even into a full pool
+                if category == 'Any' and room <= 0:
+                    break
+                added = self._add(self._fetch(category))
+                with self._lock:
+                    self.refills += 1
+                    self._backoff = 0.0
+                if category != 'Any' or not added:
+                    break
+        except Exception as exc:
+            with self._lock:
+                self.refill_errors += 1
+                self.last_error = str(exc) or type(exc).__name__
+                self._backoff = min(self.max_backoff, self._backoff * 2 or 1.0)
+                self._retry_at = time.monotonic() + self._backoff
+        finally:
+            with self._lock:
+                self._pending.discard(category)
+
+    def _fetch(self, category):
+        with span('upstream.jokeapi'):
+            response = self.session.get(f'{self.url}/{category}?safe-mode&amount={self.amount}', timeout=self.timeout)
+        response.raise_for_status()
+        data = fastjson.loads(response.content)
+        if data.get('error'):
+            raise ValueError(data.get('message') or 'JokeAPI returned an error')
+        # A single joke comes back bare rather than in a list
+        return data['jokes'] if 'jokes' in data else [data]
+
+    def _add(self, jokes):
+        added = 0
+        with self._lock:
+            self.fetched += len(jokes)
+            # Allow one batch past capacity so a category refill always fits
+            for joke_data in jokes:
+                if joke_data['id'] in self._ids or len(self._jokes) >= self.capacity + self.amount:
+                    continue
+                self._ids.add(joke_data['id'])
+                self._jokes.append({'id': joke_data['id'], 'joke': joke_text(joke_data),
+                                    'category': joke_data.get('category', 'Misc')})
+                added += 1
+        return added
+
+    def close(self):
+        """Stop refilling; a refill already running finishes on its own."""
+        self._refiller.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            by_category = {}
+            for joke in self._jokes:
+                by_category[joke['category']] = by_category.get(joke['category'], 0) + 1
+            return {
+                'size': len(self._jokes),
+                'capacity': self.capacity,
+                'low_water': self.low_water,
+                'by_category': by_category,
+                'served': self.served,
+                'repeats': self.repeats,
+                'fallbacks': self.fallbacks,
+                'refills': self.refills,
+                'refill_errors': self.refill_errors,
+                'fetched': self.fetched,
+                'refilling': sorted(self._pending),
+                'last_error': self.last_error,
+            }
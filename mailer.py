@@ -0,0 +1,374 @@
+import json
+import logging
+import random
+import smtplib
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Job states: queued -> sending -> sent, or back to queued with a later
+# next_attempt_at after a temporary failure, or failed once it is permanent
+# or max_attempts is used up.
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS mail_jobs (
+    id TEXT PRIMARY KEY,
+    owner TEXT,
+    sender TEXT NOT NULL,
+    recipients TEXT NOT NULL,
+    message BLOB NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mail_batches (
+    id TEXT PRIMARY KEY,
+    owner TEXT,
+    message BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+'''
+
+# A job in a batch stores only its own To header in `message`; the rest of
+# the email, shared by every recipient, is stored once in mail_batches.
+# Errors worth retrying: the connection went away or the server answered 4xx.
+TEMPORARY_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, socket.error)
+
+
+def _serialize(message):
+    # SMTP wants CRLF line endings; Message.as_bytes() would use bare LF
+    return message.as_bytes(policy=message.policy.clone(linesep='\r\n'))
+
+
+class SMTPSettings:
+    def __init__(self, host, port, username=None, password=None, starttls=True, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+
+    def connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.username:
+                server.login(self.username, self.password)
+        except BaseException:
+            server.close()
+            raise
+        return server
+
+
+class MailDispatcher:
+    """Sends queued email from background threads over reused SMTP sessions.
+
+    Jobs are stored in SQLite, so queued mail survives a restart. Each of
+    `workers` threads keeps one authenticated session open and sends up to
+    `batch_size` claimed jobs over it before checking the queue again;
+    a session idle for `idle_timeout` seconds is closed. Temporary
+    failures are retried with exponential backoff up to `max_attempts`.
+
+    Several processes can share one queue. A claimed job still unsent after
+    `claim_timeout` seconds is taken to belong to a process that died, and
+    is queued again.
+    """
+
+    def __init__(self, path, settings, workers=2, batch_size=20, max_attempts=5,
+                 backoff=2.0, idle_timeout=60, claim_timeout=900):
+        self.path = path
+        self.settings = settings
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.claim_timeout = claim_timeout
+        self.connections = 0
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._threads = []
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        if 'batch_id' not in [row[1] for row in conn.execute('PRAGMA table_info(mail_jobs)')]:
+            conn.execute('ALTER TABLE mail_jobs ADD COLUMN batch_id TEXT')
+        conn.execute('CREATE INDEX IF NOT EXISTS mail_jobs_batch ON mail_jobs (batch_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS mail_jobs_due ON mail_jobs (status, next_attempt_at)')
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def start(self):
+        with self._wakeup:
+            if self._threads:
+                return
+            self._stopping = False
+            self._threads = [threading.Thread(target=self._worker, daemon=True, name=f'mailer-{n}')
+                             for n in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=10):
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, message, sender, recipients, owner=None):
+        """Queue an email.message.Message for delivery and return its job id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._connection().execute(
+            'INSERT INTO mail_jobs (id, owner, sender, recipients, message, status, next_attempt_at, '
+            "created_at, updated_at) VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+            (job_id, owner, sender, json.dumps(list(recipients)), _serialize(message), now, now, now),
+        )
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def submit_batch(self, message, sender, recipients, owner=None):
+        """Queue one copy of `message` per recipient, each with its own To header.
+
+        The message is serialized once and shared by all the jobs. Returns
+        (batch_id, job_ids) with job_ids in the order of `recipients`.
+        """
+        del message['To']
+        shared = _serialize(message)
+        batch_id = uuid.uuid4().hex
+        job_ids = [uuid.uuid4().hex for _ in recipients]
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN')
+        try:
+            conn.execute('INSERT INTO mail_batches (id, owner, message, created_at) VALUES (?, ?, ?, ?)',
+                         (batch_id, owner, shared, now))
+            conn.executemany(
+                'INSERT INTO mail_jobs (id, owner, sender, recipients, message, status, next_attempt_at, '
+                "created_at, updated_at, batch_id) VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+                [(job_id, owner, sender, json.dumps([recipient]), f'To: {recipient}\r\n'.encode(),
+                  now, now, now, batch_id) for job_id, recipient in zip(job_ids, recipients)],
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        with self._wakeup:
+            self._wakeup.notify_all()
+        return batch_id, job_ids
+
+    def status(self, job_id):
+        row = self._connection().execute(
+            'SELECT id, owner, status, attempts, error, created_at, updated_at FROM mail_jobs WHERE id = ?',
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ('job_id', 'owner', 'status', 'attempts', 'error', 'created_at', 'updated_at')
+        return dict(zip(keys, row))
+
+    def batch_status(self, batch_id):
+        conn = self._connection()
+        row = conn.execute('SELECT owner, created_at FROM mail_batches WHERE id = ?', (batch_id,)).fetchone()
+        if row is None:
+            return None
+        jobs = conn.execute(
+            'SELECT id, recipients, status, attempts, error, updated_at FROM mail_jobs WHERE batch_id = ? '
+            'ORDER BY rowid', (batch_id,)).fetchall()
+        counts = {}
+        for job in jobs:
+            counts[job[2]] = counts.get(job[2], 0) + 1
+        return {
+            'batch_id': batch_id,
+            'owner': row[0],
+            'created_at': row[1],
+            'total': len(jobs),
+            'counts': counts,
+            'done': counts.get('sent', 0) + counts.get('failed', 0) == len(jobs),
+            'recipients': [{'email': json.loads(recipients)[0], 'job_id': job_id, 'status': status,
+                            'attempts': attempts, 'error': error, 'updated_at': updated_at}
+                           for job_id, recipients, status, attempts, error, updated_at in jobs],
+        }
+
+    def stats(self):
+        counts = dict(self._connection().execute('SELECT status, COUNT(*) FROM mail_jobs GROUP BY status'))
+        return {'jobs': counts, 'connections_opened': self.connections, 'workers': self.workers}
+
+    def _claim(self):
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may be sending these right now, unless it has
+            # been at it for so long that it must have stopped
+            conn.execute("UPDATE mail_jobs SET status = 'queued' WHERE status = 'sending' AND updated_at < ?",
+                         (now - self.claim_timeout,))
+            # Single emails go ahead of any large batch in the queue
+            rows = conn.execute(
+                "SELECT id, sender, recipients, message, attempts, batch_id FROM mail_jobs "
+                "WHERE status = 'queued' AND next_attempt_at <= ? "
+                "ORDER BY batch_id IS NOT NULL, next_attempt_at LIMIT ?",
+                (now, self.batch_size),
+            ).fetchall()
+            conn.executemany("UPDATE mail_jobs SET status = 'sending', updated_at = ? WHERE id = ?",
+                             [(now, row[0]) for row in rows])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return rows
+
+    def _batch_message(self, batch_id):
+        row = self._connection().execute('SELECT message FROM mail_batches WHERE id = ?', (batch_id,)).fetchone()
+        return row[0]
+
+    def _next_due(self):
+        row = self._connection().execute(
+            "SELECT MIN(next_attempt_at) FROM mail_jobs WHERE status = 'queued'").fetchone()
+        return row[0]
+
+    def _finish(self, job_id, status, attempts, error=None, retry_at=None):
+        now = time.time()
+        self._connection().execute(
+            'UPDATE mail_jobs SET status = ?, attempts = ?, error = ?, next_attempt_at = ?, updated_at = ? '
+            'WHERE id = ?',
+            (status, attempts, error, retry_at or now, now, job_id),
+        )
+
+    def _worker(self):
+        server, last_used = None, 0.0
+        shared = (None, None)
+        failures = 0
+        while True:
+            jobs, started = [], 0
+            try:
+                jobs = self._claim()
+                failures = 0
+                if not jobs:
+                    if server is not None and time.monotonic() - last_used > self.idle_timeout:
+                        server = self._close(server)
+                    with self._wakeup:
+                        if self._stopping:
+                            break
+                        due = self._next_due()
+                        wait = self.idle_timeout if due is None else max(0.0, min(due - time.time(), self.idle_timeout))
+                        self._wakeup.wait(wait)
+                        if self._stopping:
+                            break
+                    continue
+                for job_id, sender, recipients, message, attempts, batch_id in jobs:
+                    started += 1
+                    if batch_id is not None:
+                        if shared[0] != batch_id:
+                            shared = (batch_id, self._batch_message(batch_id))
+                        message += shared[1]
+                    server = self._send(server, job_id, sender, json.loads(recipients), message, attempts + 1)
+                    last_used = time.monotonic()
+            except Exception:
+                # Most likely the database (locked by another process, or the
+                # disk is full). Start over with a fresh session after a pause
+                logger.exception('Mail worker failed; retrying')
+                failures += 1
+                server, shared = self._close(server), (None, None)
+                self._recover(jobs[started:])
+                with self._wakeup:
+                    if self._stopping:
+                        break
+                    self._wakeup.wait(min(self.backoff * 2 ** min(failures - 1, 10), self.idle_timeout))
+                    if self._stopping:
+                        break
+        self._close(server)
+
+    def _recover(self, unsent):
+        # Jobs claimed but not yet tried go back on the queue. The one being
+        # sent when it failed may have gone out, so it is left to claim_timeout
+        conn = self._connection()
+        try:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            if unsent:
+                conn.executemany("UPDATE mail_jobs SET status = 'queued' WHERE id = ? AND status = 'sending'",
+                                 [(job[0],) for job in unsent])
+        except sqlite3.Error:
+            logger.exception('Could not put %d claimed emails back on the queue', len(unsent))
+
+    def _send(self, server, job_id, sender, recipients, message, attempt):
+        # A reused session may have been dropped by the server while idle;
+        # that costs one reconnect, not an attempt.
+        reused = server is not None
+        try:
+            try:
+                if server is None:
+                    server = self._open()
+                with span('smtp.send'):
+                    refused = server.sendmail(sender, recipients, message)
+            except smtplib.SMTPServerDisconnected:
+                server = self._close(server)
+                if not reused:
+                    raise
+                server = self._open()
+                with span('smtp.send'):
+                    refused = server.sendmail(sender, recipients, message)
+        except smtplib.SMTPRecipientsRefused as exc:
+            self._finish(job_id, 'failed', attempt, f'Recipients refused: {", ".join(exc.recipients)}')
+            return server
+        except smtplib.SMTPResponseException as exc:
+            # 4xx is temporary, 5xx permanent; either way start a fresh
+            # session for the next message
+            error = exc.smtp_error.decode('utf-8', 'replace') if isinstance(exc.smtp_error, bytes) else exc.smtp_error
+            self._fail(job_id, attempt, f'{exc.smtp_code} {error}', temporary=400 <= exc.smtp_code < 500)
+            return self._close(server)
+        except TEMPORARY_ERRORS as exc:
+            self._fail(job_id, attempt, str(exc) or type(exc).__name__, temporary=True)
+            return self._close(server)
+        except Exception as exc:
+            self._fail(job_id, attempt, str(exc) or type(exc).__name__, temporary=False)
+            return self._close(server)
+        error = f'Refused: {", ".join(refused)}' if refused else None
+        self._finish(job_id, 'sent', attempt, error)
+        return server
+
+    def _open(self):
+        with span('smtp.connect'):
+            server = self.settings.connect()
+        with self._wakeup:
+            self.connections += 1
+        return server
+
+    def _fail(self, job_id, attempt, error, temporary):
+        if temporary and attempt < self.max_attempts:
+            delay = self.backoff * 2 ** (attempt - 1) * random.uniform(0.8, 1.2)
+            self._finish(job_id, 'queued', attempt, error, time.time() + delay)
+            with self._wakeup:
+                self._wakeup.notify()
+        else:
+            self._finish(job_id, 'failed', attempt, error)
+
+    @staticmethod
+    def _close(server):
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                server.close()
+        return None
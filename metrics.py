@@ -0,0 +1,398 @@
+"""Request metrics, timing spans and a slow-request profiler.
+
+Everything is recorded in the process-wide REGISTRY and rendered in the
+Prometheus text format by REGISTRY.render(). Both services import this
+module, so in each process:
+
+    http_request_duration_seconds{route, method, status}   histogram
+    http_requests_in_flight{route, method}                  gauge
+    span_duration_seconds{span}                             histogram
+
+and whatever stats() dicts the service registers with REGISTRY.stats().
+"""
+import bisect
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter as Tally, deque
+from functools import wraps
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+class Metric:
+    """A metric family; each combination of label values is one series."""
+
+    type = 'untyped'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        try:
+            if len(labels) == len(self.labels):
+                return tuple(map(labels.__getitem__, self.labels))
+        except KeyError:
+            pass
+        raise ValueError(f'{self.name} takes labels {", ".join(self.labels) or "(none)"}')
+
+    def _add(self, amount, labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        with self._lock:
+            series = list(self._series.items())
+        for key, value in series:
+            lines.append(f'{self.name}{_labels(self.labels, key)} {_number(value)}')
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self._add(amount, labels)
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        self._add(amount, labels)
+
+    def dec(self, amount=1, **labels):
+        self._add(-amount, labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (not yet cumulative), then sum
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        with self._lock:
+            series = [(key, list(counts)) for key, counts in self._series.items()]
+        for key, counts in series:
+            total = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                total += count
+                lines.append(f'{self.name}_bucket{_labels(self.labels, key, [("le", _number(bound))])} {total}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, key)} {_number(counts[-1])}')
+            lines.append(f'{self.name}_count{_labels(self.labels, key)} {total}')
+        return lines
+
+
+class StatsCollector:
+    """Numbers from a stats() dict, read at scrape time.
+
+    {'hits': 3, 'jobs': {'sent': 2}} under prefix "cache" becomes
+    cache_hits 3 and cache_jobs_sent 2; values that aren't numbers are
+    skipped. They are exposed untyped, as the dicts mix counts and levels.
+    """
+
+    def __init__(self, prefix, fn):
+        self.name = prefix
+        self.fn = fn
+
+    def render(self):
+        lines = []
+        for name, value in self._flatten(self.name, self.fn()):
+            lines += [f'# TYPE {name} untyped', f'{name} {_number(value)}']
+        return lines
+
+    def _flatten(self, prefix, stats):
+        for key, value in stats.items():
+            name = f'{prefix}_{re.sub(r"[^a-zA-Z0-9_]", "_", str(key))}'
+            if isinstance(value, dict):
+                yield from self._flatten(name, value)
+            elif isinstance(value, (int, float)):
+                yield name, value
+
+
+class Registry:
+    """Metrics in one process. Registering a name again replaces the old one."""
+
+    def __init__(self):
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def register(self, collector):
+        with self._lock:
+            self._collectors[collector.name] = collector
+        return collector
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def stats(self, prefix, fn):
+        return self.register(StatsCollector(prefix, fn))
+
+    def render(self):
+        with self._lock:
+            collectors = list(self._collectors.values())
+        lines = []
+        for collector in collectors:
+            try:
+                lines += collector.render()
+            except Exception as exc:
+                # One broken stats() must not take the whole scrape down
+                lines.append(f'# {collector.name} failed: {_escape(exc)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+REQUEST_SECONDS = REGISTRY.histogram('http_request_duration_seconds', 'Time to handle a request',
+                                     ('route', 'method', 'status'))
+REQUESTS_IN_FLIGHT = REGISTRY.gauge('http_requests_in_flight', 'Requests being handled', ('route', 'method'))
+SPAN_SECONDS = REGISTRY.histogram('span_duration_seconds', 'Time spent in instrumented internals', ('span',))
+
+
+class span:
+    """Time a block, or every call of a function when used as a decorator."""
+
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        SPAN_SECONDS.observe(time.perf_counter() - self.started, span=self.name)
+
+    def __call__(self, fn):
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            with span(self.name):
+                return fn(*args, **kwargs)
+        return timed
+
+
+def _folded(frame, thread_name):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    names.append(f'thread {thread_name}')
+    return ';'.join(reversed(names))
+
+
+class SlowRequestProfiler:
+    """Samples every thread's stack while requests are in flight.
+
+    A request that takes `threshold` seconds or more gets the samples taken
+    during it written to `directory` as folded stacks, one
+    "frame;frame;... count" line per distinct stack (the input of
+    flamegraph.pl and speedscope). With a thread id only that thread's
+    samples are kept; without one (async handlers share the event loop and
+    a thread pool) all threads are, each under a "thread <name>" root.
+    """
+
+    def __init__(self, directory, threshold, interval=0.005, max_age=30):
+        self.directory = directory
+        self.threshold = threshold
+        self.interval = interval
+        self.max_age = max_age
+        self.samples_taken = 0
+        self.profiles_written = 0
+        self._samples = deque()
+        self._active = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread = threading.Thread(target=self._run, name='slow-request-profiler', daemon=True)
+        self._thread.start()
+
+    def begin(self):
+        """Note a request starting; returns its start time for end()."""
+        with self._wake:
+            self._active += 1
+            self._wake.notify()
+        return time.perf_counter()
+
+    def end(self, started, name, thread_id=None):
+        """Note a request finishing; returns the profile path if one was written."""
+        ended = time.perf_counter()
+        with self._lock:
+            self._active -= 1
+            if ended - started < self.threshold:
+                return None
+            stacks = Tally(stack for at, ident, stack in self._samples
+                           if started <= at <= ended and (thread_id is None or ident == thread_id))
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_')
+        path = os.path.join(self.directory, f'{time.strftime("%Y%m%d-%H%M%S")}-{(ended - started) * 1000:.0f}ms-'
+                                            f'{slug}-{threading.get_ident()}.folded')
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path, 'w') as f:
+            f.writelines(f'{stack} {count}\n' for stack, count in stacks.most_common())
+        with self._lock:
+            self.profiles_written += 1
+        return path
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            with self._wake:
+                while not self._active:
+                    self._wake.wait()
+            now = time.perf_counter()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = [(ident, _folded(frame, names.get(ident, ident)))
+                      for ident, frame in sys._current_frames().items() if ident != me]
+            with self._lock:
+                self._samples.extend((now, ident, stack) for ident, stack in stacks)
+                self.samples_taken += 1
+                while self._samples and self._samples[0][0] < now - self.max_age:
+                    self._samples.popleft()
+            time.sleep(self.interval)
+
+    def stats(self):
+        with self._lock:
+            return {'threshold_seconds': self.threshold, 'samples_taken': self.samples_taken,
+                    'samples_kept': len(self._samples), 'profiles_written': self.profiles_written}
+
+
+def instrument_flask(app, profiler=None, streams=()):
+    """Record request metrics (and slow-request profiles) for a Flask app.
+
+    Requests for the paths in `streams` (long-lived event streams) are
+    counted in flight but neither timed nor profiled.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def start_request_metrics():
+        route = request.path if request.path in streams else \
+            request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUESTS_IN_FLIGHT.inc(route=route, method=request.method)
+        if request.path in streams:
+            started = None
+        else:
+            started = profiler.begin() if profiler else time.perf_counter()
+        g.request_metrics = [route, request.method, started, 500]
+
+    @app.after_request
+    def note_request_status(response):
+        if 'request_metrics' in g:
+            g.request_metrics[3] = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        # Runs after a streamed body has been sent
+        if 'request_metrics' not in g:
+            return
+        route, method, started, status = g.pop('request_metrics')
+        REQUESTS_IN_FLIGHT.dec(route=route, method=method)
+        if started is None:
+            return
+        REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, method=method, status=status)
+        if profiler:
+            profiler.end(started, f'{method} {route}', threading.get_ident())
+
+
+class ASGIMetrics:
+    """ASGI middleware recording request metrics (and slow-request profiles)
+    for a Starlette or FastAPI app: app.add_middleware(ASGIMetrics, profiler=...).
+    As with instrument_flask, requests for the paths in `streams` are only
+    counted in flight."""
+
+    MAX_ROUTES_CACHED = 4096
+
+    def __init__(self, app, profiler=None, streams=()):
+        self.app = app
+        self.profiler = profiler
+        self.streams = frozenset(streams)
+        self._routes = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        if scope['path'] in self.streams:
+            REQUESTS_IN_FLIGHT.inc(route=scope['path'], method=scope['method'])
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                REQUESTS_IN_FLIGHT.dec(route=scope['path'], method=scope['method'])
+        route, method, status = self._route(scope), scope['method'], [500]
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(route=route, method=method)
+        started = self.profiler.begin() if self.profiler else time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, method=method, status=status[0])
+            REQUESTS_IN_FLIGHT.dec(route=route, method=method)
+            if self.profiler:
+                self.profiler.end(started, f'{method} {route}')
+
+    def _route(self, scope):
+        # The path template, so /api/goals/1 and /api/goals/2 are one series.
+        # Matching every route costs ~40us, so results are remembered.
+        from starlette.routing import Match
+
+        key = (scope['method'], scope['path'])
+        path = self._routes.get(key)
+        if path is None:
+            path = next((getattr(route, 'path', 'unmatched') for route in scope['app'].router.routes
+                         if route.matches(scope)[0] == Match.FULL), 'unmatched')
+            if len(self._routes) >= self.MAX_ROUTES_CACHED:
+                self._routes.clear()
+            self._routes[key] = path
+        return path
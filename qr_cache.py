@@ -0,0 +1,320 @@
+import hashlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+
+import qrcode
+
+from metrics import span
+
+# Rendering parameters and their defaults (the look /api/generate-qr has
+# always had). Cache keys cover the text and all of these.
+QR_DEFAULTS = {'box_size': 10, 'border': 5, 'fill_color': 'black', 'back_color': 'white'}
+
+
+def qr_key(text, options):
+    payload = json.dumps([text, [options[name] for name in QR_DEFAULTS]], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def render_png(text, options):
+    qr = qrcode.QRCode(version=1, box_size=options['box_size'], border=options['border'])
+    qr.add_data(text)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color=options['fill_color'], back_color=options['back_color'])
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def render_batch(texts, options):
+    """Render several texts; returns (pngs, seconds spent rendering)."""
+    started = time.perf_counter()
+    pngs = [render_png(text, options) for text in texts]
+    return pngs, time.perf_counter() - started
+
+
+class PoolBusy(Exception):
+    """The render queue is full; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__('QR renderer is busy, try again shortly')
+        self.retry_after = retry_after
+
+
+class RenderTimeout(Exception):
+    pass
+
+
+class RenderPool:
+    """Renders QR codes in worker processes, off the request threads.
+
+    At most `max_pending` jobs are queued or running; past that, submitting
+    raises PoolBusy instead of queueing without bound. A job that is not
+    done within `timeout` seconds raises RenderTimeout. It keeps its worker
+    (and its queue slot) until it finishes, since processes cannot be
+    interrupted mid-render.
+    """
+
+    def __init__(self, workers=None, max_pending=None, timeout=10, batch_size=8):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.jobs = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._job_seconds = 0.0
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Created on first use, so importing the app does not start workers.
+        # Spawned rather than forked: the web server is multi-threaded.
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def _acquire(self, count):
+        acquired = 0
+        while acquired < count and self._slots.acquire(blocking=False):
+            acquired += 1
+        if acquired < count:
+            for _ in range(acquired):
+                self._slots.release()
+            with self._lock:
+                self.rejected += 1
+            raise PoolBusy(self.retry_after())
+
+    def retry_after(self):
+        # Seconds for the current queue to drain at the average job time
+        with self._lock:
+            average = self._job_seconds / self.jobs if self.jobs else 0.05
+        return max(1, math.ceil(average * self.max_pending / self.workers))
+
+    def render_many(self, texts, options):
+        """Render `texts` in batches across the workers; returns (pngs, seconds)."""
+        # At least batch_size texts per job, and no more jobs than workers
+        jobs = min(self.workers, math.ceil(len(texts) / self.batch_size))
+        size = math.ceil(len(texts) / jobs)
+        batches = [texts[i:i + size] for i in range(0, len(texts), size)]
+        self._acquire(len(batches))
+        futures = []
+        try:
+            pool = self._pool()
+            for batch in batches:
+                future = pool.submit(render_batch, batch, options)
+                future.add_done_callback(self._finished)
+                futures.append(future)
+        except BaseException:
+            for _ in range(len(batches) - len(futures)):
+                self._slots.release()
+            raise
+
+        done, pending = wait(futures, timeout=self.timeout)
+        if pending:
+            for future in pending:
+                future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise RenderTimeout(f'QR rendering took longer than {self.timeout}s')
+        pngs, seconds = [], 0.0
+        for future in futures:
+            batch_pngs, batch_seconds = future.result()
+            pngs.extend(batch_pngs)
+            seconds += batch_seconds
+        return pngs, seconds
+
+    def _finished(self, future):
+        self._slots.release()
+        if not future.cancelled() and future.exception() is None:
+            with self._lock:
+                self.jobs += 1
+                self._job_seconds += future.result()[1]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'jobs': self.jobs,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+            }
+
+    def shutdown(self):
+        # Outside the lock: finishing jobs' callbacks take it on the
+        # executor's thread, which shutdown waits for
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+class QRCache:
+    """Content-addressed cache of rendered QR code PNGs.
+
+    Images are keyed on a sha256 of the text and rendering options. Memory
+    holds the most recently used images up to `max_bytes`; if `directory`
+    is set, every rendered image is also kept there and survives restarts
+    and evictions. Misses render on `pool` if given, otherwise inline, and
+    concurrent misses for the same image share one render.
+    """
+
+    def __init__(self, max_bytes, directory=None, pool=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.pool = pool
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.renders = 0
+        self.render_seconds = 0.0
+        self.render_max = 0.0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def options(**overrides):
+        options = dict(QR_DEFAULTS)
+        options.update((name, value) for name, value in overrides.items() if value is not None)
+        return options
+
+    def get(self, text, options=None):
+        """Return (key, png) for `text`, rendering it on a miss."""
+        return self.get_many([text], options)[0]
+
+    def get_many(self, texts, options=None):
+        """Return [(key, png)] for `texts`, rendering all misses in one go."""
+        options = options or QR_DEFAULTS
+        keys = [qr_key(text, options) for text in texts]
+        found, owned, waiting = {}, {}, {}
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in found or key in owned or key in waiting:
+                    continue
+                png = self._entries.get(key)
+                if png is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    found[key] = png
+                elif key in self._inflight:
+                    waiting[key] = self._inflight[key]
+                else:
+                    owned[key] = text
+                    self._inflight[key] = Future()
+
+        try:
+            self._load(owned, options, found)
+        except BaseException as exc:
+            with self._lock:
+                for key in owned:
+                    self._inflight.pop(key).set_exception(exc)
+            raise
+        with self._lock:
+            for key in owned:
+                self._inflight.pop(key).set_result(found[key])
+        for key, future in waiting.items():
+            found[key] = future.result()
+            with self._lock:
+                self.coalesced += 1
+        return [(key, found[key]) for key in keys]
+
+    def _load(self, owned, options, found):
+        missing = {}
+        for key, text in owned.items():
+            png = self._read_disk(key)
+            if png is None:
+                missing[key] = text
+            else:
+                found[key] = png
+                with self._lock:
+                    self.disk_hits += 1
+        if missing:
+            texts = list(missing.values())
+            with span('qr.render'):
+                if self.pool is not None:
+                    pngs, seconds = self.pool.render_many(texts, options)
+                else:
+                    pngs, seconds = render_batch(texts, options)
+            with self._lock:
+                self.misses += len(texts)
+                self.renders += len(texts)
+                self.render_seconds += seconds
+                self.render_max = max(self.render_max, seconds / len(texts))
+            for key, png in zip(missing, pngs):
+                self._write_disk(key, png)
+                found[key] = png
+        for key in owned:
+            self._put(key, found[key])
+
+    def _put(self, key, png):
+        if len(png) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = png
+            self.size += len(png)
+            while self.size > self.max_bytes:
+                _, old = self._entries.popitem(last=False)
+                self.size -= len(old)
+                self.evictions += 1
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.png')
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key, png):
+        if not self.directory:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(png)
+        os.replace(tmp, path)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.coalesced + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'coalesced': self.coalesced,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round((self.hits + self.disk_hits + self.coalesced) / lookups, 4) if lookups else None,
+                'renders': self.renders,
+                'render_ms_avg': round(self.render_seconds / self.renders * 1000, 2) if self.renders else None,
+                'render_ms_max': round(self.render_max * 1000, 2),
+                'disk_dir': self.directory,
+                'pool': self.pool.stats() if self.pool is not None else None,
+            }
@@ -0,0 +1,311 @@
+"""Server-side Flask sessions shared by every worker process.
+
+The session cookie carries only a signed random id. The session itself
+lives in a store, so any process can serve any request and a logout takes
+effect in all of them at once.
+"""
+import base64
+import functools
+import hmac
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+import fastjson
+from metrics import span
+
+SESSIONS = 'sessions'
+CHANGES = 'session_changes'
+CHANGES_KEPT = 10000
+
+
+def load_secret_key(path):
+    """The key in `path`, created there if missing.
+
+    Every process pointed at the same file gets the same key: a new key is
+    written to a temporary file and linked into place, so concurrent
+    starters agree on whichever link lands first.
+    """
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    directory = os.path.dirname(os.path.abspath(path))
+    scratch = os.path.join(directory, f'.{os.path.basename(path)}.{os.getpid()}')
+    fd = os.open(scratch, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        os.write(fd, secrets.token_bytes(32))
+    finally:
+        os.close(fd)
+    try:
+        os.link(scratch, path)
+    except FileExistsError:
+        pass
+    finally:
+        os.unlink(scratch)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, expires=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires = expires
+        self.replaced = None
+        self.new = sid is None
+        self.modified = False
+        self.accessed = False
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+    def clear(self):
+        # Also drop the id, so one seen before a login is useless after it
+        super().clear()
+        if self.sid is not None:
+            self.replaced, self.sid = self.sid, None
+
+
+class SQLiteSessionStore:
+    """Sessions in a SQLite file, with a cache of `cache_size` in front.
+
+    Any number of processes can share `path`. Each keeps the sessions it
+    has read in an LRU cache; before a cached read it checks PRAGMA
+    data_version, and if another connection has committed since, evicts
+    the sessions named in the CHANGES log.
+    """
+
+    PURGE_INTERVAL = 3600
+
+    def __init__(self, path, cache_size=10000):
+        self.path = path
+        self.cache_size = cache_size
+        self.hits = self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = f'{os.getpid()}-{time.time_ns()}'
+        self._next_purge = 0.0
+        conn = self._sync_conn = self._connect(check_same_thread=False)
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {SESSIONS} '
+                     f'(sid TEXT PRIMARY KEY, data BLOB NOT NULL, expires REAL NOT NULL)')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{SESSIONS}_expires ON {SESSIONS} (expires)')
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {CHANGES} '
+                     f'(seq INTEGER PRIMARY KEY, origin TEXT NOT NULL, sid TEXT NOT NULL)')
+        self._data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        self._last_change = conn.execute(f'SELECT COALESCE(MAX(seq), 0) FROM {CHANGES}').fetchone()[0]
+
+    def _connect(self, **kwargs):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, **kwargs)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _sync(self):
+        # data_version only compares on one connection, so all threads share this one
+        with self._lock:
+            version = self._sync_conn.execute('PRAGMA data_version').fetchone()[0]
+            if version == self._data_version:
+                return
+            self._data_version = version
+            rows = self._sync_conn.execute(f'SELECT seq, origin, sid FROM {CHANGES} WHERE seq > ? ORDER BY seq',
+                                           (self._last_change,)).fetchall()
+            if not rows:
+                return
+            if rows[0][0] != self._last_change + 1:
+                # The log was pruned past what we have seen
+                self._cache.clear()
+            else:
+                for _, origin, sid in rows:
+                    if origin != self._origin:
+                        self._cache.pop(sid, None)
+            self._last_change = rows[-1][0]
+
+    def _remember(self, sid, entry):
+        # With self._lock held
+        self._cache[sid] = entry
+        self._cache.move_to_end(sid)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def load(self, sid):
+        """(data, expires) of a live session, or None."""
+        self._sync()
+        with self._lock:
+            entry = self._cache.get(sid)
+            if entry is not None:
+                self._cache.move_to_end(sid)
+                self.hits += 1
+            else:
+                self.misses += 1
+                seen = self._last_change
+        if entry is None:
+            with span('session.load'):
+                entry = self._connection().execute(
+                    f'SELECT data, expires FROM {SESSIONS} WHERE sid = ?', (sid,)).fetchone()
+            if entry is None:
+                return None
+            with self._lock:
+                # Unless a change came in meanwhile that this read may predate
+                if self._last_change == seen:
+                    self._remember(sid, entry)
+        data, expires = entry
+        if expires <= time.time():
+            return None
+        # Decoded afresh each time, so a request can't change the cached copy
+        return fastjson.loads(data), expires
+
+    def save(self, sid, data, expires, replaced=None):
+        """Store `data` under `sid` until `expires`, deleting `replaced`."""
+        body = fastjson.dumpb(data)
+        conn = self._connection()
+        with span('session.save'):
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(f'INSERT OR REPLACE INTO {SESSIONS} (sid, data, expires) VALUES (?, ?, ?)',
+                             (sid, body, expires))
+                changed = [sid]
+                if replaced is not None:
+                    conn.execute(f'DELETE FROM {SESSIONS} WHERE sid = ?', (replaced,))
+                    changed.append(replaced)
+                self._log(conn, changed)
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        with self._lock:
+            if replaced is not None:
+                self._cache.pop(replaced, None)
+            self._remember(sid, (body, expires))
+        self._purge(conn)
+
+    def delete(self, sid):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(f'DELETE FROM {SESSIONS} WHERE sid = ?', (sid,))
+            self._log(conn, [sid])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        with self._lock:
+            self._cache.pop(sid, None)
+
+    def _log(self, conn, sids):
+        conn.executemany(f'INSERT INTO {CHANGES} (origin, sid) VALUES (?, ?)',
+                         [(self._origin, sid) for sid in sids])
+
+    def _purge(self, conn):
+        # Expired sessions are never served, so they go without a change record
+        now = time.time()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + self.PURGE_INTERVAL
+        conn.execute(f'DELETE FROM {SESSIONS} WHERE expires <= ?', (now,))
+        conn.execute(f'DELETE FROM {CHANGES} WHERE seq <= (SELECT MAX(seq) FROM {CHANGES}) - ?', (CHANGES_KEPT,))
+
+    def stats(self):
+        with self._lock:
+            return {'cached': len(self._cache), 'hits': self.hits, 'misses': self.misses}
+
+
+class ServerSessionInterface(SessionInterface):
+    """Keeps session data in `store`, and only its signed id in the cookie.
+
+    `store` needs load(sid) -> (data, expires) or None, save(sid, data,
+    expires, replaced=None) and delete(sid); SQLiteSessionStore is one.
+    Sessions last PERMANENT_SESSION_LIFETIME on the server whether or not
+    they are permanent, and are written back only when changed or when
+    less than half of that is left.
+    """
+
+    session_class = ServerSession
+    salt = b'server-session'
+
+    def __init__(self, store):
+        self.store = store
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4)
+    def _key(secret_key, salt):
+        if isinstance(secret_key, str):
+            secret_key = secret_key.encode()
+        return hmac.digest(secret_key, salt, 'sha256')
+
+    def _mac(self, app, sid):
+        digest = hmac.digest(self._key(app.secret_key, self.salt), sid.encode(), 'sha256')
+        return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+    def _unsign(self, app, cookie):
+        sid, _, mac = cookie.rpartition('.')
+        if sid and hmac.compare_digest(mac, self._mac(app, sid)):
+            return sid
+        return None
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            sid = self._unsign(app, cookie)
+            found = self.store.load(sid) if sid else None
+            if found is not None:
+                return self.session_class(found[0], sid, found[1])
+        return self.session_class()
+
+    def save_session(self, app, session, response):
+        if session.accessed:
+            response.vary.add('Cookie')
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.sid is not None or session.replaced is not None:
+                self.store.delete(session.sid or session.replaced)
+                response.delete_cookie(name, domain=domain, path=path, secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        now = time.time()
+        new_id = session.sid is None
+        if not (new_id or session.modified or session.expires - now < lifetime / 2):
+            return
+        if new_id:
+            session.sid = secrets.token_urlsafe(32)
+        session.expires = now + lifetime
+        self.store.save(session.sid, dict(session), session.expires, session.replaced)
+        if new_id or (session.permanent and self.should_set_cookie(app, session)):
+            response.set_cookie(
+                name, f'{session.sid}.{self._mac(app, session.sid)}',
+                expires=self.get_expiration_time(app, session), httponly=self.get_cookie_httponly(app),
+                domain=domain, path=path, secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app))
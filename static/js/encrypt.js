@@ -0,0 +1,299 @@
+function qrUrl(text) {
+    return '/api/qr.png?text=' + encodeURIComponent(text);
+}
+
+let encryptionHistory = [];
+
+// Show/hide cipher options
+document.querySelectorAll('.cipher-checkbox').forEach(checkbox => {
+    checkbox.addEventListener('change', function() {
+        if (this.value === 'caesar') {
+            document.getElementById('caesarOptions').style.display = this.checked ? 'block' : 'none';
+        }
+        if (this.value === 'vigenere') {
+            document.getElementById('vigenereOptions').style.display = this.checked ? 'block' : 'none';
+        }
+    });
+});
+
+async function encryptText() {
+    const text = document.getElementById('inputText').value.trim();
+    const errorMsg = document.getElementById('errorMessage');
+    const selectedCiphers = Array.from(document.querySelectorAll('.cipher-checkbox:checked')).map(cb => cb.value);
+    const shift = parseInt(document.getElementById('caesarShift').value);
+    const keyword = document.getElementById('vigenereKeyword').value.trim();
+
+    errorMsg.style.display = 'none';
+    errorMsg.textContent = '';
+
+    if (!text) {
+        errorMsg.textContent = 'Please enter some text to encrypt';
+        errorMsg.style.display = 'block';
+        return;
+    }
+
+    if (selectedCiphers.length === 0) {
+        errorMsg.textContent = 'Please select at least one cipher';
+        errorMsg.style.display = 'block';
+        return;
+    }
+
+    if (selectedCiphers.includes('vigenere') && !keyword) {
+        errorMsg.textContent = 'Please enter a keyword for Vigenere cipher';
+        errorMsg.style.display = 'block';
+        return;
+    }
+
+    try {
+        const response = await fetch('/api/encrypt-text', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                text: text,
+                ciphers: selectedCiphers,
+                shift: shift,
+                keyword: keyword
+            })
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            // Add separate result card for each cipher
+            data.results.forEach(result => {
+                addResultCard(data.original_text, result.encrypted_text, result.cipher, result.description);
+            });
+            document.getElementById('resultsContainer').style.display = 'block';
+        } else {
+            errorMsg.textContent = data.error;
+            errorMsg.style.display = 'block';
+        }
+    } catch (error) {
+        errorMsg.textContent = 'Error: ' + error.message;
+        errorMsg.style.display = 'block';
+    }
+}
+
+function addResultCard(originalText, encryptedText, cipher, description) {
+    const container = document.getElementById('resultsContainer');
+    const resultId = 'result-' + Date.now() + '-' + Math.random().toString(36).substr(2, 9);
+
+    // Store data in the element's dataset to avoid escaping issues
+    const resultCard = document.createElement('div');
+    resultCard.className = 'result-card';
+    resultCard.id = resultId;
+    resultCard.dataset.encryptedText = encryptedText;
+    resultCard.dataset.cipher = cipher;
+    resultCard.dataset.description = description;
+
+    resultCard.innerHTML = `
+        <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 20px;">
+            <h3 style="color: #333; margin: 0; display: flex; align-items: center; gap: 10px;">
+                <span style="background: #e91e63; color: white; padding: 8px 20px; border-radius: 20px; font-size: 0.9em;">
+                    ${cipher}
+                </span>
+                <span style="color: #666; font-size: 0.8em; font-weight: normal;">${description}</span>
+            </h3>
+            <button onclick="removeResult('${resultId}')" style="padding: 8px 16px; background: #f44336; color: white; border: none; border-radius: 8px; cursor: pointer; font-size: 0.9em;">
+                🗑️ Remove
+            </button>
+        </div>
+
+        <div style="margin-bottom: 20px;">
+            <div style="font-weight: 600; color: #666; margin-bottom: 8px;">Original Text:</div>
+            <div style="background: #f9f9f9; padding: 15px; border-radius: 8px; word-wrap: break-word;">
+                ${originalText}
+            </div>
+        </div>
+
+        <div style="margin-bottom: 20px;">
+            <div style="font-weight: 600; color: #666; margin-bottom: 8px;">Encrypted Text:</div>
+            <div style="background: #e3f2fd; padding: 15px; border-radius: 8px; word-wrap: break-word; font-family: monospace; font-size: 1.1em;">
+                ${encryptedText}
+            </div>
+        </div>
+
+        <div style="display: grid; grid-template-columns: 1fr 1fr 1fr 1fr; gap: 15px;">
+            <button onclick="copyEncryptedById('${resultId}')" style="padding: 12px; background: #4caf50; color: white; border: none; border-radius: 8px; cursor: pointer; font-size: 0.95em; font-weight: 600;">
+                📋 Copy
+            </button>
+            <button onclick="generateQRById('${resultId}')" style="padding: 12px; background: #1e88e5; color: white; border: none; border-radius: 8px; cursor: pointer; font-size: 0.95em; font-weight: 600;">
+                📱 QR Code
+            </button>
+            <button onclick="downloadEncryptedById('${resultId}')" style="padding: 12px; background: #ff9800; color: white; border: none; border-radius: 8px; cursor: pointer; font-size: 0.95em; font-weight: 600;">
+                💾 Download
+            </button>
+            <button onclick="showEmailModal('${resultId}')" style="padding: 12px; background: #ea4335; color: white; border: none; border-radius: 8px; cursor: pointer; font-size: 0.95em; font-weight: 600;">
+                📧 Email
+            </button>
+        </div>
+
+        <div id="${resultId}-qr" style="display: none; margin-top: 20px; text-align: center; padding: 20px; background: #f9f9f9; border-radius: 8px;">
+            <img id="${resultId}-qr-img" src="" alt="QR Code" style="max-width: 300px; border: 2px solid #e0e0e0; border-radius: 8px; padding: 10px; background: white;">
+        </div>
+
+        <div id="${resultId}-email" style="display: none; margin-top: 20px; padding: 20px; background: #f9f9f9; border-radius: 8px;">
+            <h4 style="margin: 0 0 15px 0; color: #333;">📧 Send via Email</h4>
+            <input type="email" id="${resultId}-email-input" placeholder="recipient@example.com" style="width: 100%; padding: 12px; border: 2px solid #e0e0e0; border-radius: 8px; margin-bottom: 15px; font-size: 1em; outline: none;">
+            <label style="display: flex; align-items: center; gap: 10px; margin-bottom: 15px; cursor: pointer; color: #666;">
+                <input type="checkbox" id="${resultId}-email-qr" style="width: 18px; height: 18px; cursor: pointer;">
+                <span>Include QR code in email</span>
+            </label>
+            <div style="display: flex; gap: 10px;">
+                <button onclick="sendEncryptedEmail('${resultId}')" style="flex: 1; padding: 12px; background: #ea4335; color: white; border: none; border-radius: 8px; cursor: pointer; font-weight: 600;">
+                    Send Email
+                </button>
+                <button onclick="hideEmailModal('${resultId}')" style="padding: 12px 20px; background: #999; color: white; border: none; border-radius: 8px; cursor: pointer;">
+                    Cancel
+                </button>
+            </div>
+            <div id="${resultId}-email-status" style="margin-top: 15px; padding: 10px; border-radius: 8px; display: none; text-align: center; font-weight: 500;"></div>
+        </div>
+    `;
+
+    container.insertBefore(resultCard, container.firstChild);
+}
+
+// Updated helper functions
+function copyEncryptedById(resultId) {
+    const card = document.getElementById(resultId);
+    const text = card.dataset.encryptedText;
+    navigator.clipboard.writeText(text);
+    alert('Encrypted text copied to clipboard!');
+}
+
+function generateQRById(resultId) {
+    const card = document.getElementById(resultId);
+    const text = card.dataset.encryptedText;
+
+    // The PNG is served raw and cached by the browser
+    document.getElementById(resultId + '-qr-img').src = qrUrl(text);
+    document.getElementById(resultId + '-qr').style.display = 'block';
+}
+
+function downloadEncryptedById(resultId) {
+    const card = document.getElementById(resultId);
+    const text = card.dataset.encryptedText;
+    const cipher = card.dataset.cipher;
+
+    const blob = new Blob([text], { type: 'text/plain' });
+    const url = URL.createObjectURL(blob);
+    const link = document.createElement('a');
+    link.href = url;
+    link.download = `encrypted_${cipher.toLowerCase()}_text.txt`;
+    link.click();
+    URL.revokeObjectURL(url);
+}
+
+function showEmailModal(resultId) {
+    document.getElementById(resultId + '-email').style.display = 'block';
+}
+
+function hideEmailModal(resultId) {
+    document.getElementById(resultId + '-email').style.display = 'none';
+    document.getElementById(resultId + '-email-status').style.display = 'none';
+}
+
+// Email is sent in the background; poll its job until it is sent or fails
+async function watchEmailJob(jobId, statusEl) {
+    for (let i = 0; i < 60; i++) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const response = await fetch('/api/email-status/' + jobId);
+        const job = await response.json();
+        if (job.status === 'sent') {
+            statusEl.textContent = '✅ Email sent successfully!';
+            return;
+        }
+        if (job.status === 'failed' || !response.ok) {
+            statusEl.textContent = '❌ Failed to send email: ' + (job.error || 'unknown error');
+            statusEl.style.background = '#f8d7da';
+            statusEl.style.color = '#721c24';
+            return;
+        }
+        if (job.attempts > 0) {
+            statusEl.textContent = '⏳ Retrying delivery (attempt ' + (job.attempts + 1) + ')...';
+        }
+    }
+}
+
+async function sendEncryptedEmail(resultId) {
+    const card = document.getElementById(resultId);
+    const encryptedText = card.dataset.encryptedText;
+    const cipherName = card.dataset.cipher;
+    const description = card.dataset.description;
+
+    const emailInput = document.getElementById(resultId + '-email-input');
+    const email = emailInput.value.trim();
+    const includeQR = document.getElementById(resultId + '-email-qr').checked;
+    const emailStatus = document.getElementById(resultId + '-email-status');
+
+    if (!email) {
+        alert('Please enter a recipient email');
+        return;
+    }
+
+    emailStatus.style.display = 'none';
+
+    try {
+        const response = await fetch('/api/send-encrypted-email', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                email: email,
+                encrypted_text: encryptedText,
+                cipher_name: cipherName,
+                cipher_description: description,
+                include_qr: includeQR
+            })
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            emailStatus.textContent = '📨 ' + data.message;
+            emailStatus.style.background = '#d4edda';
+            emailStatus.style.color = '#155724';
+            emailStatus.style.display = 'block';
+            emailInput.value = '';
+            watchEmailJob(data.job_id, emailStatus);
+        } else {
+            emailStatus.textContent = '❌ ' + data.error;
+            emailStatus.style.background = '#f8d7da';
+            emailStatus.style.color = '#721c24';
+            emailStatus.style.display = 'block';
+        }
+    } catch (error) {
+        emailStatus.textContent = '❌ Error: ' + error.message;
+        emailStatus.style.background = '#f8d7da';
+        emailStatus.style.color = '#721c24';
+        emailStatus.style.display = 'block';
+    }
+}
+
+function removeResult(resultId) {
+    document.getElementById(resultId).remove();
+    if (document.getElementById('resultsContainer').children.length === 0) {
+        document.getElementById('resultsContainer').style.display = 'none';
+    }
+}
+
+function copyEncrypted(text, resultId) {
+    navigator.clipboard.writeText(text);
+    alert('Encrypted text copied to clipboard!');
+}
+
+function generateQRForEncrypted(text, resultId) {
+    // The PNG is served raw and cached by the browser
+    document.getElementById(resultId + '-qr-img').src = qrUrl(text);
+    document.getElementById(resultId + '-qr').style.display = 'block';
+}
+
+function downloadEncrypted(text, cipher) {
+    const blob = new Blob([text], { type: 'text/plain' });
+    const url = URL.createObjectURL(blob);
+    const link = document.createElement('a');
+    link.href = url;
+    link.download = `encrypted_${cipher.toLowerCase()}_text.txt`;
+    link.click();
+    URL.revokeObjectURL(url);
+}
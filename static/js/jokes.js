@@ -0,0 +1,156 @@
+let currentJoke = '';
+let currentQR = '';
+
+async function generateJoke() {
+    const loading = document.getElementById('loading');
+    const container = document.getElementById('jokeContainer');
+    const qrDisplay = document.getElementById('qrDisplay');
+
+    loading.style.display = 'block';
+    container.style.display = 'none';
+    qrDisplay.style.display = 'none';
+    currentQR = '';
+
+    try {
+        const category = document.getElementById('jokeCategorySelect').value;
+        const response = await fetch('/api/joke' + (category ? '?category=' + encodeURIComponent(category) : ''));
+        const data = await response.json();
+
+        if (data.success) {
+            currentJoke = data.joke;
+            document.getElementById('jokeText').textContent = data.joke;
+            document.getElementById('jokeCategory').textContent = data.category;
+            container.style.display = 'block';
+        } else {
+            alert('Failed to fetch joke: ' + data.error);
+        }
+    } catch (error) {
+        alert('Error: ' + error.message);
+    } finally {
+        loading.style.display = 'none';
+    }
+}
+
+function copyJoke() {
+    navigator.clipboard.writeText(currentJoke);
+    alert('Joke copied to clipboard!');
+}
+
+function generateQR() {
+    if (!currentJoke) return;
+
+    const qrBtn = document.getElementById('qrBtn');
+    qrBtn.disabled = true;
+    qrBtn.textContent = 'Generating...';
+
+    // The PNG is served raw and cached by the browser
+    const url = '/api/qr.png?text=' + encodeURIComponent(currentJoke);
+    const qrImage = document.getElementById('qrImage');
+    const done = () => {
+        qrBtn.disabled = false;
+        qrBtn.textContent = 'Generate QR Code';
+    };
+    qrImage.onload = () => {
+        currentQR = url;
+        document.getElementById('qrDisplay').style.display = 'block';
+        done();
+    };
+    qrImage.onerror = () => {
+        alert('Failed to generate QR code');
+        done();
+    };
+    qrImage.src = url;
+}
+
+function downloadQR() {
+    if (!currentQR) return;
+
+    const link = document.createElement('a');
+    link.href = currentQR;
+    link.download = 'joke_qr_code.png';
+    link.click();
+}
+
+// Email is sent in the background; poll its job until it is sent or fails
+async function watchEmailJob(jobId, statusEl) {
+    for (let i = 0; i < 60; i++) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const response = await fetch('/api/email-status/' + jobId);
+        const job = await response.json();
+        if (job.status === 'sent') {
+            statusEl.textContent = '✅ Email sent successfully!';
+            return;
+        }
+        if (job.status === 'failed' || !response.ok) {
+            statusEl.textContent = '❌ Failed to send email: ' + (job.error || 'unknown error');
+            statusEl.style.background = '#f8d7da';
+            statusEl.style.color = '#721c24';
+            return;
+        }
+        if (job.attempts > 0) {
+            statusEl.textContent = '⏳ Retrying delivery (attempt ' + (job.attempts + 1) + ')...';
+        }
+    }
+}
+
+async function sendEmail() {
+    const email = document.getElementById('recipientEmail').value.trim();
+    const includeQR = document.getElementById('includeQR').checked;
+    const emailBtn = document.getElementById('emailBtn');
+    const emailStatus = document.getElementById('emailStatus');
+
+    if (!email) {
+        alert('Please enter a recipient email');
+        return;
+    }
+
+    if (!currentJoke) {
+        alert('Please generate a joke first');
+        return;
+    }
+
+    if (includeQR && !currentQR) {
+        alert('Please generate QR code first or uncheck the option');
+        return;
+    }
+
+    emailBtn.disabled = true;
+    emailBtn.textContent = 'Sending...';
+    emailStatus.style.display = 'none';
+
+    try {
+        const response = await fetch('/api/send-joke-email', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                email: email,
+                joke: currentJoke,
+                include_qr: includeQR
+            })
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            emailStatus.textContent = '📨 ' + data.message;
+            emailStatus.style.background = '#d4edda';
+            emailStatus.style.color = '#155724';
+            emailStatus.style.display = 'block';
+            document.getElementById('recipientEmail').value = '';
+            watchEmailJob(data.job_id, emailStatus);
+        } else {
+            emailStatus.textContent = '❌ ' + data.error;
+            emailStatus.style.background = '#f8d7da';
+            emailStatus.style.color = '#721c24';
+            emailStatus.style.display = 'block';
+        }
+    } catch (error) {
+        emailStatus.textContent = '❌ Error: ' + error.message;
+        emailStatus.style.background = '#f8d7da';
+        emailStatus.style.color = '#721c24';
+        emailStatus.style.display = 'block';
+    } finally {
+        emailBtn.disabled = false;
+        emailBtn.textContent = 'Send Email';
+    }
+}
@@ -0,0 +1,147 @@
+let map;
+let marker;
+
+// Allow Enter key to search
+document.getElementById('cityInput').addEventListener('keypress', function(e) {
+    if (e.key === 'Enter') {
+        searchWeather();
+    }
+});
+
+function showWeather(data) {
+    document.getElementById('cityName').textContent = data.city;
+    document.getElementById('countryName').textContent = data.country;
+    document.getElementById('temperature').textContent = data.temperature;
+    document.getElementById('feelsLike').textContent = data.feels_like;
+    document.getElementById('description').textContent = data.description;
+    document.getElementById('humidity').textContent = data.humidity;
+    document.getElementById('windSpeed').textContent = data.wind_speed;
+    document.getElementById('pressure').textContent = data.pressure;
+    document.getElementById('weatherIcon').src = `http://openweathermap.org/img/wn/${data.icon}@2x.png`;
+
+    // Initialize or update map
+    updateMap(data.lat, data.lon, data.city);
+}
+
+function showOtherCities(results) {
+    const container = document.getElementById('otherCities');
+    container.innerHTML = '';
+    results.forEach(item => {
+        const card = document.createElement('div');
+        card.style.cssText = 'background: white; padding: 20px; border-radius: 12px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); text-align: center; cursor: pointer;';
+        const title = document.createElement('div');
+        title.style.cssText = 'font-weight: bold; color: #333; margin-bottom: 8px;';
+        const detail = document.createElement('div');
+        detail.style.color = item.status === 200 ? '#1e88e5' : '#e53935';
+        if (item.status === 200) {
+            title.textContent = `${item.city}, ${item.country}`;
+            detail.textContent = `${item.temperature}°C · ${item.description}`;
+            card.onclick = () => showWeather(item);
+        } else {
+            title.textContent = item.query;
+            detail.textContent = item.error;
+        }
+        card.append(title, detail);
+        container.appendChild(card);
+    });
+    container.style.display = results.length ? 'grid' : 'none';
+}
+
+async function searchWeather() {
+    const city = document.getElementById('cityInput').value.trim();
+    const cities = city.split(';').map(name => name.trim()).filter(name => name);
+    const errorMsg = document.getElementById('errorMessage');
+    const loading = document.getElementById('loading');
+    const result = document.getElementById('weatherResult');
+
+    // Clear previous error
+    errorMsg.style.display = 'none';
+    errorMsg.textContent = '';
+
+    if (!city) {
+        errorMsg.textContent = 'Please enter a city name';
+        errorMsg.style.display = 'block';
+        return;
+    }
+
+    // Show loading
+    loading.style.display = 'block';
+    result.style.display = 'none';
+
+    try {
+        if (cities.length > 1) {
+            // One request for all of them; the server fetches them in parallel
+            const response = await fetch('/api/weather/batch', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ locations: cities })
+            });
+            const data = await response.json();
+            const first = data.success && data.results.find(item => item.status === 200);
+            if (first) {
+                showWeather(first);
+                showOtherCities(data.results);
+                result.style.display = 'block';
+            } else {
+                errorMsg.textContent = data.error || 'Failed to fetch weather data';
+                errorMsg.style.display = 'block';
+            }
+            return;
+        }
+
+        const response = await fetch('/api/weather', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ city: city })
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            // Update weather display
+            showWeather(data);
+            showOtherCities([]);
+
+            result.style.display = 'block';
+        } else {
+            errorMsg.textContent = data.error || 'Failed to fetch weather data';
+            errorMsg.style.display = 'block';
+        }
+    } catch (error) {
+        errorMsg.textContent = 'An error occurred. Please try again.';
+        errorMsg.style.display = 'block';
+    } finally {
+        loading.style.display = 'none';
+    }
+}
+
+function updateMap(lat, lon, cityName) {
+    // Initialize map if not already created
+    if (!map) {
+        map = L.map('map').setView([lat, lon], 10);
+
+        // Add base tile layer
+        L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+            attribution: '© OpenStreetMap contributors',
+            maxZoom: 18
+        }).addTo(map);
+
+        // Add marker
+        marker = L.marker([lat, lon]).addTo(map);
+        marker.bindPopup(`<b>${cityName}</b>`).openPopup();
+    } else {
+        // Update existing map
+        map.setView([lat, lon], 10);
+        marker.setLatLng([lat, lon]);
+        marker.bindPopup(`<b>${cityName}</b>`).openPopup();
+    }
+
+    // Force map to refresh
+    setTimeout(() => {
+        map.invalidateSize();
+    }, 100);
+}
@@ -0,0 +1,386 @@
+document.getElementById('stressLevel').addEventListener('input', function() {
+    document.getElementById('stressValue').textContent = this.value;
+});
+
+let currentTab = 'mood';
+
+function showTab(tab) {
+    document.querySelectorAll('.tab-content').forEach(t => t.style.display = 'none');
+    document.querySelectorAll('.tab-btn').forEach(btn => {
+        btn.classList.remove('active');
+        btn.style.color = '#666';
+        btn.style.borderBottomColor = 'transparent';
+    });
+
+    document.getElementById(tab + '-tab').style.display = 'block';
+    const activeBtn = document.getElementById('tab-' + tab);
+    activeBtn.classList.add('active');
+    activeBtn.style.color = '#667eea';
+    activeBtn.style.borderBottomColor = '#667eea';
+
+    currentTab = tab;
+}
+
+// Every section of the page comes from one request; the browser revalidates
+// it with If-None-Match, so an unchanged dashboard costs a 304.
+async function loadDashboard() {
+    try {
+        const response = await fetch('/api/wellness/dashboard');
+        const data = await response.json();
+
+        if (data.success) {
+            renderAnalytics(data.analytics);
+            renderMoodLogs(data.mood);
+            renderSleepLogs(data.sleep);
+            renderGoals(data.goals);
+            renderBreaks(data.breaks);
+        }
+    } catch (error) {
+        console.error('Error loading dashboard:', error);
+    }
+}
+
+function renderAnalytics(analytics) {
+    document.getElementById('avgStress').textContent = analytics.avg_stress_7days || '-';
+    document.getElementById('avgSleep').textContent = analytics.avg_sleep_7days || '-';
+    document.getElementById('goalsCompleted').textContent = analytics.goal_stats.completed;
+    document.getElementById('totalGoals').textContent = `of ${analytics.goal_stats.total} total`;
+    document.getElementById('totalCheckins').textContent = analytics.total_mood_logs + analytics.total_sleep_logs;
+}
+
+async function saveMoodLog() {
+    const mood = document.querySelector('input[name="mood"]:checked');
+    const stressLevel = document.getElementById('stressLevel').value;
+    const notes = document.getElementById('moodNotes').value;
+
+    if (!mood) {
+        alert('Please select your mood');
+        return;
+    }
+
+    try {
+        const response = await fetch('/api/wellness/mood', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({
+                date: new Date().toISOString().split('T')[0],
+                mood: mood.value,
+                stress_level: parseInt(stressLevel),
+                notes: notes
+            })
+        });
+
+        const data = await response.json();
+        if (data.success) {
+            alert('✅ Mood check-in saved!');
+            document.querySelector('input[name="mood"]:checked').checked = false;
+            document.getElementById('stressLevel').value = 5;
+            document.getElementById('stressValue').textContent = 5;
+            document.getElementById('moodNotes').value = '';
+            loadDashboard();
+        }
+    } catch (error) {
+        alert('Error: ' + error.message);
+    }
+}
+
+function renderMoodLogs(logs) {
+    const container = document.getElementById('moodLogs');
+    if (logs.length > 0) {
+        container.innerHTML = logs.reverse().map(log => `
+            <div style="background: white; padding: 20px; border-radius: 12px; margin-bottom: 15px; border-left: 4px solid #667eea;">
+                <div style="display: flex; justify-content: space-between; margin-bottom: 10px;">
+                    <span style="font-weight: 600; color: #333;">${log.date}</span>
+                    <span style="background: #667eea; color: white; padding: 4px 12px; border-radius: 12px; font-size: 0.9em;">
+                        Stress: ${log.stress_level}/10
+                    </span>
+                </div>
+                <div style="font-size: 1.2em; margin-bottom: 10px;">
+                    ${getMoodEmoji(log.mood)} ${log.mood.charAt(0).toUpperCase() + log.mood.slice(1)}
+                </div>
+                ${log.notes ? `<div style="color: #666; font-style: italic;">"${log.notes}"</div>` : ''}
+            </div>
+        `).join('');
+    } else {
+        container.innerHTML = '<p style="text-align: center; color: #999;">No check-ins yet. Start tracking your mood!</p>';
+    }
+}
+
+function getMoodEmoji(mood) {
+    const emojis = {happy: '😊', neutral: '😐', sad: '😢', stressed: '😰', anxious: '😟'};
+    return emojis[mood] || '😐';
+}
+
+async function saveSleepLog() {
+    const hours = document.getElementById('sleepHours').value;
+    const quality = document.getElementById('sleepQuality').value;
+    const performance = document.getElementById('academicPerformance').value;
+    const notes = document.getElementById('sleepNotes').value;
+
+    if (!hours || !quality || !performance) {
+        alert('Please fill in all required fields');
+        return;
+    }
+
+    try {
+        const response = await fetch('/api/wellness/sleep', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({
+                date: new Date().toISOString().split('T')[0],
+                sleep_hours: parseFloat(hours),
+                sleep_quality: quality,
+                academic_performance: performance,
+                notes: notes
+            })
+        });
+
+        const data = await response.json();
+        if (data.success) {
+            alert('✅ Sleep log saved!');
+            document.getElementById('sleepHours').value = '';
+            document.getElementById('sleepQuality').value = '';
+            document.getElementById('academicPerformance').value = '';
+            document.getElementById('sleepNotes').value = '';
+            loadDashboard();
+        }
+    } catch (error) {
+        alert('Error: ' + error.message);
+    }
+}
+
+function renderSleepLogs(logs) {
+    const container = document.getElementById('sleepLogs');
+    if (logs.length > 0) {
+        container.innerHTML = logs.reverse().map(log => `
+            <div style="background: white; padding: 20px; border-radius: 12px; margin-bottom: 15px; border-left: 4px solid #1e88e5;">
+                <div style="display: flex; justify-content: space-between; margin-bottom: 10px;">
+                    <span style="font-weight: 600; color: #333;">${log.date}</span>
+                    <span style="background: #1e88e5; color: white; padding: 4px 12px; border-radius: 12px; font-size: 0.9em;">
+                        ${log.sleep_hours}h
+                    </span>
+                </div>
+                <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 10px; margin-bottom: 10px;">
+                    <div><strong>Sleep Quality:</strong> ${log.sleep_quality}</div>
+                    <div><strong>Performance:</strong> ${log.academic_performance}</div>
+                </div>
+                ${log.notes ? `<div style="color: #666; font-style: italic;">"${log.notes}"</div>` : ''}
+            </div>
+        `).join('');
+    } else {
+        container.innerHTML = '<p style="text-align: center; color: #999;">No sleep logs yet. Start tracking!</p>';
+    }
+}
+
+async function saveGoal() {
+    const title = document.getElementById('goalTitle').value;
+    const description = document.getElementById('goalDescription').value;
+    const targetDate = document.getElementById('goalDate').value;
+
+    if (!title || !description || !targetDate) {
+        alert('Please fill in all fields');
+        return;
+    }
+
+    try {
+        const response = await fetch('/api/wellness/goals', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({
+                title: title,
+                description: description,
+                target_date: targetDate,
+                status: 'pending'
+            })
+        });
+
+        const data = await response.json();
+        if (data.success) {
+            alert('✅ Goal added!');
+            document.getElementById('goalTitle').value = '';
+            document.getElementById('goalDescription').value = '';
+            document.getElementById('goalDate').value = '';
+            loadDashboard();
+        }
+    } catch (error) {
+        alert('Error: ' + error.message);
+    }
+}
+
+function renderGoals(goals) {
+    const container = document.getElementById('goalsList');
+    if (goals.length > 0) {
+        container.innerHTML = goals.map(goal => `
+            <div style="background: white; padding: 20px; border-radius: 12px; margin-bottom: 15px; border-left: 4px solid ${getGoalColor(goal.status)};">
+                <div style="display: flex; justify-content: space-between; align-items: start; margin-bottom: 10px;">
+                    <div style="flex: 1;">
+                        <h4 style="color: #333; margin-bottom: 5px;">${goal.title}</h4>
+                        <p style="color: #666; margin-bottom: 10px;">${goal.description}</p>
+                        <div style="font-size: 0.9em; color: #999;">Target: ${goal.target_date}</div>
+                    </div>
+                    <select onchange="updateGoalStatus(${goal.id}, this.value)" style="padding: 8px; border: 2px solid #e0e0e0; border-radius: 8px; font-size: 0.9em;">
+                        <option value="pending" ${goal.status === 'pending' ? 'selected' : ''}>📋 Pending</option>
+                        <option value="in_progress" ${goal.status === 'in_progress' ? 'selected' : ''}>🔄 In Progress</option>
+                        <option value="completed" ${goal.status === 'completed' ? 'selected' : ''}>✅ Completed</option>
+                    </select>
+                </div>
+                <button onclick="deleteGoal(${goal.id})" style="padding: 8px 16px; background: #f44336; color: white; border: none; border-radius: 8px; font-size: 0.9em; cursor: pointer;">
+                    🗑️ Delete
+                </button>
+            </div>
+        `).join('');
+    } else {
+        container.innerHTML = '<p style="text-align: center; color: #999;">No goals yet. Set your first goal!</p>';
+    }
+}
+
+function getGoalColor(status) {
+    return status === 'completed' ? '#4caf50' : status === 'in_progress' ? '#ff9800' : '#999';
+}
+
+async function updateGoalStatus(goalId, status) {
+    try {
+        const response = await fetch(`/api/wellness/goals/${goalId}`, {
+            method: 'PUT',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({status: status})
+        });
+
+        const data = await response.json();
+        if (data.success) {
+            loadDashboard();
+        }
+    } catch (error) {
+        alert('Error: ' + error.message);
+    }
+}
+
+async function deleteGoal(goalId) {
+    if (!confirm('Delete this goal?')) return;
+    try {
+        const response = await fetch(`/api/wellness/goals/${goalId}`, {
+            method: 'DELETE',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({})
+        });
+
+        const data = await response.json();
+        if (data.success) {
+            loadDashboard();
+        }
+    } catch (error) {
+        alert('Error: ' + error.message);
+    }
+}
+
+async function saveBreak() {
+    const activity = document.getElementById('breakActivity').value;
+    const duration = document.getElementById('breakDuration').value;
+    const time = document.getElementById('breakTime').value;
+
+    if (!activity || !duration || !time) {
+        alert('Please fill in all fields');
+        return;
+    }
+
+    try {
+        const response = await fetch('/api/wellness/breaks', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({
+                activity: activity,
+                duration_minutes: parseInt(duration),
+                scheduled_time: time,
+                timezone: Intl.DateTimeFormat().resolvedOptions().timeZone
+            })
+        });
+
+        const data = await response.json();
+        if (data.success) {
+            if (window.Notification && Notification.permission === 'default') {
+                Notification.requestPermission();
+            }
+            alert('✅ Break scheduled!');
+            document.getElementById('breakActivity').value = '';
+            document.getElementById('breakDuration').value = '';
+            document.getElementById('breakTime').value = '';
+            loadDashboard();
+        }
+    } catch (error) {
+        alert('Error: ' + error.message);
+    }
+}
+
+function renderBreaks(breaks) {
+    const container = document.getElementById('breaksList');
+    if (breaks.length > 0) {
+        container.innerHTML = breaks.map(breakItem => `
+            <div style="background: white; padding: 20px; border-radius: 12px; margin-bottom: 15px; border-left: 4px solid #ff9800;">
+                <div style="display: flex; justify-content: space-between; align-items: center;">
+                    <div>
+                        <h4 style="color: #333; margin-bottom: 5px;">⏰ ${breakItem.scheduled_time}</h4>
+                        <div style="color: #666;">${breakItem.activity} (${breakItem.duration_minutes} min)</div>
+                    </div>
+                    <button onclick="deleteBreak(${breakItem.id})" style="padding: 8px 16px; background: #f44336; color: white; border: none; border-radius: 8px; cursor: pointer;">
+                        🗑️
+                    </button>
+                </div>
+            </div>
+        `).join('');
+    } else {
+        container.innerHTML = '<p style="text-align: center; color: #999;">No breaks scheduled. Add one!</p>';
+    }
+}
+
+async function deleteBreak(breakId) {
+    if (!confirm('Delete this break reminder?')) return;
+
+    try {
+        const response = await fetch(`/api/wellness/breaks/${breakId}`, {
+            method: 'DELETE',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({})
+        });
+
+        const data = await response.json();
+        if (data.success) {
+            loadDashboard();
+        }
+    } catch (error) {
+        alert('Error: ' + error.message);
+    }
+}
+
+// Break reminders are pushed by the server as they come due; EventSource
+// reconnects by itself if the stream drops, so nothing here polls. It gives
+// up on an error status (the server turns streams away when it has too many
+// open), so then we open a new one after a while.
+function showBreakReminder(reminder) {
+    const text = `${reminder.activity} for ${reminder.duration_minutes} min`;
+    if (window.Notification && Notification.permission === 'granted') {
+        new Notification('⏰ Time for a break', {body: text, tag: `break-${reminder.id}`});
+        return;
+    }
+    const banner = document.createElement('div');
+    banner.style.cssText = 'position: fixed; top: 80px; right: 20px; z-index: 1000; max-width: 320px; padding: 20px; ' +
+        'background: #ff9800; color: white; border-radius: 12px; box-shadow: 0 8px 24px rgba(0,0,0,0.2); cursor: pointer;';
+    banner.innerHTML = '<div style="font-weight: 600; margin-bottom: 5px;">⏰ Time for a break</div><div></div>';
+    banner.lastChild.textContent = text;
+    banner.onclick = () => banner.remove();
+    document.body.appendChild(banner);
+}
+
+function listenForBreakReminders() {
+    const breakReminders = new EventSource('/api/wellness/breaks/stream');
+    breakReminders.addEventListener('break', event => showBreakReminder(JSON.parse(event.data)));
+    breakReminders.onerror = () => {
+        if (breakReminders.readyState === EventSource.CLOSED) {
+            setTimeout(listenForBreakReminders, 30000 + Math.random() * 30000);
+        }
+    };
+}
+
+listenForBreakReminders();
+
+// Initial load
+loadDashboard();
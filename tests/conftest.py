@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+# The modules under test live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import free_port  # noqa: E402
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """A factory for Flask apps with their databases in tmp_path; closes them afterwards."""
+    import app as hub
+
+    apps = []
+
+    def make(name='hub', **config):
+        config = {'SECRET_KEY': 'test', 'SESSION_DB': str(tmp_path / f'{name}-sessions.db'),
+                  'MAIL_DB': str(tmp_path / f'{name}-mail.db'), 'MAIL_WORKERS': 0, 'QR_WORKERS': 0,
+                  # Nothing listens there, so the joke pool's first refill fails at once
+                  'JOKEAPI_URL': f'http://127.0.0.1:{free_port()}/joke', **config}
+        apps.append(hub.create_app(config))
+        return apps[-1]
+
+    yield make
+    for flask_app in apps:
+        flask_app.extensions['hub'].close()
+
+
+@pytest.fixture
+def client(make_app):
+    """A test client of a fresh app, signed in."""
+    flask_app = make_app()
+    client = flask_app.test_client()
+    with client.session_transaction() as session:
+        session['user'] = {'email': 'student@example.edu', 'name': 'Student', 'picture': ''}
+    return client
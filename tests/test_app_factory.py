@@ -0,0 +1,33 @@
+"""create_app builds and starts each app's services; importing app.py starts nothing."""
+import os
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_starts_no_threads_and_opens_no_files(tmp_path):
+    script = textwrap.dedent('''
+        import os, sys, threading
+        sys.path.insert(0, sys.argv[1])
+        import app
+        print(len(threading.enumerate()), len(os.listdir('.')))
+    ''')
+    output = subprocess.run([sys.executable, '-c', script, ROOT], cwd=tmp_path, capture_output=True, text=True,
+                            check=True).stdout
+    assert output.split() == ['1', '0']
+
+
+def test_each_app_has_its_own_services(make_app):
+    import app as hub
+
+    first, second = make_app('first'), make_app('second', PAGE_CACHE_MB=1, BREAK_STREAM_MAX=2)
+    services = first.extensions['hub'], second.extensions['hub']
+    assert services[0].mailer is not services[1].mailer
+    assert services[0].mailer.path.endswith('first-mail.db')
+    assert services[1].mailer.path.endswith('second-mail.db')
+    assert services[1].page_cache.max_bytes == 1024 * 1024
+    for flask_app, own in zip((first, second), services):
+        with flask_app.test_request_context():
+            assert hub.mailer._get_current_object() is own.mailer
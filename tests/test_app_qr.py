@@ -0,0 +1,34 @@
+"""Rendering options on the QR endpoints: anything the renderer would choke on is a 400."""
+import pytest
+
+BAD_OPTIONS = [
+    {'box_size': [1]},
+    {'border': {'size': 1}},
+    {'box_size': 'big'},
+    {'box_size': 0},
+    {'fill_color': 'red\n'},
+    {'fill_color': 'notacolor'},
+    {'fill_color': 'ff0000'},
+    {'fill_color': 'transparent'},
+    {'back_color': 'rgb(1,2,3)'},
+]
+
+
+@pytest.mark.parametrize('options', BAD_OPTIONS)
+def test_bad_options_are_rejected(client, options):
+    assert client.post('/api/generate-qr', json={'text': 'hi', **options}).status_code == 400
+    assert client.post('/api/generate-qr/batch', json={'texts': ['hi'], **options}).status_code == 400
+    if all(isinstance(value, (str, int)) for value in options.values()):
+        assert client.get('/api/qr.png', query_string={'text': 'hi', **options}).status_code == 400
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'fill_color': '#1e88e5', 'back_color': 'WHITE'},
+    {'fill_color': 'navy', 'back_color': 'transparent'},
+    {'box_size': '4', 'border': 0},
+])
+def test_good_options_render(client, options):
+    assert client.post('/api/generate-qr', json={'text': 'hi', **options}).status_code == 200
+    png = client.get('/api/qr.png', query_string={'text': 'hi', **options})
+    assert png.status_code == 200 and png.data.startswith(b'\x89PNG')
@@ -0,0 +1,38 @@
+"""The weather endpoints against a local OpenWeatherMap stand-in."""
+import json
+
+import pytest
+
+import app as hub
+from benchmarks.stubs import OpenWeatherStub, serve
+
+
+@pytest.fixture
+def openweather(monkeypatch):
+    server, base_url = serve(OpenWeatherStub)
+    monkeypatch.setattr(hub, 'OPENWEATHER_URL', f'{base_url}/data/2.5/weather')
+    yield
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize('body', [None, [], ['London'], {'city': 42}, {'city': ['London']}, {'city': {}},
+                                  {'city': '  '}, {'city': 'London', 'units': 'kelvin'}])
+def test_bad_requests_are_rejected(client, body):
+    assert client.post('/api/weather', data=json.dumps(body), content_type='application/json').status_code == 400
+
+
+@pytest.mark.parametrize('body', [None, ['London'], {'locations': 'London'}, {'locations': [42]},
+                                  {'locations': [{'lat': 91, 'lon': 0}]}])
+def test_bad_batches_are_rejected(client, body):
+    response = client.post('/api/weather/batch', data=json.dumps(body), content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_lookup(client, openweather):
+    response = client.post('/api/weather', json={'city': 'london'})
+    assert response.status_code == 200
+    assert response.get_json()['city'] == 'London'
+    assert response.headers['X-Cache'] == 'miss'
+    assert client.post('/api/weather', json={'city': 'london'}).headers['X-Cache'] == 'hit'
+    assert client.post('/api/weather', json={'city': 'nowhere'}).status_code == 404
@@ -0,0 +1,122 @@
+"""BreakScheduler: when reminders fire, lazy cancelling, misfires, and pushing to subscribers."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from datetime import time as time_of_day
+
+import pytest
+
+from break_scheduler import BreakScheduler, Subscribers, next_fire, zone
+from wellness_store import WellnessStore
+
+BERLIN = zone('Europe/Berlin')
+DAY = 24 * 3600
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def record(break_id, scheduled_time='09:00', tz='UTC', user_email='student@example.edu'):
+    return {'id': break_id, 'user_email': user_email, 'activity': 'Stretch', 'duration_minutes': 5,
+            'scheduled_time': scheduled_time, 'timezone': tz}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = WellnessStore(str(tmp_path / 'wellness.db'))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def scheduler(store):
+    scheduler = BreakScheduler(store, Subscribers(), sync_interval=0.05)
+    yield scheduler
+    scheduler.stop()
+
+
+def test_next_fire_is_strictly_later():
+    at = time_of_day(9, 0)
+    assert next_fire(at, BERLIN, utc(2024, 6, 1, 6, 0)) == utc(2024, 6, 1, 7, 0)
+    assert next_fire(at, BERLIN, utc(2024, 6, 1, 7, 0)) == utc(2024, 6, 2, 7, 0)
+    assert next_fire(at, BERLIN, utc(2024, 6, 1, 8, 0)) == utc(2024, 6, 2, 7, 0)
+
+
+def test_next_fire_across_dst_changes():
+    at = time_of_day(2, 30)
+    # 02:30 does not exist on 31 March in Berlin: it fires an hour on, at 03:30 CEST
+    assert next_fire(at, BERLIN, utc(2024, 3, 30, 23, 0)) == utc(2024, 3, 31, 1, 30)
+    assert next_fire(at, BERLIN, utc(2024, 3, 31, 1, 30)) == utc(2024, 4, 1, 0, 30)
+    # and happens twice on 27 October: it fires on the first one only
+    first = next_fire(at, BERLIN, utc(2024, 10, 26, 22, 0))
+    assert first == utc(2024, 10, 27, 0, 30)
+    assert next_fire(at, BERLIN, first) == utc(2024, 10, 28, 1, 30)
+    # A time of day that stays put in local time moves in UTC
+    assert next_fire(time_of_day(9, 0), BERLIN, utc(2024, 3, 30, 12, 0)) == utc(2024, 3, 31, 7, 0)
+
+
+def test_unschedulable_records_are_dropped(scheduler):
+    assert scheduler.schedule(record(1), now=utc(2024, 6, 1)) == utc(2024, 6, 1, 9, 0)
+    assert scheduler.schedule(record(1, scheduled_time='25:00'), now=utc(2024, 6, 1)) is None
+    assert scheduler.schedule(record(2, tz='Mars/Olympus_Mons'), now=utc(2024, 6, 1)) is None
+    assert scheduler.stats()['scheduled'] == 0
+
+
+def test_rescheduling_replaces_the_old_entry(scheduler):
+    scheduler.schedule(record(1, '09:00'), now=utc(2024, 6, 1))
+    scheduler.schedule(record(1, '10:00'), now=utc(2024, 6, 1))
+    assert [event['scheduled_time'] for _, event in scheduler._due(utc(2024, 6, 1, 10, 0))] == ['10:00']
+    assert scheduler.stats()['fired'] == 1
+
+
+def test_cancelled_entries_are_skipped_when_they_come_due(scheduler):
+    for break_id in range(3):
+        scheduler.schedule(record(break_id, f'09:00:{break_id}0'), now=utc(2024, 6, 1))
+    assert scheduler.cancel(1) and not scheduler.cancel(1)
+    assert (scheduler.stats()['scheduled'], scheduler.stats()['heap_entries']) == (2, 3)
+    assert [event['id'] for _, event in scheduler._due(utc(2024, 6, 1, 9, 0, 30))] == [0, 2]
+    assert scheduler.stats()['heap_entries'] == 2
+
+
+def test_dead_entries_are_swept_once_they_are_the_majority(scheduler):
+    scheduler.MIN_DEAD_TO_SWEEP = 4
+    for break_id in range(6):
+        scheduler.schedule(record(break_id, user_email=f'student{break_id % 2}@example.edu'), now=utc(2024, 6, 1))
+    for break_id in range(3):
+        scheduler.cancel(break_id)
+    assert scheduler.stats()['heap_entries'] == 6
+    scheduler.cancel(3)
+    stats = scheduler.stats()
+    assert (stats['scheduled'], stats['heap_entries'], stats['users']) == (2, 2, 2)
+    scheduler.cancel(4)
+    assert scheduler.stats()['users'] == 1
+
+
+def test_late_reminders_are_skipped_until_their_next_day(scheduler):
+    fire_at = scheduler.schedule(record(1, '09:00', 'Europe/Berlin'), now=utc(2024, 6, 1))
+    [(user_email, event)] = scheduler._due(fire_at + 30)
+    assert user_email == 'student@example.edu'
+    assert event == {'id': 1, 'activity': 'Stretch', 'duration_minutes': 5, 'scheduled_time': '09:00',
+                     'due': '2024-06-01T09:00:00+02:00'}
+    assert scheduler._due(fire_at + 60) == []
+
+    # A process asleep for days misses each reminder once, not once a day
+    assert scheduler._due(fire_at + 5 * DAY + 3600) == []
+    stats = scheduler.stats()
+    assert (stats['fired'], stats['missed']) == (1, 1)
+    assert scheduler._heap[0][0] == fire_at + 6 * DAY
+
+
+def test_running_scheduler_follows_the_store_and_pushes_reminders(store, scheduler):
+    scheduler.start()
+    assert scheduler.ready.wait(10)
+    due = (datetime.now(timezone.utc) + timedelta(seconds=2)).replace(microsecond=0)
+    created = store.insert('breaks', {**record(None, due.strftime('%H:%M:%S')), 'id': None})
+
+    async def receive():
+        queue = scheduler.subscribers.subscribe('student@example.edu')
+        return await asyncio.wait_for(queue.get(), 10)
+
+    event = asyncio.run(receive())
+    assert event['id'] == created['id']
+    assert event['due'] == due.isoformat(timespec='seconds')
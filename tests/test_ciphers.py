@@ -0,0 +1,118 @@
+"""The fast cipher paths agree with the character-at-a-time reference implementations.
+
+Outcomes are compared including the exception raised, since the reference
+loops themselves fail on some input (e.g. atbash of 'Æ').
+"""
+import string
+
+import pytest
+from hypothesis import HealthCheck, example, given, settings, strategies as st
+
+import ciphers
+
+texts = st.one_of(
+    st.text(),
+    st.text(alphabet=string.printable),
+    st.text(alphabet=string.ascii_letters + ' .,\n', min_size=1),
+)
+# Long enough for the numpy path as well as the bytes path
+long_texts = st.builds(lambda text, extra: text * (ciphers.NUMPY_MIN_SIZE // len(text) + extra),
+                       st.text(alphabet=string.printable, min_size=1, max_size=64), st.integers(1, 4))
+shifts = st.one_of(st.integers(-1000, 1000), st.integers(), st.floats(allow_nan=False, allow_infinity=False))
+keywords = st.one_of(st.text(alphabet=string.ascii_letters, min_size=1, max_size=20), st.text(max_size=20))
+stages = st.one_of(
+    st.tuples(st.just('atbash'), st.none(), st.booleans()),
+    st.tuples(st.just('caesar'), st.integers(-100, 100), st.booleans()),
+    st.tuples(st.just('vigenere'), st.text(alphabet=string.ascii_letters, min_size=1, max_size=12), st.booleans()),
+)
+
+
+def outcome(fn, *args):
+    try:
+        return 'ok', fn(*args)
+    except Exception as exc:
+        return 'raised', type(exc)
+
+
+# The engine fixture only patches a module constant, which holds for every example
+per_engine = settings(max_examples=300, suppress_health_check=[HealthCheck.function_scoped_fixture])
+
+
+@pytest.fixture(params=['numpy', 'bytes'])
+def engine(request, monkeypatch):
+    if request.param == 'bytes':
+        monkeypatch.setattr(ciphers, 'numpy', None)
+    elif ciphers.numpy is None:
+        pytest.skip('numpy is not installed')
+    return request.param
+
+
+def test_reference_raises_on_some_non_ascii():
+    assert outcome(ciphers.atbash_cipher, 'Æ') == outcome(ciphers._atbash_chars, 'Æ') == ('raised', ValueError)
+
+
+@given(text=st.one_of(texts, long_texts))
+def test_atbash(text):
+    assert outcome(ciphers.atbash_cipher, text) == outcome(ciphers._atbash_chars, text)
+
+
+@given(text=st.one_of(texts, long_texts), shift=shifts)
+def test_caesar(text, shift):
+    assert outcome(ciphers.caesar_cipher, text, shift) == outcome(ciphers._caesar_chars, text, shift)
+
+
+@per_engine
+@given(text=st.one_of(texts, long_texts), keyword=keywords)
+def test_vigenere(engine, text, keyword):
+    assert outcome(ciphers.vigenere_cipher, text, keyword) == outcome(ciphers._vigenere_chars, text, keyword)
+
+
+@per_engine
+@given(text=st.one_of(texts, long_texts), chain=st.lists(stages, max_size=6))
+def test_fused_pipeline_matches_stage_by_stage(engine, text, chain):
+    pipeline = ciphers.Pipeline(chain)
+    assert outcome(pipeline.apply, text) == outcome(pipeline.apply_stages, text)
+
+
+@per_engine
+@given(text=long_texts, chain=st.lists(stages, min_size=2, max_size=6))
+@example(text='Hello World ' * 500, chain=[('atbash', None, False), ('vigenere', 'key', False)])
+def test_fused_pipeline_on_long_text(engine, text, chain):
+    pipeline = ciphers.Pipeline(chain)
+    assert pipeline.apply(text) == pipeline.apply_stages(text)
+
+
+@given(text=st.text(alphabet=string.printable), chain=st.lists(stages, max_size=6))
+def test_inverse_undoes_pipeline(text, chain):
+    pipeline = ciphers.Pipeline(chain)
+    assert pipeline.inverse().apply(pipeline.apply(text)) == text
+
+
+def split(text, cuts):
+    """`text` cut at the given positions (taken modulo its length), empty pieces included."""
+    bounds = sorted(cut % (len(text) + 1) for cut in cuts)
+    return [text[start:end] for start, end in zip([0] + bounds, bounds + [len(text)])]
+
+
+def streamed(pipeline, chunks):
+    return ''.join(pipeline.stream(chunks))
+
+
+mixed_texts = st.one_of(
+    st.text(alphabet=string.ascii_letters + ' .,\néüßøΩДж中Æ'),
+    st.text(),
+    long_texts,
+    st.builds(lambda text, extra: text + extra, long_texts, st.text(alphabet='éßΩ中 ', min_size=1, max_size=8)),
+)
+
+
+@per_engine
+@given(text=mixed_texts, cuts=st.lists(st.integers(min_value=0), max_size=12),
+       chain=st.lists(stages, max_size=6))
+@example(text='Ünïcödé keys ACROSS chunks', cuts=[3, 4, 11, 17],
+         chain=[('vigenere', 'Lemon', False), ('caesar', 3, True), ('vigenere', 'ab', False)])
+def test_stream_matches_apply_for_any_split(engine, text, cuts, chain):
+    pipeline = ciphers.Pipeline(chain)
+    expected = outcome(pipeline.apply_stages, text)
+    assert outcome(pipeline.apply, text) == expected
+    assert outcome(streamed, pipeline, split(text, cuts)) == expected
@@ -0,0 +1,50 @@
+"""GET /api/dashboard against a wellness store in a temporary directory."""
+import importlib
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+USER = 'student@example.edu'
+
+
+@pytest.fixture(scope='module')
+def api(tmp_path_factory):
+    # The service opens its store on import
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('WELLNESS_DB', str(tmp_path_factory.mktemp('wellness') / 'wellness.db'))
+        patch.chdir(tmp_path_factory.mktemp('cwd'))
+        api = importlib.import_module('wellness_api')
+    assert os.path.dirname(api.DB_FILE), 'wellness_api was imported before WELLNESS_DB was set'
+    yield api
+    api.store.close()
+
+
+@pytest.fixture(scope='module')
+def client(api):
+    for n in range(5):
+        api.store.insert('mood_logs', {'user_email': USER, 'date': f'2024-06-0{n + 1}', 'mood': n + 1})
+        api.store.insert('sleep_logs', {'user_email': USER, 'date': f'2024-06-0{n + 1}', 'hours': 7})
+        api.store.insert('goals', {'user_email': USER, 'title': f'Goal {n}', 'status': 'pending'})
+        api.store.insert('breaks', {'user_email': USER, 'activity': f'Break {n}', 'duration_minutes': 5,
+                                    'scheduled_time': f'1{n}:00'})
+    return TestClient(api.app)
+
+
+def test_every_list_section_honours_limit(client):
+    dashboard = client.get('/api/dashboard', params={'user_email': USER, 'limit': 2}).json()
+    assert {section: len(dashboard[section]) for section in ('mood', 'sleep', 'goals', 'breaks')} == \
+        {'mood': 2, 'sleep': 2, 'goals': 2, 'breaks': 2}
+    # The newest, oldest first
+    assert [goal['title'] for goal in dashboard['goals']] == ['Goal 3', 'Goal 4']
+    assert [item['activity'] for item in dashboard['breaks']] == ['Break 3', 'Break 4']
+    assert dashboard['analytics']['total_mood_logs'] == 5
+
+
+def test_limit_is_part_of_the_etag(client):
+    params = {'user_email': USER, 'fields': 'goals'}
+    etag = client.get('/api/dashboard', params={**params, 'limit': 2}).headers['ETag']
+    assert client.get('/api/dashboard', params={**params, 'limit': 2},
+                      headers={'If-None-Match': etag}).status_code == 304
+    response = client.get('/api/dashboard', params={**params, 'limit': 10}, headers={'If-None-Match': etag})
+    assert response.status_code == 200 and len(response.json()['goals']) == 5
@@ -0,0 +1,106 @@
+"""JokePool against a local JokeAPI stand-in."""
+import threading
+import time
+
+import pytest
+import requests
+
+from benchmarks.stubs import JokeAPIStub, serve
+from joke_pool import FALLBACK_JOKES, JokePool
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def jokeapi():
+    """The stand-in, a class of its own per test, noting the categories asked for in `asked`."""
+    asked = []
+
+    class Stub(JokeAPIStub):
+        calls = next_id = 0
+        fail = False
+        lock = threading.Lock()
+
+        def do_GET(self):
+            asked.append(self.path.split('?')[0].rsplit('/', 1)[-1])
+            super().do_GET()
+
+    Stub.asked = asked
+    server, base_url = serve(Stub)
+    Stub.url = f'{base_url}/joke'
+    yield Stub
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_pool(jokeapi):
+    pools = []
+
+    def make(**kwargs):
+        pools.append(JokePool(requests.Session(), jokeapi.url, **{'capacity': 20, 'low_water': 5, 'amount': 5,
+                                                                  'max_backoff': 60, **kwargs}))
+        return pools[-1]
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+def test_start_fills_the_pool(make_pool, jokeapi):
+    pool = make_pool()
+    pool.start()
+    wait_for(lambda: pool.stats()['size'] == 20 and not pool.stats()['refilling'])
+    assert jokeapi.calls == 4 and set(jokeapi.asked) == {'Any'}
+
+
+def test_dropping_below_low_water_refills(make_pool, jokeapi):
+    pool = make_pool()
+    pool.start()
+    wait_for(lambda: pool.stats()['size'] == 20 and not pool.stats()['refilling'])
+    # Down to 4, one below low water
+    assert {pool.get()[2] for _ in range(16)} == {'pool'}
+    wait_for(lambda: pool.stats()['refills'] == 8 and not pool.stats()['refilling'])
+    # Four batches of five: the last one may run a batch past capacity
+    assert pool.stats()['size'] == 24 and jokeapi.calls == 8
+    assert pool.stats()['served'] == 16
+
+
+def test_missing_category_is_refilled_on_its_own(make_pool, jokeapi):
+    pool = make_pool(low_water=0)
+    joke, category, source = pool.get('Christmas')
+    # Nothing yet, so a stock joke of that category while it is fetched
+    assert (source, category) == ('fallback', 'Christmas')
+    assert joke in {joke['joke'] for joke in FALLBACK_JOKES}
+    wait_for(lambda: pool.stats()['by_category'].get('Christmas'))
+    assert jokeapi.asked == ['Christmas']
+    assert pool.get('Christmas')[1:] == ('Christmas', 'pool')
+
+
+def test_upstream_down_repeats_recent_jokes_then_falls_back(make_pool, jokeapi):
+    pool = make_pool(capacity=5, low_water=1)
+    pool.start()
+    wait_for(lambda: pool.stats()['size'] == 5 and not pool.stats()['refilling'])
+    jokeapi.fail = True
+    served = [pool.get() for _ in range(5)]
+    assert {source for _, _, source in served} == {'pool'}
+
+    joke, category, source = pool.get()
+    assert source == 'recent' and (joke, category) in {(joke, category) for joke, category, _ in served}
+    wait_for(lambda: pool.stats()['refill_errors'] == 1 and not pool.stats()['refilling'])
+    assert '500' in pool.stats()['last_error']
+
+    missing = next(name for name in ('Spooky', 'Christmas', 'Pun', 'Misc')
+                   if name not in {category for _, category, _ in served})
+    assert pool.get(missing)[1:] == (missing, 'fallback')
+    # Backing off: no more calls for a while, however many are asked for
+    calls = jokeapi.calls
+    for _ in range(20):
+        pool.get()
+    assert jokeapi.calls == calls
@@ -0,0 +1,134 @@
+"""MailDispatcher against a local SMTP sink: batching, retries, reconnects and surviving errors."""
+import socket
+import sqlite3
+import time
+from email.mime.text import MIMEText
+
+import pytest
+
+from benchmarks.stubs import SMTPSink, serve_smtp
+from mailer import MailDispatcher, SMTPSettings
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.01)
+
+
+def message(subject='Hello'):
+    msg = MIMEText('Hi there')
+    msg['Subject'] = subject
+    return msg
+
+
+class Sink(SMTPSink):
+    """The benchmark sink, answering `data_reply` to each message's data.
+
+    With `drop_after_message` it hangs up once a message is accepted, like
+    a server closing an idle session.
+    """
+
+    data_reply = '250 2.0.0 Ok: queued'
+    drop_after_message = False
+
+    def reply(self, line):
+        if line.startswith('250 2.0.0 Ok: queued'):
+            super().reply(self.data_reply)
+            if self.drop_after_message:
+                self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        super().reply(line)
+
+
+@pytest.fixture
+def make_dispatcher(tmp_path):
+    """Start a sink with the given Sink attributes and a stopped one-worker dispatcher sending to it."""
+    servers, dispatchers = [], []
+
+    def make(max_attempts=5, **attrs):
+        # A class of its own, so the counts start from zero
+        handler = type('TestSink', (Sink,), {'messages': 0, 'connections': 0, **attrs})
+        server, port = serve_smtp(handler)
+        servers.append(server)
+        dispatcher = MailDispatcher(str(tmp_path / 'mail.db'), SMTPSettings('127.0.0.1', port, starttls=False),
+                                    workers=1, max_attempts=max_attempts, backoff=0.01, idle_timeout=1)
+        dispatchers.append(dispatcher)
+        return dispatcher, handler
+
+    yield make
+    for dispatcher in dispatchers:
+        dispatcher.stop()
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def dispatcher(make_dispatcher):
+    return make_dispatcher()[0]
+
+
+def send(dispatcher, count=1):
+    """Submit `count` emails, start sending and wait for all of them to be sent or fail."""
+    jobs = [dispatcher.submit(message(f'Hello {n}'), 'hub@example.edu', [f'student{n}@example.edu'])
+            for n in range(count)]
+    dispatcher.start()
+    wait_for(lambda: all(dispatcher.status(job)['status'] in ('sent', 'failed') for job in jobs))
+    return [dispatcher.status(job) for job in jobs]
+
+
+def test_sends_over_one_session(make_dispatcher):
+    dispatcher, sink = make_dispatcher()
+    assert [job['status'] for job in send(dispatcher, 5)] == ['sent'] * 5
+    assert sink.messages == 5 and sink.connections == 1
+
+
+def test_temporary_failures_are_retried_up_to_the_limit(make_dispatcher):
+    dispatcher, sink = make_dispatcher(max_attempts=3, data_reply='451 4.3.0 Try again later')
+    [job] = send(dispatcher)
+    assert job['status'] == 'failed' and job['attempts'] == 3
+    assert job['error'] == '451 4.3.0 Try again later'
+    # Each failure starts a fresh session
+    assert sink.connections == 3
+
+
+def test_permanent_failures_are_not_retried(make_dispatcher):
+    dispatcher, sink = make_dispatcher(data_reply='550 5.1.1 No such user')
+    [job] = send(dispatcher)
+    assert job['status'] == 'failed' and job['attempts'] == 1
+    assert job['error'] == '550 5.1.1 No such user'
+    assert sink.connections == 1
+
+
+def test_dropped_session_is_reopened_without_costing_an_attempt(make_dispatcher):
+    dispatcher, sink = make_dispatcher(drop_after_message=True)
+    jobs = send(dispatcher, 3)
+    assert [(job['status'], job['attempts']) for job in jobs] == [('sent', 1)] * 3
+    assert sink.messages == 3 and sink.connections == 3
+
+
+def test_worker_survives_database_errors(dispatcher, monkeypatch):
+    claim, finish = dispatcher._claim, dispatcher._finish
+    errors = {'claim': 1, 'finish': 1}
+
+    def failing(name, fn):
+        def call(*args, **kwargs):
+            if errors[name]:
+                errors[name] -= 1
+                raise sqlite3.OperationalError('database is locked')
+            return fn(*args, **kwargs)
+        return call
+
+    monkeypatch.setattr(dispatcher, '_claim', failing('claim', claim))
+    monkeypatch.setattr(dispatcher, '_finish', failing('finish', finish))
+    first = dispatcher.submit(message(), 'hub@example.edu', ['a@example.edu'])
+    dispatcher.start()
+    # The first claim fails, then recording the first send does
+    wait_for(lambda: not any(errors.values()))
+    later = dispatcher.submit(message(), 'hub@example.edu', ['b@example.edu'])
+    wait_for(lambda: dispatcher.status(later)['status'] == 'sent')
+    # Whether it went out is unknown, so it waits for claim_timeout
+    assert dispatcher.status(first)['status'] == 'sending'
@@ -0,0 +1,169 @@
+"""QRCache's memory and disk tiers, and rendering on a bounded worker pool."""
+import threading
+import time
+
+import pytest
+
+import qr_cache
+from qr_cache import QR_DEFAULTS, PoolBusy, QRCache, RenderPool, RenderTimeout, qr_key, render_png
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def gated_render(monkeypatch):
+    """Make inline renders wait for `gate`; `calls` lists the texts of each render."""
+    gate, calls = threading.Event(), []
+    render_batch = qr_cache.render_batch
+
+    def render(texts, options):
+        calls.append(texts)
+        gate.wait()
+        return render_batch(texts, options)
+
+    monkeypatch.setattr(qr_cache, 'render_batch', render)
+    yield gate, calls
+    gate.set()
+
+
+@pytest.fixture
+def one_slot_pool():
+    pool = RenderPool(workers=1, max_pending=1, timeout=10)
+    yield pool
+    pool.shutdown()
+
+
+def test_memory_is_bounded_in_bytes_least_recently_used_first():
+    a, b, c = (len(render_png(text, QR_DEFAULTS)) for text in 'abc')
+    cache = QRCache(a + max(b, c))
+    cache.get('a')
+    cache.get('b')
+    cache.get('a')
+    cache.get('c')
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['evictions']) == (2, a + c, 1)
+    # b went, being the least recently used
+    cache.get('a')
+    cache.get('b')
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (2, 4)
+
+
+def test_images_larger_than_memory_are_not_kept():
+    cache = QRCache(10)
+    key, png = cache.get('hello')
+    assert key == qr_key('hello', QR_DEFAULTS) and png.startswith(b'\x89PNG')
+    assert cache.get('hello') == (key, png)
+    assert cache.stats()['entries'] == 0 and cache.stats()['renders'] == 2
+
+
+def test_disk_tier_outlives_evictions_and_restarts(tmp_path):
+    cache = QRCache(10, tmp_path)
+    key, png = cache.get('hello')
+    assert (tmp_path / key[:2] / f'{key}.png').read_bytes() == png
+    assert cache.get('hello') == (key, png)
+    assert (cache.stats()['disk_hits'], cache.stats()['renders']) == (1, 1)
+
+    restarted = QRCache(1024 * 1024, tmp_path)
+    assert restarted.get('hello') == (key, png)
+    assert restarted.get('hello') == (key, png)
+    stats = restarted.stats()
+    assert (stats['disk_hits'], stats['hits'], stats['renders']) == (1, 1, 0)
+
+
+def test_concurrent_misses_share_one_render(gated_render):
+    gate, calls = gated_render
+    cache = QRCache(1024 * 1024)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('hello'))) for _ in range(4)]
+    threads[0].start()
+    wait_for(lambda: calls)
+    for thread in threads[1:]:
+        thread.start()
+    wait_for(lambda: all(thread.is_alive() for thread in threads[1:]))
+    time.sleep(0.05)
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [['hello']]
+    assert len(set(results)) == 1 and len(results) == 4
+    assert cache.stats()['coalesced'] + cache.stats()['hits'] == 3
+
+
+def test_batch_renders_only_what_it_has_not_got(gated_render):
+    gate, calls = gated_render
+    gate.set()
+    cache = QRCache(1024 * 1024)
+    cache.get('a')
+    results = cache.get_many(['a', 'b', 'c', 'b'])
+    assert calls == [['a'], ['b', 'c']]
+    assert [key for key, _ in results] == [qr_key(text, QR_DEFAULTS) for text in 'abcb']
+    assert results[1] == results[3]
+
+
+def test_failed_render_reaches_everyone_waiting_and_is_not_kept(gated_render, monkeypatch):
+    gate, calls = gated_render
+    cache = QRCache(1024 * 1024)
+    errors = []
+
+    def get():
+        try:
+            cache.get('hello')
+        except RenderTimeout as exc:
+            errors.append(exc)
+
+    monkeypatch.setattr(qr_cache, 'render_png', lambda text, options: (_ for _ in ()).throw(RenderTimeout('slow')))
+    owner, waiter = threading.Thread(target=get), threading.Thread(target=get)
+    owner.start()
+    wait_for(lambda: calls)
+    waiter.start()
+    time.sleep(0.05)
+    gate.set()
+    owner.join()
+    waiter.join()
+    assert len(errors) == 2
+    monkeypatch.undo()
+    assert cache.get('hello')[1].startswith(b'\x89PNG')
+
+
+def test_full_queue_is_refused_until_a_slot_frees(one_slot_pool):
+    cache = QRCache(1024 * 1024, pool=one_slot_pool)
+    first = threading.Thread(target=cache.get, args=('a',))
+    first.start()
+    # The first job holds the only slot while its worker starts up
+    wait_for(lambda: cache._inflight)
+    with pytest.raises(PoolBusy) as busy:
+        cache.get('b')
+    assert busy.value.retry_after >= 1
+    first.join()
+    assert cache.get('b')[1].startswith(b'\x89PNG')
+    assert one_slot_pool.stats()['rejected'] == 1 and one_slot_pool.stats()['jobs'] == 2
+
+
+def test_slow_render_times_out_and_keeps_its_slot(one_slot_pool):
+    # Far less time than a worker process takes to start
+    one_slot_pool.timeout = 0.01
+    cache = QRCache(1024 * 1024, pool=one_slot_pool)
+    with pytest.raises(RenderTimeout):
+        cache.get('a')
+    assert one_slot_pool.stats()['timeouts'] == 1 and not cache._inflight
+    with pytest.raises(PoolBusy):
+        cache.get('a')
+    one_slot_pool.timeout = 10
+    wait_for(lambda: one_slot_pool.stats()['jobs'] == 1)
+    assert cache.get('a')[1].startswith(b'\x89PNG')
+
+
+def test_endpoints_answer_429_and_504(make_app):
+    flask_app = make_app(QR_WORKERS=1, QR_QUEUE=1, QR_TIMEOUT=0.01)
+    client = flask_app.test_client()
+    with client.session_transaction() as session:
+        session['user'] = {'email': 'student@example.edu', 'name': 'Student', 'picture': ''}
+    assert client.post('/api/generate-qr', json={'text': 'a'}).status_code == 504
+    busy = client.get('/api/qr.png', query_string={'text': 'b'})
+    assert busy.status_code == 429 and int(busy.headers['Retry-After']) >= 1
@@ -0,0 +1,143 @@
+"""Server-side sessions: signed ids, rotation, and stores sharing one database."""
+import sqlite3
+import time
+
+import pytest
+from flask import Flask, jsonify, session
+
+from session_store import CHANGES, ServerSessionInterface, SQLiteSessionStore
+
+USER = {'email': 'student@example.edu', 'name': 'Student', 'picture': ''}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteSessionStore(str(tmp_path / 'sessions.db'))
+
+
+@pytest.fixture
+def client(store):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.session_interface = ServerSessionInterface(store)
+
+    @app.route('/visit')
+    def visit():
+        session['visits'] = session.get('visits', 0) + 1
+        return jsonify(session.get('user'))
+
+    # As the app's OAuth callback does
+    @app.route('/login')
+    def login():
+        session.clear()
+        session['user'] = USER
+        return ''
+
+    @app.route('/logout')
+    def logout():
+        session.pop('user', None)
+        return ''
+
+    return app.test_client()
+
+
+def sid(client):
+    return client.get_cookie('session').value.rpartition('.')[0]
+
+
+def test_session_lives_in_the_store_behind_a_signed_id(client, store):
+    client.get('/login')
+    cookie = client.get_cookie('session').value
+    assert USER['email'] not in cookie
+    assert store.load(sid(client))[0] == {'user': USER}
+    assert client.get('/visit').get_json() == USER
+
+
+@pytest.mark.parametrize('forge', [
+    lambda cookie: cookie.rpartition('.')[0],
+    lambda cookie: cookie[:-2] + ('AA' if not cookie.endswith('AA') else 'BB'),
+    lambda cookie: 'x' + cookie,
+    lambda cookie: '.' + cookie.rpartition('.')[2],
+])
+def test_unsigned_or_forged_ids_get_a_fresh_session(client, forge):
+    client.get('/login')
+    client.set_cookie('session', forge(client.get_cookie('session').value))
+    assert client.get('/visit').get_json() is None
+
+
+def test_id_signed_with_another_key_is_refused(client, store):
+    store.save('known', {'user': USER}, time.time() + 60)
+    other = Flask(__name__)
+    other.secret_key = 'not the key'
+    client.set_cookie('session', f"known.{ServerSessionInterface(store)._mac(other, 'known')}")
+    assert client.get('/visit').get_json() is None
+
+
+def test_login_rotates_the_id(client, store):
+    client.get('/visit')
+    before = sid(client)
+    client.get('/login')
+    after = sid(client)
+    assert after != before
+    # The id from before the login is no use to whoever may have seen it
+    assert store.load(before) is None
+    client.set_cookie('session', client.get_cookie('session').value.replace(after, before))
+    assert client.get('/visit').get_json() is None
+
+
+def test_emptied_session_is_deleted_with_its_cookie(client, store):
+    client.get('/login')
+    old = sid(client)
+    client.get('/logout')
+    assert client.get_cookie('session') is None
+    assert store.load(old) is None
+
+
+def test_other_stores_drop_cached_sessions_changed_elsewhere(store):
+    other = SQLiteSessionStore(store.path)
+    store.save('a', {'n': 1}, time.time() + 60)
+    assert other.load('a')[0] == {'n': 1}
+    assert other.load('a')[0] == {'n': 1}
+    assert other.stats()['hits'] == 1
+
+    store.save('a', {'n': 2}, time.time() + 60)
+    assert other.load('a')[0] == {'n': 2}
+    store.delete('a')
+    assert other.load('a') is None
+    store.save('b', {'n': 1}, time.time() + 60)
+    other.load('b')
+    store.save('c', {'n': 1}, time.time() + 60, replaced='b')
+    assert other.load('b') is None and other.load('c')[0] == {'n': 1}
+
+
+def test_pruned_change_log_empties_the_cache(store):
+    other = SQLiteSessionStore(store.path)
+    store.save('a', {'n': 1}, time.time() + 60)
+    other.load('a')
+    for n in range(3):
+        store.save('a', {'n': n + 2}, time.time() + 60)
+    # Gone before `other` read it, so it cannot know what changed
+    conn = sqlite3.connect(store.path)
+    with conn:
+        conn.execute(f'DELETE FROM {CHANGES} WHERE seq < (SELECT MAX(seq) FROM {CHANGES})')
+    conn.close()
+    assert other.load('a')[0] == {'n': 4}
+
+
+def test_expired_sessions_are_not_served(store):
+    store.save('a', {'n': 1}, time.time() + 0.05)
+    assert store.load('a') is not None
+    time.sleep(0.1)
+    assert store.load('a') is None
+
+
+def test_logout_on_one_app_signs_out_of_all(make_app, tmp_path):
+    shared = str(tmp_path / 'shared-sessions.db')
+    first, second = (make_app(name, SESSION_DB=shared).test_client() for name in ('first', 'second'))
+    with first.session_transaction() as sess:
+        sess['user'] = USER
+    second.set_cookie('session', first.get_cookie('session').value)
+    assert second.get('/api/qr/stats').status_code == 200
+    assert first.get('/api/qr/stats').status_code == 200
+    first.get('/logout')
+    assert second.get('/api/qr/stats').status_code == 401
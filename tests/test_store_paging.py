@@ -0,0 +1,31 @@
+"""Keyset paging in WellnessStore.page."""
+import pytest
+
+from wellness_store import WellnessStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = WellnessStore(str(tmp_path / 'wellness.db'))
+    store.insert_many('mood_logs', [{'user_email': 'a@example.edu', 'date': f'2024-01-{day:02d}', 'mood': 'ok',
+                                     'stress_level': day % 10 + 1, 'created_at': f'2024-01-{day:02d}T08:00:00'}
+                                    for day in range(1, 11)])
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize('limit', [0, -1])
+def test_limit_below_one_is_rejected(store, limit):
+    with pytest.raises(ValueError):
+        store.page('mood_logs', 'a@example.edu', limit=limit)
+
+
+def test_pages_cover_every_record_once(store):
+    dates, cursor = [], None
+    while True:
+        page = store.page('mood_logs', 'a@example.edu', limit=3, before_id=cursor)
+        dates = [record['date'] for record in page['records']] + dates
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert dates == [f'2024-01-{day:02d}' for day in range(1, 11)]
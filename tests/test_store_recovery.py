@@ -0,0 +1,67 @@
+"""A write WellnessStore has acknowledged survives the process being killed."""
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+
+from wellness_store import WellnessStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Writes from several threads as fast as the store takes them, printing the
+# id of each one as soon as the store acknowledges it
+WRITER = textwrap.dedent('''
+    import sys, threading
+    sys.path.insert(0, sys.argv[2])
+    from wellness_store import WellnessStore
+
+    store = WellnessStore(sys.argv[1])
+    lock = threading.Lock()
+
+    def write(thread):
+        for i in range(1000000):
+            record = store.insert('mood_logs', {'user_email': f'student{thread}@example.edu', 'date': '2024-01-01',
+                                                'mood': 'happy', 'stress_level': i % 10 + 1, 'notes': f'{thread}-{i}'})
+            with lock:
+                print(record['id'], record['notes'], flush=True)
+
+    for thread in range(8):
+        threading.Thread(target=write, args=(thread,)).start()
+''')
+
+
+def killed_mid_burst(path, acknowledged):
+    """Run WRITER on `path` and SIGKILL it after `acknowledged` writes; returns {id: notes} it saw acknowledged."""
+    writer = subprocess.Popen([sys.executable, '-c', WRITER, path, ROOT], stdout=subprocess.PIPE, text=True)
+    seen = {}
+    try:
+        for line in writer.stdout:
+            record_id, notes = line.split()
+            seen[int(record_id)] = notes
+            if len(seen) >= acknowledged:
+                break
+    finally:
+        writer.send_signal(signal.SIGKILL)
+        writer.wait()
+    # Acknowledgements already printed but not yet read count too
+    for line in writer.stdout:
+        if line.endswith('\n'):
+            record_id, notes = line.split()
+            seen[int(record_id)] = notes
+    return seen
+
+
+def test_acknowledged_writes_survive_sigkill(tmp_path):
+    path = str(tmp_path / 'wellness.db')
+    acknowledged = {}
+    for round in range(3):
+        acknowledged.update(killed_mid_burst(path, 2000 + 500 * round))
+        store = WellnessStore(path)
+        try:
+            stored = {record['id']: record['notes'] for record in store.iter_records('mood_logs')}
+            missing = acknowledged.keys() - stored.keys()
+            assert not missing, f'{len(missing)} acknowledged writes lost after kill {round + 1}'
+            assert all(stored[record_id] == notes for record_id, notes in acknowledged.items())
+        finally:
+            store.close()
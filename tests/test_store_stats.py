@@ -0,0 +1,89 @@
+"""The incrementally maintained user_stats agree with recomputing them from every record."""
+import random
+
+import pytest
+
+from wellness_store import ANALYTICS_WINDOWS, ROLLING_FIELDS, WellnessStore
+
+USERS = ['a@example.edu', 'b@example.edu', 'c@example.edu']
+STATUSES = ['pending', 'in_progress', 'completed']
+
+
+def recomputed(store, user_email):
+    """What the analytics endpoint computed before the stats were incremental."""
+    expected = {}
+    for collection, field in ROLLING_FIELDS.items():
+        records = list(store.iter_records(collection, user_email))  # oldest first
+        values = [record[field] for record in records]
+        expected[collection] = {'count': len(records), 'values': values[-max(ANALYTICS_WINDOWS):],
+                                'averages': {window: average(values[-window:]) for window in ANALYTICS_WINDOWS}}
+    goals = {}
+    for goal in store.iter_records('goals', user_email):
+        goals[goal['status']] = goals.get(goal['status'], 0) + 1
+    expected['goals'] = goals
+    return expected
+
+
+def incremental(store, user_email):
+    stats = store.user_stats(user_email)
+    actual = {}
+    for collection in ROLLING_FIELDS:
+        rolling = stats[collection]
+        actual[collection] = {'count': rolling['count'], 'values': rolling['values'],
+                              'averages': {window: average(rolling['values'][-window:])
+                                           for window in ANALYTICS_WINDOWS}}
+    actual['goals'] = {status: count for status, count in stats['goals'].items() if count}
+    return actual
+
+
+def average(values):
+    return round(sum(values) / len(values), 1) if values else 0
+
+
+def created_at(rng):
+    # Mostly in order, sometimes back-dated, with ties on the same second
+    return f'2024-{rng.randint(1, 3):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 2):02d}:00:00'
+
+
+def record(rng, collection, user_email):
+    if collection == 'mood_logs':
+        return {'user_email': user_email, 'date': '2024-01-01', 'mood': 'ok', 'stress_level': rng.randint(1, 10),
+                'created_at': created_at(rng)}
+    if collection == 'sleep_logs':
+        return {'user_email': user_email, 'date': '2024-01-01', 'sleep_hours': rng.randint(3, 10),
+                'sleep_quality': 'good', 'academic_performance': 'good', 'created_at': created_at(rng)}
+    return {'user_email': user_email, 'title': 'Goal', 'description': '', 'target_date': '2024-06-01',
+            'status': rng.choice(STATUSES), 'created_at': created_at(rng)}
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_incremental_stats_match_full_recompute(tmp_path, seed):
+    rng = random.Random(seed)
+    store = WellnessStore(str(tmp_path / 'wellness.db'))
+    ids = {collection: [] for collection in (*ROLLING_FIELDS, 'goals')}
+    try:
+        for step in range(600):
+            collection = rng.choice(list(ids))
+            user_email = rng.choice(USERS)
+            op = rng.random()
+            if op < 0.45 or not ids[collection]:
+                new = store.insert(collection, record(rng, collection, user_email))
+                ids[collection].append((new['id'], user_email))
+            elif op < 0.55:
+                batch = [record(rng, collection, rng.choice(USERS)) for _ in range(rng.randint(1, 120))]
+                ids[collection].extend((new['id'], new['user_email']) for new in store.insert_many(collection, batch))
+            elif op < 0.75:
+                record_id, owner = ids[collection].pop(rng.randrange(len(ids[collection])))
+                assert store.delete(collection, record_id, owner)
+            else:
+                record_id, owner = rng.choice(ids[collection])
+                edit = record(rng, collection, owner)
+                changes = {key: edit[key] for key in rng.sample(sorted(edit.keys() - {'user_email'}), 2)}
+                assert store.update(collection, record_id, owner, **changes) is not None
+            if step % 50 == 0:
+                for user in USERS:
+                    assert incremental(store, user) == recomputed(store, user), f'step {step}, {user}'
+        for user in USERS:
+            assert incremental(store, user) == recomputed(store, user)
+    finally:
+        store.close()
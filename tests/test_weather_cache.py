@@ -0,0 +1,131 @@
+"""WeatherCache in front of a fake upstream, on a clock the tests move."""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import weather_cache
+from weather_cache import WeatherCache
+
+
+class Upstream:
+    """A fetch that answers `answers[city]` (raising it if it is an exception), once `gate` is open."""
+
+    def __init__(self):
+        self.answers = {}
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, city, units):
+        self.calls.append(city)
+        self.gate.wait()
+        answer = self.answers.get(city, (200, {'city': city}))
+        if isinstance(answer, BaseException):
+            raise answer
+        return answer
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(weather_cache, 'time', SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def upstream():
+    return Upstream()
+
+
+@pytest.fixture
+def cache(upstream, clock):
+    cache = WeatherCache(upstream, ttl=600, stale_ttl=1800, negative_ttl=60)
+    yield cache
+    upstream.gate.set()
+    cache.close()
+
+
+def test_hit_after_miss_for_the_same_city_however_written(cache, upstream):
+    assert cache.get('London', 'metric') == (200, {'city': 'london'}, 'miss')
+    assert cache.get('  LONDON ', 'metric') == (200, {'city': 'london'}, 'hit')
+    assert cache.get('London', 'imperial')[2] == 'miss'
+    assert upstream.calls == ['london', 'london']
+
+
+def test_concurrent_misses_share_one_fetch(cache, upstream):
+    upstream.gate.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('Paris', 'metric'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: cache.stats()['coalesced'] == 7)
+    upstream.gate.set()
+    for thread in threads:
+        thread.join()
+    assert upstream.calls == ['paris']
+    assert sorted(how for _, _, how in results) == ['coalesced'] * 7 + ['miss']
+    assert {status for status, _, _ in results} == {200}
+
+
+def test_expired_answer_is_served_while_it_is_refreshed(cache, upstream, clock):
+    cache.get('Oslo', 'metric')
+    clock[0] += 601
+    upstream.answers['oslo'] = (200, {'city': 'oslo', 'fresh': True})
+    upstream.gate.clear()
+    # Served at once, without waiting for the refresh it starts
+    assert cache.get('Oslo', 'metric') == (200, {'city': 'oslo'}, 'stale')
+    assert cache.get('Oslo', 'metric')[2] == 'stale'
+    upstream.gate.set()
+    wait_for(lambda: cache.stats()['fetches'] == 2)
+    assert cache.get('Oslo', 'metric') == (200, {'city': 'oslo', 'fresh': True}, 'hit')
+    assert upstream.calls == ['oslo', 'oslo']
+
+
+def test_failed_refresh_keeps_serving_the_stale_answer(cache, upstream, clock):
+    cache.get('Lima', 'metric')
+    clock[0] += 601
+    upstream.answers['lima'] = ConnectionError('upstream down')
+    assert cache.get('Lima', 'metric') == (200, {'city': 'lima'}, 'stale')
+    wait_for(lambda: cache.stats()['fetch_errors'] == 1)
+    assert cache.get('Lima', 'metric') == (200, {'city': 'lima'}, 'stale')
+    wait_for(lambda: cache.stats()['fetch_errors'] == 2)
+    # Too old to serve at all: the error reaches the caller
+    clock[0] += 1800
+    with pytest.raises(ConnectionError):
+        cache.get('Lima', 'metric')
+
+
+def test_not_found_is_cached_for_negative_ttl(cache, upstream, clock):
+    upstream.answers['atlantis'] = (404, {'error': 'City not found'})
+    assert cache.get('Atlantis', 'metric')[::2] == (404, 'miss')
+    assert cache.get('Atlantis', 'metric')[::2] == (404, 'hit')
+    clock[0] += 61
+    # and never served stale
+    assert cache.get('Atlantis', 'metric')[::2] == (404, 'miss')
+    assert upstream.calls == ['atlantis', 'atlantis']
+
+
+def test_other_errors_are_not_cached(cache, upstream):
+    upstream.answers['nowhere'] = (500, {'error': 'Failed to fetch weather data'})
+    assert cache.get('Nowhere', 'metric')[::2] == (500, 'miss')
+    assert cache.get('Nowhere', 'metric')[::2] == (500, 'miss')
+    assert cache.stats()['fetch_errors'] == 2
+
+
+def test_get_many_mixes_hits_misses_and_failures(cache, upstream):
+    cache.get('Rome', 'metric')
+    upstream.answers['quito'] = TimeoutError('slow')
+    results = cache.get_many(['Rome', 'Cairo', 'Quito', 'rome'], 'metric')
+    assert results[0] == results[3] == (200, {'city': 'rome'}, 'hit')
+    assert results[1] == (200, {'city': 'cairo'}, 'miss')
+    assert isinstance(results[2], TimeoutError)
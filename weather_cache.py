@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+# Upstream answers worth keeping: a forecast, or "no such city"
+CACHEABLE = (200, 404)
+
+
+def normalize_city(city):
+    # "  new   york , US" and "New York,us" are the same lookup
+    return ','.join(' '.join(part.split()) for part in city.casefold().split(','))
+
+
+def location_key(location):
+    # A city name, or (lat, lon) rounded to about a kilometre
+    if isinstance(location, tuple):
+        return round(location[0], 2), round(location[1], 2)
+    return normalize_city(location)
+
+
+class WeatherCache:
+    """TTL cache in front of a weather lookup.
+
+    `fetch(location, units)` returns (status, payload) for a city name or
+    (lat, lon) pair; 200 answers are kept for `ttl` seconds and 404s for
+    `negative_ttl`. For `stale_ttl` seconds after a forecast expires it is
+    still served at once while one background refresh replaces it, and it
+    keeps being served if that refresh fails. Concurrent misses for the
+    same location share one fetch. get_many fetches misses on a pool of
+    `fetch_workers` threads shared by all callers, which caps how many
+    upstream calls batches make at once.
+    """
+
+    def __init__(self, fetch, ttl=600, stale_ttl=1800, negative_ttl=60, max_entries=1024, refresh_workers=2,
+                 fetch_workers=8):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.fetches = 0
+        self.fetch_errors = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(refresh_workers, thread_name_prefix='weather-refresh')
+        self._fetchers = ThreadPoolExecutor(fetch_workers, thread_name_prefix='weather-fetch')
+
+    def get(self, location, units):
+        """Return (status, payload, how) where how is hit, stale, miss or coalesced."""
+        key = (location_key(location), units)
+        cached, future, how = self._lookup(key)
+        if cached is not None:
+            return cached
+        if how == 'miss':
+            self._load(key, future)
+        status, payload = future.result()
+        return status, payload, how
+
+    def get_many(self, locations, units, timeout=None):
+        """Look up several locations at once; returns a list with, for each,
+        (status, payload, how) or the exception its fetch raised.
+
+        Cached answers come back without waiting; misses are fetched
+        concurrently, so the whole call takes about as long as the slowest.
+        """
+        keys = [(location_key(location), units) for location in locations]
+        results, pending = {}, {}
+        for key in dict.fromkeys(keys):
+            cached, future, how = self._lookup(key)
+            if cached is not None:
+                results[key] = cached
+            else:
+                if how == 'miss':
+                    self._fetchers.submit(self._load, key, future)
+                pending[key] = (future, how)
+        wait([future for future, _ in pending.values()], timeout)
+        for key, (future, how) in pending.items():
+            if not future.done():
+                results[key] = TimeoutError(f'No answer within {timeout}s')
+            elif future.exception() is not None:
+                results[key] = future.exception()
+            else:
+                results[key] = (*future.result(), how)
+        return [results[key] for key in keys]
+
+    def _lookup(self, key):
+        # Returns (cached answer, None, how) or (None, future to wait on, how);
+        # for a miss the caller must run _load with the future.
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                status, payload, stored, ttl = entry
+                age = now - stored
+                if age < ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return (status, payload, 'hit'), None, 'hit'
+                if status == 200 and age < ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._inflight:
+                        self._inflight[key] = future = Future()
+                        self._refresher.submit(self._load, key, future)
+                    return (status, payload, 'stale'), None, 'stale'
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                how = 'coalesced'
+            else:
+                self._inflight[key] = future = Future()
+                self.misses += 1
+                how = 'miss'
+        return None, future, how
+
+    def _load(self, key, future):
+        try:
+            status, payload = self.fetch(*key)
+        except BaseException as exc:
+            with self._lock:
+                self.fetches += 1
+                self.fetch_errors += 1
+                del self._inflight[key]
+            future.set_exception(exc)
+            # Nobody waits on a background refresh; the stale copy stays
+            return
+        with self._lock:
+            self.fetches += 1
+            if status in CACHEABLE:
+                self._entries[key] = (status, payload, time.monotonic(),
+                                      self.ttl if status == 200 else self.negative_ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self.fetch_errors += 1
+            del self._inflight[key]
+        future.set_result((status, payload))
+
+    def close(self):
+        """Stop the fetch threads once the lookups already started are done."""
+        self._refresher.shutdown(wait=False)
+        self._fetchers.shutdown(wait=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.coalesced + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'stale_ttl': self.stale_ttl,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'coalesced': self.coalesced,
+                'misses': self.misses,
+                'hit_ratio': round((self.hits + self.stale_hits + self.coalesced) / lookups, 4) if lookups else None,
+                'fetches': self.fetches,
+                'fetch_errors': self.fetch_errors,
+                'evictions': self.evictions,
+            }
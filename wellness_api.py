@@ -1,12 +1,29 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, TypeAdapter, field_validator
 from typing import Optional, List
-from datetime import datetime, date
-import json
+import asyncio
+import csv
+import io
+import itertools
 import os
 
-app = FastAPI(title="Wellness Tracker API")
+import fastjson
+from break_scheduler import BreakScheduler, Subscribers, parse_time, zone
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, ASGIMetrics, SlowRequestProfiler
+from wellness_store import ANALYTICS_WINDOWS, WellnessStore
+
+
+# orjson when installed (see fastjson.py) for every JSON response
+class FastJSONResponse(JSONResponse):
+    def render(self, content):
+        return fastjson.dumpb(content)
+
+
+app = FastAPI(title="Wellness Tracker API", default_response_class=FastJSONResponse)
 
 # Enable CORS
 app.add_middleware(
@@ -17,20 +34,75 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Data storage (in production, use a real database)
-DATA_FILE = 'wellness_data.json'
-
-
-def load_data():
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'r') as f:
-            return json.load(f)
-    return {'mood_logs': [], 'sleep_logs': [], 'goals': [], 'breaks': []}
-
-
-def save_data(data):
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+# Data storage
+DB_FILE = os.environ.get('WELLNESS_DB', 'wellness.db')
+LEGACY_DATA_FILE = 'wellness_data.json'
+
+CACHE_MB = int(os.environ.get('WELLNESS_CACHE_MB', '64'))
+# Largest `limit` a listing or dashboard request may ask for
+PAGE_LIMIT_MAX = int(os.environ.get('WELLNESS_PAGE_LIMIT_MAX', '1000'))
+
+# Uvicorn worker processes (each with its own store and read cache)
+WORKERS = int(os.environ.get('WELLNESS_WORKERS', '1'))
+PORT = int(os.environ.get('WELLNESS_PORT', '8001'))
+
+# Same meaning as in app.py: a bearer token for GET /metrics, and profiles
+# of requests slower than PROFILE_SLOW_MS written to PROFILE_DIR
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', '0'))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+
+# Also as in app.py: responses of COMPRESS_MIN_BYTES or more are gzipped for
+# clients that accept it, unless COMPRESS=0
+COMPRESS = os.environ.get('COMPRESS', '1') == '1'
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+
+# Break reminders are pushed to GET /api/breaks/stream when due; the stream
+# sends a comment every BREAK_STREAM_HEARTBEAT seconds to keep it open.
+# Each worker follows writes made by the others every BREAK_SYNC_INTERVAL.
+BREAK_STREAM = '/api/breaks/stream'
+BREAK_STREAM_HEARTBEAT = float(os.environ.get('BREAK_STREAM_HEARTBEAT', '15'))
+BREAK_SYNC_INTERVAL = float(os.environ.get('BREAK_SYNC_INTERVAL', '1'))
+
+
+# Starlette's gzip holds back small writes, which would stall event streams
+class CompressExceptStreams(GZipMiddleware):
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == BREAK_STREAM:
+            return await self.app(scope, receive, send)
+        return await super().__call__(scope, receive, send)
+
+
+profiler = SlowRequestProfiler(PROFILE_DIR, PROFILE_SLOW_MS / 1000, PROFILE_INTERVAL_MS / 1000) \
+    if PROFILE_SLOW_MS > 0 else None
+if COMPRESS:
+    app.add_middleware(CompressExceptStreams, minimum_size=COMPRESS_MIN_BYTES, compresslevel=6)
+app.add_middleware(ASGIMetrics, profiler=profiler, streams=[BREAK_STREAM])
+
+_first_run = not os.path.exists(DB_FILE)
+store = WellnessStore(DB_FILE, cache_bytes=CACHE_MB * 1024 * 1024)
+if _first_run and os.path.exists(LEGACY_DATA_FILE):
+    # Workers starting together may all see a first run; only one imports
+    store.import_json(LEGACY_DATA_FILE, only_if_empty=True)
+REGISTRY.stats('wellness_cache', store.cache.stats)
+reminder_subscribers = Subscribers()
+reminders = BreakScheduler(store, reminder_subscribers, sync_interval=BREAK_SYNC_INTERVAL)
+REGISTRY.stats('break_reminders', reminders.stats)
+REGISTRY.stats('break_subscribers', reminder_subscribers.stats)
+if profiler:
+    REGISTRY.stats('profiler', profiler.stats)
+
+
+@app.on_event("startup")
+def start_reminders():
+    reminders.start()
+
+
+@app.on_event("shutdown")
+def close_store():
+    reminders.stop()
+    store.close()
 
 
 # Models
@@ -64,144 +136,380 @@ class BreakReminder(BaseModel):
     user_email: str
     activity: str
     duration_minutes: int
-    scheduled_time: str
+    scheduled_time: str  # HH:MM, daily
+    timezone: Optional[str] = None  # IANA name; the server's local time if unset
+
+    @field_validator('scheduled_time')
+    @classmethod
+    def check_time(cls, value):
+        parse_time(value)
+        return value
+
+    @field_validator('timezone')
+    @classmethod
+    def check_timezone(cls, value):
+        zone(value)
+        return value
+
+
+# Listing endpoints page with keyset cursors (before_id / after_id) and the
+# filters store.page() supports; a request never reads more rows than it returns.
+# Like writes, reads run in the thread pool so a cache miss never blocks the
+# event loop. Read endpoints return FastJSONResponse themselves: store records
+# are plain JSON types, so FastAPI's jsonable_encoder pass over them is skipped.
+async def _page(collection, user_email, **query):
+    try:
+        return await run_in_threadpool(store.page, collection, user_email, **query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 # Mood/Stress Endpoints
 @app.post("/api/mood")
 async def create_mood_log(log: MoodLog):
-    data = load_data()
-    log_dict = log.dict()
-    log_dict['id'] = len(data['mood_logs']) + 1
-    log_dict['created_at'] = datetime.now().isoformat()
-    data['mood_logs'].append(log_dict)
-    save_data(data)
+    log_dict = await run_in_threadpool(store.insert, 'mood_logs', log.model_dump())
     return {"success": True, "log": log_dict}
 
 
 @app.get("/api/mood")
-async def get_mood_logs(user_email: str, limit: int = 30):
-    data = load_data()
-    user_logs = [log for log in data['mood_logs'] if log['user_email'] == user_email]
-    return {"success": True, "logs": user_logs[-limit:]}
+async def get_mood_logs(user_email: str, limit: int = Query(30, ge=1, le=PAGE_LIMIT_MAX),
+                        before_id: Optional[int] = None, after_id: Optional[int] = None,
+                        start_date: Optional[str] = None, end_date: Optional[str] = None):
+    page = await _page('mood_logs', user_email, limit=limit, before_id=before_id, after_id=after_id,
+                       start_date=start_date, end_date=end_date)
+    return FastJSONResponse({"success": True, "logs": page['records'], "next_cursor": page['next_cursor']})
 
 
 # Sleep Endpoints
 @app.post("/api/sleep")
 async def create_sleep_log(log: SleepLog):
-    data = load_data()
-    log_dict = log.dict()
-    log_dict['id'] = len(data['sleep_logs']) + 1
-    log_dict['created_at'] = datetime.now().isoformat()
-    data['sleep_logs'].append(log_dict)
-    save_data(data)
+    log_dict = await run_in_threadpool(store.insert, 'sleep_logs', log.model_dump())
     return {"success": True, "log": log_dict}
 
 
 @app.get("/api/sleep")
-async def get_sleep_logs(user_email: str, limit: int = 30):
-    data = load_data()
-    user_logs = [log for log in data['sleep_logs'] if log['user_email'] == user_email]
-    return {"success": True, "logs": user_logs[-limit:]}
+async def get_sleep_logs(user_email: str, limit: int = Query(30, ge=1, le=PAGE_LIMIT_MAX),
+                         before_id: Optional[int] = None, after_id: Optional[int] = None,
+                         start_date: Optional[str] = None, end_date: Optional[str] = None):
+    page = await _page('sleep_logs', user_email, limit=limit, before_id=before_id, after_id=after_id,
+                       start_date=start_date, end_date=end_date)
+    return FastJSONResponse({"success": True, "logs": page['records'], "next_cursor": page['next_cursor']})
 
 
 # Goals Endpoints
 @app.post("/api/goals")
 async def create_goal(goal: Goal):
-    data = load_data()
-    goal_dict = goal.dict()
-    goal_dict['id'] = len(data['goals']) + 1
-    goal_dict['created_at'] = datetime.now().isoformat()
-    data['goals'].append(goal_dict)
-    save_data(data)
+    goal_dict = goal.model_dump()
+    goal_dict['created_at'] = None
+    goal_dict = await run_in_threadpool(store.insert, 'goals', goal_dict)
     return {"success": True, "goal": goal_dict}
 
 
 @app.get("/api/goals")
-async def get_goals(user_email: str):
-    data = load_data()
-    user_goals = [goal for goal in data['goals'] if goal['user_email'] == user_email]
-    return {"success": True, "goals": user_goals}
+async def get_goals(user_email: str, limit: Optional[int] = Query(None, ge=1, le=PAGE_LIMIT_MAX),
+                    before_id: Optional[int] = None, after_id: Optional[int] = None,
+                    status: Optional[str] = None):
+    page = await _page('goals', user_email, limit=limit, before_id=before_id, after_id=after_id, status=status)
+    return FastJSONResponse({"success": True, "goals": page['records'], "next_cursor": page['next_cursor']})
 
 
 @app.put("/api/goals/{goal_id}")
 async def update_goal(goal_id: int, status: str, user_email: str):
-    data = load_data()
-    for goal in data['goals']:
-        if goal['id'] == goal_id and goal['user_email'] == user_email:
-            goal['status'] = status
-            save_data(data)
-            return {"success": True, "goal": goal}
-    raise HTTPException(status_code=404, detail="Goal not found")
+    goal = await run_in_threadpool(store.update, 'goals', goal_id, user_email, status=status)
+    if goal is None:
+        raise HTTPException(status_code=404, detail="Goal not found")
+    return {"success": True, "goal": goal}
 
 
 @app.delete("/api/goals/{goal_id}")
 async def delete_goal(goal_id: int, user_email: str):
-    data = load_data()
-    data['goals'] = [g for g in data['goals'] if not (g['id'] == goal_id and g['user_email'] == user_email)]
-    save_data(data)
+    await run_in_threadpool(store.delete, 'goals', goal_id, user_email)
     return {"success": True}
 
 
 # Break Reminders Endpoints
 @app.post("/api/breaks")
 async def create_break(break_reminder: BreakReminder):
-    data = load_data()
-    break_dict = break_reminder.dict()
-    break_dict['id'] = len(data['breaks']) + 1
-    break_dict['created_at'] = datetime.now().isoformat()
-    data['breaks'].append(break_dict)
-    save_data(data)
+    break_dict = await run_in_threadpool(store.insert, 'breaks', break_reminder.model_dump())
     return {"success": True, "break": break_dict}
 
 
 @app.get("/api/breaks")
-async def get_breaks(user_email: str):
-    data = load_data()
-    user_breaks = [b for b in data['breaks'] if b['user_email'] == user_email]
-    return {"success": True, "breaks": user_breaks}
+async def get_breaks(user_email: str, limit: Optional[int] = Query(None, ge=1, le=PAGE_LIMIT_MAX),
+                     before_id: Optional[int] = None, after_id: Optional[int] = None):
+    page = await _page('breaks', user_email, limit=limit, before_id=before_id, after_id=after_id)
+    return FastJSONResponse({"success": True, "breaks": page['records'], "next_cursor": page['next_cursor']})
 
 
 @app.delete("/api/breaks/{break_id}")
 async def delete_break(break_id: int, user_email: str):
-    data = load_data()
-    data['breaks'] = [b for b in data['breaks'] if not (b['id'] == break_id and b['user_email'] == user_email)]
-    save_data(data)
+    await run_in_threadpool(store.delete, 'breaks', break_id, user_email)
     return {"success": True}
 
 
+# Server-Sent Events: a "break" event with the break's id, activity,
+# duration_minutes, scheduled_time and due time as each one fires. The
+# scheduler hears of create_break/delete_break through the store.
+@app.get(BREAK_STREAM)
+async def stream_breaks(user_email: str):
+    queue = reminder_subscribers.subscribe(user_email)
+
+    async def events():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), BREAK_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f'event: break\ndata: {fastjson.dumps(event)}\n\n'
+        finally:
+            reminder_subscribers.unsubscribe(user_email, queue)
+
+    return StreamingResponse(events(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 # Analytics
-@app.get("/api/analytics")
-async def get_analytics(user_email: str):
-    data = load_data()
+def _window_average(values, window):
+    values = values[-window:]
+    return round(sum(values) / len(values), 1) if values else 0
 
-    mood_logs = [log for log in data['mood_logs'] if log['user_email'] == user_email]
-    sleep_logs = [log for log in data['sleep_logs'] if log['user_email'] == user_email]
-    goals = [goal for goal in data['goals'] if goal['user_email'] == user_email]
 
-    avg_stress = sum(log['stress_level'] for log in mood_logs[-7:]) / len(mood_logs[-7:]) if mood_logs else 0
-    avg_sleep = sum(log['sleep_hours'] for log in sleep_logs[-7:]) / len(sleep_logs[-7:]) if sleep_logs else 0
+def _analytics(stats):
+    mood, sleep, goal_counts = stats['mood_logs'], stats['sleep_logs'], stats['goals']
 
     goal_stats = {
-        'total': len(goals),
-        'completed': len([g for g in goals if g['status'] == 'completed']),
-        'in_progress': len([g for g in goals if g['status'] == 'in_progress']),
-        'pending': len([g for g in goals if g['status'] == 'pending'])
+        'total': sum(goal_counts.values()),
+        'completed': goal_counts.get('completed', 0),
+        'in_progress': goal_counts.get('in_progress', 0),
+        'pending': goal_counts.get('pending', 0)
     }
 
-    return {
-        "success": True,
-        "analytics": {
-            "avg_stress_7days": round(avg_stress, 1),
-            "avg_sleep_7days": round(avg_sleep, 1),
-            "total_mood_logs": len(mood_logs),
-            "total_sleep_logs": len(sleep_logs),
-            "goal_stats": goal_stats
-        }
-    }
+    analytics = {}
+    for window in ANALYTICS_WINDOWS:
+        analytics[f"avg_stress_{window}days"] = _window_average(mood['values'], window)
+        analytics[f"avg_sleep_{window}days"] = _window_average(sleep['values'], window)
+    analytics.update({
+        "total_mood_logs": mood['count'],
+        "total_sleep_logs": sleep['count'],
+        "goal_stats": goal_stats
+    })
+    return analytics
+
+
+@app.get("/api/analytics")
+async def get_analytics(user_email: str):
+    stats = await run_in_threadpool(store.user_stats, user_email)
+    return FastJSONResponse({"success": True, "analytics": _analytics(stats)})
+
+
+# Dashboard: every section of the wellness page in one response, each list
+# section its newest `limit` records
+DASHBOARD_SECTIONS = {
+    'analytics': lambda user_email, limit: _analytics(store.user_stats(user_email)),
+    'mood': lambda user_email, limit: store.list('mood_logs', user_email, limit),
+    'sleep': lambda user_email, limit: store.list('sleep_logs', user_email, limit),
+    'goals': lambda user_email, limit: store.list('goals', user_email, limit),
+    'breaks': lambda user_email, limit: store.list('breaks', user_email, limit),
+}
+
+
+def _dashboard_snapshot(user_email, sections, limit, if_none_match):
+    # The user's stats version changes on every write, so it identifies the
+    # whole snapshot. Sections are re-read if a write lands in between.
+    # Returns (etag, sections or None if the client's copy is current).
+    for _ in range(3):
+        version = store.user_stats(user_email)['version']
+        etag = f'"{version}-{limit}-{"-".join(sections)}"'
+        if etag in [tag.strip() for tag in if_none_match.split(',')]:
+            return etag, None
+        dashboard = {section: DASHBOARD_SECTIONS[section](user_email, limit) for section in sections}
+        if store.user_stats(user_email)['version'] == version:
+            break
+    return etag, dashboard
+
+
+@app.get("/api/dashboard")
+async def get_dashboard(request: Request, user_email: str, fields: Optional[str] = None,
+                        limit: int = Query(30, ge=1, le=PAGE_LIMIT_MAX)):
+    sections = fields.split(',') if fields else list(DASHBOARD_SECTIONS)
+    unknown = [s for s in sections if s not in DASHBOARD_SECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    etag, dashboard = await run_in_threadpool(_dashboard_snapshot, user_email, sections, limit,
+                                              request.headers.get('if-none-match', ''))
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if dashboard is None:
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse({"success": True, **dashboard}, headers=headers)
+
+
+# Bulk import/export, as NDJSON or CSV with one record per line
+BULK_COLLECTIONS = {
+    'mood': ('mood_logs', MoodLog),
+    'sleep': ('sleep_logs', SleepLog),
+    'goals': ('goals', Goal),
+    'breaks': ('breaks', BreakReminder),
+}
+BULK_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+BULK_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+
+
+def _bulk_target(name, format):
+    if name not in BULK_COLLECTIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown collection: {name}")
+    if format not in BULK_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    return BULK_COLLECTIONS[name]
+
+
+async def _request_lines(request):
+    buffer = b''
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+def _validate_batch(batch, adapter, model, format, header, result):
+    # NDJSON batches are validated in one pass by pydantic-core; if any line
+    # is bad, fall back to line by line so the errors can be reported.
+    if format == 'ndjson':
+        try:
+            records = adapter.validate_json(b'[' + b','.join(line for _, line in batch) + b']')
+            if len(records) == len(batch):
+                return adapter.dump_python(records)
+        except ValueError:
+            pass
+
+    records = []
+    for line_number, line in batch:
+        try:
+            if format == 'csv':
+                values = dict(zip(header, next(csv.reader([line.decode()]))))
+                records.append(model(**values).model_dump())
+            else:
+                records.append(model.model_validate_json(line).model_dump())
+        except (ValueError, TypeError, csv.Error) as e:
+            result["error_count"] += 1
+            if len(result["errors"]) < MAX_REPORTED_ERRORS:
+                result["errors"].append({"line": line_number, "error": str(e)})
+    return records
+
+
+async def ingest(lines, collection, model, format='ndjson', chunk_size=BULK_CHUNK_SIZE):
+    """Validate lines from an async iterator and insert them in chunks.
+
+    Only one chunk is held in memory while the previous one commits.
+    Invalid lines are skipped and reported (the first MAX_REPORTED_ERRORS).
+    """
+    adapter = TypeAdapter(List[model])
+    result = {"inserted": 0, "error_count": 0, "errors": []}
+    header, batch, commit = None, [], None
+    line_number = 0
+
+    async def flush(batch, commit):
+        # Validating a chunk takes long enough to stall every other request
+        records = await run_in_threadpool(_validate_batch, batch, adapter, model, format, header, result)
+        if commit is not None:
+            result["inserted"] += len(await commit)
+        return asyncio.ensure_future(run_in_threadpool(store.insert_many, collection, records))
+
+    async for line in lines:
+        line_number += 1
+        line = line.strip()
+        if not line:
+            continue
+        if format == 'csv' and header is None:
+            header = next(csv.reader([line.decode(errors='replace')]))
+            continue
+        batch.append((line_number, line))
+        if len(batch) >= chunk_size:
+            commit = await flush(batch, commit)
+            batch = []
+
+    if batch:
+        commit = await flush(batch, commit)
+    if commit is not None:
+        result["inserted"] += len(await commit)
+    return result
+
+
+def _export_chunks(records, fields, format, chunk_size=BULK_CHUNK_SIZE):
+    if format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fields, extrasaction='ignore')
+        writer.writeheader()
+        yield buffer.getvalue()
+    while True:
+        batch = list(itertools.islice(records, chunk_size))
+        if not batch:
+            return
+        if format == 'csv':
+            buffer = io.StringIO()
+            csv.DictWriter(buffer, fields, extrasaction='ignore').writerows(batch)
+            yield buffer.getvalue()
+        else:
+            yield b''.join(fastjson.dumpb(record) + b'\n' for record in batch)
+
+
+@app.post("/api/bulk/{name}")
+async def bulk_import(name: str, request: Request, format: str = 'ndjson'):
+    collection, model = _bulk_target(name, format)
+    result = await ingest(_request_lines(request), collection, model, format)
+    return {"success": True, **result}
+
+
+@app.get("/api/export/{name}")
+async def bulk_export(name: str, user_email: Optional[str] = None, format: str = 'ndjson'):
+    collection, model = _bulk_target(name, format)
+    fields = ['id', *model.model_fields]
+    if 'created_at' not in fields:
+        fields.append('created_at')
+    return StreamingResponse(
+        _export_chunks(store.iter_records(collection, user_email), fields, format),
+        media_type=BULK_FORMATS[format],
+        headers={'Content-Disposition': f'attachment; filename="{name}.{format}"'},
+    )
+
+
+# Read cache counters, for sizing WELLNESS_CACHE_MB
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    return {"success": True, "cache": store.cache.stats()}
+
+
+# Prometheus scrape target: request latencies, spans and the cache counters
+@app.get("/metrics")
+async def get_metrics(request: Request):
+    if METRICS_TOKEN and request.headers.get('authorization') != f'Bearer {METRICS_TOKEN}':
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return Response(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    if WORKERS == 1:
+        uvicorn.run(app, host="0.0.0.0", port=PORT)
+    else:
+        import socket
+        from uvicorn.supervisors import Multiprocess
+
+        # Workers load the app from an import string. uvicorn binds their
+        # shared socket without IPPROTO_TCP, so asyncio skips TCP_NODELAY on
+        # accepted connections and small responses wait ~40ms on delayed
+        # ACKs; bind it here instead.
+        config = uvicorn.Config("wellness_api:app", host="0.0.0.0", port=PORT, workers=WORKERS)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((config.host, config.port))
+        sock.set_inheritable(True)
+        Multiprocess(config, target=uvicorn.Server(config).run, sockets=[sock]).run()
\ No newline at end of file
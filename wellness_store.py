@@ -0,0 +1,743 @@
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future
+from datetime import datetime
+
+import fastjson
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Fields copied out of each record into their own columns so SQLite can
+# index and filter on them. Everything else lives in the JSON `data` column.
+COLLECTIONS = {
+    'mood_logs': ('date',),
+    'sleep_logs': ('date',),
+    'goals': ('status',),
+    'breaks': ('scheduled_time',),
+}
+
+# Per-user aggregates kept in the user_stats table and updated in the same
+# transaction as every write: a rolling window of the most recent values of
+# each field below (long enough for every window in ANALYTICS_WINDOWS) and
+# a count of goals per status.
+STATS = 'user_stats'
+STATS_FORMAT = 2  # kept in PRAGMA user_version; a mismatch rebuilds the stats
+ROLLING_FIELDS = {'mood_logs': 'stress_level', 'sleep_logs': 'sleep_hours'}
+ANALYTICS_WINDOWS = (7, 30, 90)
+
+# Every write also logs the (collection, user_email) pairs it touched here,
+# in the same transaction, so other processes sharing the database know
+# which of their cached reads to drop. A NULL collection means "anything".
+CHANGES = 'changes'
+CHANGES_KEPT = 10000
+
+
+class ReadCache:
+    """LRU cache of query results, bounded by an approximate byte budget.
+
+    Entries belong to an owner, a (collection, user_email) pair, and a
+    write invalidates exactly the entries of the owners it touched. Each
+    owner has a generation number so a read that raced with a write cannot
+    put its stale result back into the cache.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._keys_by_owner = defaultdict(set)
+        self._generations = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def generation(self, owner):
+        with self._lock:
+            return self._generations[owner]
+
+    def put(self, key, value, size, generation):
+        owner = key[0]
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._generations[owner] != generation or key in self._entries:
+                return
+            self._entries[key] = (value, size)
+            self._keys_by_owner[owner].add(key)
+            self.size += size
+            while self.size > self.max_bytes:
+                old_key, (_, old_size) = self._entries.popitem(last=False)
+                self._forget(old_key, old_size)
+                self.evictions += 1
+
+    def invalidate(self, owner):
+        with self._lock:
+            self._generations[owner] += 1
+            for key in self._keys_by_owner.pop(owner, ()):
+                _, size = self._entries.pop(key)
+                self.size -= size
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for owner in list(self._keys_by_owner):
+                self._generations[owner] += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._keys_by_owner.clear()
+            self.size = 0
+
+    def _forget(self, key, size):
+        self.size -= size
+        keys = self._keys_by_owner[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_owner[key[0]]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+class WellnessStore:
+    """SQLite (WAL mode) storage for the wellness tracker.
+
+    Each collection is a table indexed on (user_email, created_at), so a
+    user's reads cost O(log n + rows returned) and every write touches a
+    single row instead of rewriting the whole data set.
+
+    Writes go through a single writer thread that group-commits: every
+    write queued within `commit_interval` seconds shares one transaction
+    and one fsync, and a write is only acknowledged once that commit is
+    durable. SQLite's WAL is the append-only journal (replayed
+    automatically on open) and is folded back into the database file
+    after `checkpoint_interval` idle seconds.
+
+    Per-user analytics (rolling windows and goal status counts, see
+    ROLLING_FIELDS) are maintained incrementally on every write, so reading
+    them costs a single row lookup.
+
+    Reads are served from a per-user ReadCache of `cache_bytes` that each
+    write invalidates for the (collection, user) pairs it touched, before
+    the write is acknowledged. Cached records are shared between callers
+    and must be treated as read-only.
+
+    Several processes (e.g. uvicorn workers) can share one database. SQLite
+    serializes their writers, and before each cached read a process checks
+    PRAGMA data_version; if another connection has committed since, it
+    reads the new rows of the CHANGES log and invalidates what they name.
+    Listeners added with add_listener() hear of both kinds of write.
+    """
+
+    MAX_BATCH = 1000
+
+    def __init__(self, path, commit_interval=0.002, checkpoint_interval=30, cache_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.cache = ReadCache(cache_bytes)
+        self._local = threading.local()
+        self._writes = queue.Queue()
+        self._origin = f'{os.getpid()}-{time.time_ns()}'
+        self._create_schema()
+        self._sync_conn = self._connect()
+        self._sync_lock = threading.Lock()
+        self._data_version = None
+        self._listeners = []
+        self._last_change = self._sync_conn.execute(f'SELECT COALESCE(MAX(seq), 0) FROM {CHANGES}').fetchone()[0]
+        self._writer = threading.Thread(target=self._writer_loop, name='wellness-writer', daemon=True)
+        self._writer.start()
+
+    def _connect(self, synchronous='NORMAL'):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={synchronous}')
+        conn.execute('PRAGMA cache_size=-65536')
+        conn.execute('PRAGMA mmap_size=268435456')
+        return conn
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _create_schema(self):
+        conn = self._connect()
+        for collection, columns in COLLECTIONS.items():
+            extra = ''.join(f', {column} TEXT' for column in columns)
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {collection} ('
+                f'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                f'user_email TEXT NOT NULL, created_at TEXT NOT NULL{extra}, '
+                f'data TEXT NOT NULL)'
+            )
+            conn.execute(
+                f'CREATE INDEX IF NOT EXISTS idx_{collection}_user '
+                f'ON {collection} (user_email, created_at)'
+            )
+            for column in columns:
+                conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS idx_{collection}_user_{column} '
+                    f'ON {collection} (user_email, {column})'
+                )
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {STATS} (user_email TEXT PRIMARY KEY, data TEXT NOT NULL)')
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {CHANGES} '
+                     f'(seq INTEGER PRIMARY KEY, origin TEXT NOT NULL, collection TEXT, user_email TEXT)')
+        if conn.execute('PRAGMA user_version').fetchone()[0] != STATS_FORMAT:
+            conn.execute('BEGIN IMMEDIATE')
+            # Another process may have rebuilt them while we waited for the lock
+            if conn.execute('PRAGMA user_version').fetchone()[0] != STATS_FORMAT:
+                self._rebuild_stats(conn)
+                conn.execute(f'PRAGMA user_version = {STATS_FORMAT}')
+            conn.execute('COMMIT')
+        conn.close()
+
+    def _writer_loop(self):
+        conn = self._connect(synchronous='FULL')
+        while True:
+            try:
+                job = self._writes.get(timeout=self.checkpoint_interval)
+            except queue.Empty:
+                self._maintain(conn)
+                continue
+            if job is None:
+                self._maintain(conn, prune=False)
+                conn.close()
+                return
+
+            batch = [job]
+            deadline = time.monotonic() + self.commit_interval
+            while len(batch) < self.MAX_BATCH:
+                try:
+                    job = self._writes.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if job is None:
+                    self._writes.put(None)
+                    break
+                batch.append(job)
+            with span('store.commit'):
+                self._commit_batch(conn, batch)
+
+    @staticmethod
+    def _maintain(conn, prune=True):
+        # Idle-time upkeep; losing a round (e.g. to another worker holding
+        # the lock) only delays it, and must not stop the writer
+        try:
+            if prune:
+                conn.execute(f'DELETE FROM {CHANGES} WHERE seq <= (SELECT MAX(seq) FROM {CHANGES}) - ?',
+                             (CHANGES_KEPT,))
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        except sqlite3.Error:
+            logger.exception('Wellness store maintenance failed')
+
+    def _commit_batch(self, conn, batch):
+        # Each write runs in its own savepoint so one failing write does not
+        # take the rest of the group down with it.
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for fn, owners, future in batch:
+                conn.execute('SAVEPOINT write')
+                try:
+                    outcomes.append((future, owners, fn(conn), None))
+                    conn.execute('RELEASE write')
+                except Exception as exc:
+                    conn.execute('ROLLBACK TO write')
+                    conn.execute('RELEASE write')
+                    outcomes.append((future, (), None, exc))
+            changed = set()
+            for _, owners, _, exc in outcomes:
+                if exc is None:
+                    changed.update(owners if owners is not None else [(None, None)])
+            conn.executemany(f'INSERT INTO {CHANGES} (origin, collection, user_email) VALUES (?, ?, ?)',
+                             [(self._origin, collection, user_email) for collection, user_email in changed])
+            conn.execute('COMMIT')
+        except Exception as exc:
+            try:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+            except sqlite3.Error:
+                logger.exception('Wellness store rollback failed')
+            for _, _, future in batch:
+                future.set_exception(exc)
+            return
+        for future, owners, result, exc in outcomes:
+            if owners is None:
+                self.cache.clear()
+            for owner in owners or ():
+                self.cache.invalidate(owner)
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+        self._notify(None if (None, None) in changed else changed)
+
+    def submit(self, fn, owners=None):
+        """Queue `fn(conn)` for the next group commit and return a Future.
+
+        `owners` lists the (collection, user_email) pairs the write touches;
+        None means it may touch anything and clears the whole read cache.
+        """
+        future = Future()
+        self._writes.put((fn, owners, future))
+        return future
+
+    def _write(self, fn, owners=None):
+        return self.submit(fn, owners).result()
+
+    def add_listener(self, fn):
+        """Call `fn(owners)` after each commit, by this process or (once seen by
+        sync()) another, with the set of (collection, user_email) pairs it
+        touched, or None if it may have touched anything. `fn` runs on the
+        committing or syncing thread, so it should only note what changed.
+        """
+        self._listeners.append(fn)
+
+    def _notify(self, owners):
+        if owners is None or owners:
+            for fn in self._listeners:
+                try:
+                    fn(owners)
+                except Exception:
+                    logger.exception('Wellness store listener %r failed', fn)
+
+    def sync(self):
+        """Catch up with writes from other processes.
+
+        Drops the cached reads they made stale and tells the listeners.
+        Cached reads call this first; a process that only needs the
+        notifications calls it itself.
+        """
+        with self._sync_lock:
+            version = self._sync_conn.execute('PRAGMA data_version').fetchone()[0]
+            if version == self._data_version:
+                return
+            self._data_version = version
+            rows = self._sync_conn.execute(
+                f'SELECT seq, origin, collection, user_email FROM {CHANGES} WHERE seq > ? ORDER BY seq',
+                (self._last_change,),
+            ).fetchall()
+            if not rows:
+                return
+            changed = set()
+            if rows[0][0] != self._last_change + 1:
+                # The log was pruned past what we have seen
+                self.cache.clear()
+                changed = None
+            else:
+                for _, origin, collection, user_email in rows:
+                    if origin == self._origin:
+                        continue
+                    if collection is None:
+                        self.cache.clear()
+                        changed = None
+                    else:
+                        self.cache.invalidate((collection, user_email))
+                        if changed is not None:
+                            changed.add((collection, user_email))
+            self._last_change = rows[-1][0]
+        self._notify(changed)
+
+    def _cached(self, key, load):
+        # `load()` returns (value, approximate size in bytes)
+        self.sync()
+        value = self.cache.get(key)
+        if value is None:
+            generation = self.cache.generation(key[0])
+            with span('store.load'):
+                value, size = load()
+            self.cache.put(key, value, size, generation)
+        return value
+
+    def close(self):
+        """Flush pending writes, checkpoint the WAL and stop the writer."""
+        self._writes.put(None)
+        self._writer.join()
+        self._sync_conn.close()
+
+    @staticmethod
+    def _row_values(collection, record):
+        body = {k: v for k, v in record.items() if k != 'id'}
+        return (
+            [record['user_email'], record['created_at']]
+            + [record.get(column) for column in COLLECTIONS[collection]]
+            + [fastjson.dumps(body)]
+        )
+
+    @staticmethod
+    def _record(record_id, data):
+        record = fastjson.loads(data)
+        record['id'] = record_id
+        return record
+
+    def _insert_row(self, conn, collection, record, keep_id=False):
+        columns = ['user_email', 'created_at', *COLLECTIONS[collection], 'data']
+        values = self._row_values(collection, record)
+        if keep_id and record.get('id') is not None:
+            columns.insert(0, 'id')
+            values.insert(0, record['id'])
+        placeholders = ', '.join('?' for _ in columns)
+        cursor = conn.execute(
+            f'INSERT INTO {collection} ({", ".join(columns)}) VALUES ({placeholders})',
+            values,
+        )
+        return cursor.lastrowid
+
+    # Incremental analytics. `pending` maps user_email to the stats loaded
+    # (and being modified) in the current write, so bulk writes load and
+    # save each user's row once.
+
+    @staticmethod
+    def _empty_rolling():
+        # `ids`/`values` are the newest records, oldest first; `last` is the
+        # (created_at, id) of the newest one, to spot back-dated inserts.
+        return {'count': 0, 'ids': [], 'values': [], 'last': None}
+
+    def _empty_stats(self):
+        stats = {collection: self._empty_rolling() for collection in ROLLING_FIELDS}
+        stats['goals'] = {}
+        stats['version'] = 0
+        return stats
+
+    def _stats_for(self, conn, pending, user_email):
+        if user_email not in pending:
+            row = conn.execute(f'SELECT data FROM {STATS} WHERE user_email = ?', (user_email,)).fetchone()
+            pending[user_email] = fastjson.loads(row[0]) if row else self._empty_stats()
+        return pending[user_email]
+
+    @staticmethod
+    def _save_stats(conn, pending):
+        # Every write saves the stats of the users it touched, so the version
+        # counter doubles as a per-user change number (used for ETags).
+        for stats in pending.values():
+            stats['version'] = stats.get('version', 0) + 1
+        conn.executemany(
+            f'INSERT OR REPLACE INTO {STATS} (user_email, data) VALUES (?, ?)',
+            [(user_email, fastjson.dumps(stats)) for user_email, stats in pending.items()],
+        )
+
+    def _refill_window(self, conn, rolling, collection, user_email):
+        field = ROLLING_FIELDS[collection]
+        rows = conn.execute(
+            f'SELECT created_at, id, data FROM {collection} WHERE user_email = ? '
+            f'ORDER BY created_at DESC, id DESC LIMIT ?',
+            (user_email, max(ANALYTICS_WINDOWS)),
+        ).fetchall()
+        rows.reverse()
+        rolling['ids'] = [record_id for _, record_id, _ in rows]
+        rolling['values'] = [fastjson.loads(data).get(field, 0) for _, _, data in rows]
+        rolling['last'] = list(rows[-1][:2]) if rows else None
+
+    def _count_added(self, conn, pending, collection, record):
+        stats = self._stats_for(conn, pending, record['user_email'])
+        if collection in ROLLING_FIELDS:
+            rolling = stats[collection]
+            rolling['count'] += 1
+            key = [record['created_at'], record['id']]
+            if rolling['last'] is None or key > rolling['last']:
+                rolling['ids'].append(record['id'])
+                rolling['values'].append(record.get(ROLLING_FIELDS[collection], 0))
+                rolling['last'] = key
+                del rolling['ids'][:-max(ANALYTICS_WINDOWS)]
+                del rolling['values'][:-max(ANALYTICS_WINDOWS)]
+            else:
+                # Back-dated or rewritten record: it may land anywhere in the window.
+                self._refill_window(conn, rolling, collection, record['user_email'])
+        elif collection == 'goals':
+            counts = stats['goals']
+            counts[record['status']] = counts.get(record['status'], 0) + 1
+
+    def _count_removed(self, conn, pending, collection, record):
+        stats = self._stats_for(conn, pending, record['user_email'])
+        if collection in ROLLING_FIELDS:
+            rolling = stats[collection]
+            rolling['count'] -= 1
+            if record['id'] in rolling['ids']:
+                self._refill_window(conn, rolling, collection, record['user_email'])
+        elif collection == 'goals':
+            counts = stats['goals']
+            counts[record['status']] = counts.get(record['status'], 0) - 1
+            if counts[record['status']] <= 0:
+                del counts[record['status']]
+
+    def _rebuild_stats(self, conn):
+        conn.execute(f'DELETE FROM {STATS}')
+        pending = {}
+        for collection in COLLECTIONS:
+            for user_email, count in conn.execute(
+                f'SELECT user_email, COUNT(*) FROM {collection} GROUP BY user_email'
+            ):
+                stats = self._stats_for(conn, pending, user_email)
+                if collection in ROLLING_FIELDS:
+                    stats[collection]['count'] = count
+                    self._refill_window(conn, stats[collection], collection, user_email)
+        for user_email, status, count in conn.execute(
+            'SELECT user_email, status, COUNT(*) FROM goals GROUP BY user_email, status'
+        ):
+            pending[user_email]['goals'][status] = count
+        # Start versions from the clock so they never repeat an earlier value.
+        for stats in pending.values():
+            stats['version'] = int(time.time() * 1000)
+        self._save_stats(conn, pending)
+
+    def insert(self, collection, record):
+        record = dict(record)
+        if not record.get('created_at'):
+            record['created_at'] = datetime.now().isoformat()
+
+        def write(conn):
+            pending = {}
+            record['id'] = self._insert_row(conn, collection, record)
+            self._count_added(conn, pending, collection, record)
+            self._save_stats(conn, pending)
+            return record
+        return self._write(write, [(collection, record['user_email']), (STATS, record['user_email'])])
+
+    def insert_many(self, collection, records):
+        records = [dict(r) for r in records]
+        now = datetime.now().isoformat()
+        for record in records:
+            if not record.get('created_at'):
+                record['created_at'] = now
+        columns = ['user_email', 'created_at', *COLLECTIONS[collection], 'data']
+        sql = f'INSERT INTO {collection} ({", ".join(columns)}) VALUES ({", ".join("?" for _ in columns)})'
+
+        def write(conn):
+            if not records:
+                return records
+            conn.executemany(sql, [self._row_values(collection, record) for record in records])
+            # Only the writer thread inserts and ids are AUTOINCREMENT, so
+            # the batch received consecutive ids ending at last_insert_rowid().
+            first_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0] - len(records) + 1
+            pending = {}
+            for offset, record in enumerate(records):
+                record['id'] = first_id + offset
+                self._count_added(conn, pending, collection, record)
+            self._save_stats(conn, pending)
+            return records
+        users = {r['user_email'] for r in records}
+        return self._write(write, {(c, u) for u in users for c in (collection, STATS)})
+
+    def list(self, collection, user_email, limit=None):
+        return self.page(collection, user_email, limit)['records']
+
+    def page(self, collection, user_email, limit=None, before_id=None, after_id=None,
+             start_date=None, end_date=None, **filters):
+        """One page of a user's records, oldest first.
+
+        Without a cursor this is the newest `limit` records. `before_id`
+        pages back to older records and `after_id` forward to newer ones,
+        using the cursor row's (created_at, id) as the key, so every page
+        costs O(log n + limit) however deep it is. `start_date`/`end_date`
+        bound the `date` column and `filters` match other mirrored columns
+        (e.g. status='completed'). `next_cursor` is the id to pass as the
+        same cursor for the following page, or None on the last page.
+        """
+        columns = COLLECTIONS[collection]
+        if limit is not None and limit < 1:
+            raise ValueError('limit must be at least 1')
+        if before_id is not None and after_id is not None:
+            raise ValueError('Use either before_id or after_id, not both')
+        if (start_date or end_date) and 'date' not in columns:
+            raise ValueError(f'{collection} cannot be filtered by date')
+        unknown = [column for column in filters if column not in columns]
+        if unknown:
+            raise ValueError(f'{collection} cannot be filtered by {", ".join(unknown)}')
+
+        where, args = ['user_email = ?'], [user_email]
+        for column, value in filters.items():
+            if value is not None:
+                where.append(f'{column} = ?')
+                args.append(value)
+        if start_date:
+            where.append('date >= ?')
+            args.append(start_date)
+        if end_date:
+            where.append('date <= ?')
+            args.append(end_date)
+        forward = after_id is not None
+        cursor = after_id if forward else before_id
+        if cursor is not None:
+            where.append(
+                f'(created_at, id) {">" if forward else "<"} '
+                f'(SELECT created_at, id FROM {collection} WHERE id = ? AND user_email = ?)'
+            )
+            args += [cursor, user_email]
+        order = 'ASC' if forward else 'DESC'
+
+        def load():
+            rows = self._connection().execute(
+                f'SELECT id, data FROM {collection} WHERE {" AND ".join(where)} '
+                f'ORDER BY created_at {order}, id {order} LIMIT ?',
+                args + [-1 if limit is None else limit + 1],
+            ).fetchall()
+            has_more = limit is not None and len(rows) > limit
+            del rows[limit if has_more else len(rows):]
+            records = [self._record(record_id, data) for record_id, data in rows]
+            if not forward:
+                records.reverse()
+            next_cursor = None
+            if has_more and records:
+                next_cursor = records[-1]['id'] if forward else records[0]['id']
+            page = {'records': records, 'next_cursor': next_cursor}
+            return page, sum(len(data) + 64 for _, data in rows)
+
+        key = ((collection, user_email), 'page', limit, before_id, after_id, start_date, end_date,
+               tuple(sorted(filters.items())))
+        return self._cached(key, load)
+
+    def iter_records(self, collection, user_email=None, batch_size=1000):
+        """Yield every record of a collection, or of one user, in order.
+
+        Records are read in batches of short keyset queries, so memory stays
+        bounded and no read transaction is held open between batches.
+        Bypasses the read cache.
+        """
+        if user_email is None:
+            sql = f'SELECT id, data FROM {collection} WHERE id > ? ORDER BY id LIMIT ?'
+            last = (0,)
+        else:
+            sql = (f'SELECT id, data, created_at FROM {collection} WHERE user_email = ? '
+                   f'AND (created_at, id) > (?, ?) ORDER BY created_at, id LIMIT ?')
+            last = ('', 0)
+        while True:
+            prefix = (user_email,) if user_email is not None else ()
+            rows = self._connection().execute(sql, prefix + last + (batch_size,)).fetchall()
+            for row in rows:
+                yield self._record(row[0], row[1])
+            if len(rows) < batch_size:
+                return
+            last = (rows[-1][0],) if user_email is None else (rows[-1][2], rows[-1][0])
+
+    def get(self, collection, record_id, user_email):
+        row = self._connection().execute(
+            f'SELECT id, data FROM {collection} WHERE id = ? AND user_email = ?',
+            (record_id, user_email),
+        ).fetchone()
+        return self._record(*row) if row else None
+
+    def update(self, collection, record_id, user_email, **changes):
+        def write(conn):
+            row = conn.execute(
+                f'SELECT id, data FROM {collection} WHERE id = ? AND user_email = ?',
+                (record_id, user_email),
+            ).fetchone()
+            if row is None:
+                return None
+            old = self._record(*row)
+            record = {**old, **changes}
+            assignments = ', '.join(
+                f'{column} = ?' for column in ('created_at', *COLLECTIONS[collection], 'data')
+            )
+            conn.execute(
+                f'UPDATE {collection} SET {assignments} WHERE id = ?',
+                self._row_values(collection, record)[1:] + [record_id],
+            )
+            pending = {}
+            self._count_removed(conn, pending, collection, old)
+            self._count_added(conn, pending, collection, record)
+            self._save_stats(conn, pending)
+            return record
+        return self._write(write, [(collection, user_email), (STATS, user_email)])
+
+    def delete(self, collection, record_id, user_email):
+        def write(conn):
+            row = conn.execute(
+                f'SELECT id, data FROM {collection} WHERE id = ? AND user_email = ?',
+                (record_id, user_email),
+            ).fetchone()
+            if row is None:
+                return False
+            conn.execute(f'DELETE FROM {collection} WHERE id = ?', (record_id,))
+            pending = {}
+            self._count_removed(conn, pending, collection, self._record(*row))
+            self._save_stats(conn, pending)
+            return True
+        return self._write(write, [(collection, user_email), (STATS, user_email)])
+
+    def user_stats(self, user_email):
+        """Incrementally maintained analytics for one user (read-only)."""
+        def load():
+            row = self._connection().execute(
+                f'SELECT data FROM {STATS} WHERE user_email = ?', (user_email,)
+            ).fetchone()
+            if row is None:
+                return self._empty_stats(), 64
+            return fastjson.loads(row[0]), len(row[0]) + 64
+        return self._cached(((STATS, user_email), 'stats'), load)
+
+    def import_json(self, path, only_if_empty=False):
+        """One-shot import of a legacy wellness_data.json file.
+
+        Original ids are kept where they are unique; duplicates (the old
+        len()+1 id scheme could reuse ids after a delete) get a fresh id.
+        With `only_if_empty`, nothing is imported (and None is returned) if
+        the database already has records, so several processes starting
+        at once import the file only once.
+        """
+        with open(path, 'rb') as f:
+            data = fastjson.loads(f.read())
+
+        def write(conn):
+            if only_if_empty and any(conn.execute(f'SELECT 1 FROM {collection} LIMIT 1').fetchone()
+                                     for collection in COLLECTIONS):
+                return None
+            counts = {}
+            for collection in COLLECTIONS:
+                records = data.get(collection, [])
+                for record in records:
+                    record = dict(record)
+                    if not record.get('created_at'):
+                        record['created_at'] = datetime.now().isoformat()
+                    try:
+                        self._insert_row(conn, collection, record, keep_id=True)
+                    except sqlite3.IntegrityError:
+                        self._insert_row(conn, collection, record)
+                counts[collection] = len(records)
+            self._rebuild_stats(conn)
+            return counts
+        return self._write(write)
+
+
+if __name__ == '__main__':
+    # Usage: python wellness_store.py import wellness_data.json [wellness.db]
+    if len(sys.argv) < 3 or sys.argv[1] != 'import':
+        print('Usage: python wellness_store.py import <wellness_data.json> [database]')
+        sys.exit(1)
+    database = sys.argv[3] if len(sys.argv) > 3 else os.environ.get('WELLNESS_DB', 'wellness.db')
+    store = WellnessStore(database)
+    counts = store.import_json(sys.argv[2])
+    store.close()
+    for collection, count in counts.items():
+        print(f'{collection}: {count} records imported')